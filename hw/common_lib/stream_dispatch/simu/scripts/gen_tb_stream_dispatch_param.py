@@ -5,17 +5,23 @@
 # ----------------------------------------------------------------------------------------------
 #  This script generates stream_dispatch parameters randomly.
 #  Use this script to get coherent and supported parameters.
+#
+#  The valid set is enumerated (see hw/scripts/simu/param_lattice.py): a seeded draw never fails.
+#  The whole valid set can be dumped, and a configuration can be selected by its index in it,
+#  to sweep them exhaustively.
 # ==============================================================================================
 
 import argparse # parse input argument
 import os       # OS functions
 import sys      # manage errors
 from pathlib import Path # Get current file path
-import pprint
+import csv
 import datetime
 
-import random
-from constrainedrandom import RandObj, RandomizationError # For constrained random
+# Shared exhaustive lattice sampler
+PROJECT_DIR = os.getenv("PROJECT_DIR")
+sys.path.append(os.path.join(PROJECT_DIR, "hw/scripts/simu"))
+from param_lattice import LatticeObj, LatticeError
 
 #==================================================================================================
 # Constraints
@@ -76,35 +82,33 @@ def cstr_out_nb (out_nb, in_coef, disp_coef):
 #==================================================================================================
 # Main
 #==================================================================================================
-MAX_ITER=20
+# Enumerated valid sets are kept here from one run to the next
+LATTICE_CACHE_DIR = os.path.join(PROJECT_DIR, "hw/output/param_lattice")
 if __name__ == '__main__':
 
 #=====================================================
 # Parse input arguments
 #=====================================================
     parser = argparse.ArgumentParser(description = "Generate HPU parameters")
-    parser.add_argument('-out_bash',               type=str, help="Output in bash format.", required=True)
+    parser.add_argument('-out_bash',               type=str, help="Output in bash format.", default=None)
     parser.add_argument('-s', dest='seed',         type=int, help="Seed.",                                           default=int(datetime.datetime.utcnow().timestamp()))
+    parser.add_argument('-idx',                    type=int, help="Select the configuration of this index in the valid set, instead of drawing.", default=None)
+    parser.add_argument('-dump',                   type=str, help="Dump the whole valid set in this csv file.",      default=None)
+    parser.add_argument('-cache_dir',              type=str, help="Lattice cache directory.",                        default=LATTICE_CACHE_DIR)
     parser.add_argument('-v', dest='verbose',                help="Run in verbose mode.", action="store_true",       default=False)
 
     args = parser.parse_args()
 
-
-#=====================================================
-# Set global seed
-#=====================================================
-    random.seed(args.seed)
-
 #=====================================================
 # Random variables
 #=====================================================
     # Create randomizable object
-    r1 = RandObj(max_iterations=MAX_ITER)
+    r1 = LatticeObj(args.cache_dir)
 
-    r1.add_rand_var("IN_COEF"   , domain=range(1,64+1), order=0)
-    r1.add_rand_var("OUT_COEF"  , domain=range(1,64+1), order=0)
-    r1.add_rand_var("DISP_COEF" , domain=range(1,64+1), order=0)
-    r1.add_rand_var("OUT_NB"    , domain=range(1,16+1), order=0)
+    r1.add_rand_var("IN_COEF"   , domain=range(1,64+1))
+    r1.add_rand_var("OUT_COEF"  , domain=range(1,64+1))
+    r1.add_rand_var("DISP_COEF" , domain=range(1,64+1))
+    r1.add_rand_var("OUT_NB"    , domain=range(1,16+1))
 
 #=====================================================
 # Constraints
@@ -117,13 +121,29 @@ if __name__ == '__main__':
     r1.add_constraint(cstr_out_nb, ('OUT_NB', 'IN_COEF', 'DISP_COEF'))
     r1.add_constraint(cstr_in_out, ('IN_COEF', 'OUT_COEF', 'DISP_COEF'))
 
+#=====================================================
+# Dump
+#=====================================================
+    if (args.dump != None):
+        with open(args.dump, 'w', newline='') as fp:
+            w = csv.DictWriter(fp, fieldnames=list(r1.var_d))
+            w.writeheader()
+            w.writerows(r1.solutions())
+        print(f"INFO> Valid set dumped in {args.dump} : {r1.size()} configurations")
+
 #=====================================================
 # Randomize
 #=====================================================
+    if (args.out_bash == None):
+        sys.exit(0)
     try:
-        r1.randomize()
-    except RandomizationError:
-        sys.exit(f"ERROR> No solution found for r1 after {MAX_ITER} iterations.")
+        if (args.idx != None):
+            r1.at(args.idx)
+        else:
+            r1.randomize(args.seed)
+    except LatticeError as e:
+        sys.exit(f"ERROR> No solution found for r1. {e}")
+    print(f"INFO> stream_dispatch r1 : {r1.report()}")
 
 #=====================================================
 # Print
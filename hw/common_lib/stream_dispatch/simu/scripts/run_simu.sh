@@ -21,6 +21,7 @@ echo "Usage : run_simu.sh runs all the simulations for ${module}."
 echo "./run_simu.sh [options]"
 echo "Options are:"
 echo "-h                       : print this help."
+echo "-a                       : run all the valid parameter sets, instead of 5 random ones."
 echo "-- <run_edalize options> : run_edalize options."
 }
 
@@ -33,12 +34,16 @@ echo "-- <run_edalize options> : run_edalize options."
 OPTIND=1         # Reset in case getopts has been used previously in the shell.
 
 # Initialize your own variables here:
-while getopts "h" opt; do
+RUN_ALL=0
+while getopts "ha" opt; do
   case "$opt" in
     h)
       usage
       exit 0
       ;;
+    a)
+      RUN_ALL=1
+      ;;
   esac
 done
 
@@ -60,14 +65,27 @@ echo -n "" > $SEED_FILE
 echo -n "" > $TMP_FILE
 
 PARAM_FILE="${PROJECT_DIR}/hw/output/${module}_param.sh"
+VALID_FILE="${PROJECT_DIR}/hw/output/${module}_valid.csv"
+
+run_nb=5
+if [ $RUN_ALL -eq 1 ] ; then
+  python3 ${SCRIPT_DIR}/gen_tb_stream_dispatch_param.py -dump $VALID_FILE || exit 1
+  # Without the header line
+  run_nb=$(($(wc -l < $VALID_FILE) - 1))
+fi
 
-for i in {1..5}; do
+for i in $(seq 0 $(($run_nb - 1))); do
   cmd_gen="python3 ${SCRIPT_DIR}/gen_tb_stream_dispatch_param.py -out_bash $PARAM_FILE"
+  if [ $RUN_ALL -eq 1 ] ; then
+    cmd_gen="$cmd_gen -idx $i"
+  fi
   echo "> INFO: generate ${module} parameters"
   echo "> INFO: run $cmd_gen"
   $cmd_gen || exit 1
 
+  echo "INFO> Parameter file : $PARAM_FILE"
   cat $PARAM_FILE
+  echo "INFO> Parameter file end"
   source $PARAM_FILE
 
   cmd="$run_edalize -m ${module} -t  ${PROJECT_SIMU_TOOL} \
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# ==============================================================================================
+# BSD 3-Clause Clear License
+# Copyright © 2025 ZAMA. All rights reserved.
+# ----------------------------------------------------------------------------------------------
+#  This script generates HPU parameters randomly.
+#  Use this script to get coherent and supported parameters.
+#
+#  Some parameters could be given.
+#  This module resolves all the parameter layers (base, order2 and rdxcut) in a single
+#  constraint problem, in a single process. It outputs the same variables as
+#  gen_tb_hpu_param_base.py, gen_tb_hpu_param_order2.py and gen_tb_hpu_param_rdxcut.py
+#  run one after the other.
+#  Since the layers are solved together, a basic parameter set for which the other layers
+#  have no solution can't be drawn.
+# ==============================================================================================
+
+import argparse # parse input argument
+import os       # OS functions
+import sys      # manage errors
+from pathlib import Path # Get current file path
+import datetime
+
+from gen_tb_hpu_param_global import *
+from gen_tb_hpu_param_base import add_base, base_extra, BASE_COV_L
+from gen_tb_hpu_param_order2 import add_order2, order2_extra, ORDER2_VAR_L, ORDER2_COV_L
+from gen_tb_hpu_param_rdxcut import add_rdxcut, RDXCUT_VAR_L, RDXCUT_COV_L
+
+#==================================================================================================
+# Main
+#==================================================================================================
+if __name__ == '__main__':
+
+#=====================================================
+# Parse input arguments
+#=====================================================
+    parser = argparse.ArgumentParser(description = "Generate HPU parameters")
+    parser.add_argument('-A', dest='ntt_arch',     type=str, help="NTT architecture", choices=['NTT_CORE_ARCH_gf64','NTT_CORE_ARCH_wmm_unfold_pcg'], default=None)
+    parser.add_argument('-R', dest='r',            type=int, help="R: radix. (Supports only 2)",                     default=2)
+    parser.add_argument('-P', dest='psi',          type=int, help="PSI: Number of butterflies.",                     default=-1)
+    parser.add_argument('-S', dest='stage_nb',     type=int, help="2**S: Number of coefficients in a polynomial.",   default=-1)
+    parser.add_argument('-g', dest='glwe_k',       type=int, help="GLWE_K",                                          default=-1)
+    parser.add_argument('-V', dest='mod_ksk_w',    type=int, help="MOD_KSK_W.",                                      default=-1)
+    parser.add_argument('-w', dest='mod_ntt_w',    type=int, help="MOD_NTT_W: Modulo width.",                        default=-1)
+    parser.add_argument('-D', dest='axi_w',        type=int, help="AXI4_DATA_W: Axi4 bus data width.",               default=512)
+    parser.add_argument('-J', dest="cut_l",        type=int, action='append', help="NTT cut pattern. Given from input to output. The first one is the ngc",default=[])
+    parser.add_argument('-FPGA', dest='fpga',      type=str, help="FPGA type",              choices=['v80'],         default="v80")
+    parser.add_argument('-out_bash',               type=str, help="Output in bash format.", required=True)
+    parser.add_argument('-s', dest='seed',         type=int, help="Seed.",                                           default=int(datetime.datetime.utcnow().timestamp()))
+    parser.add_argument('-cov',                    type=str, help="Coverage file. Bias the draw toward uncovered bins.", default=None)
+    parser.add_argument('-cov_cand',               type=int, help="Number of candidates drawn when biasing.",       default=COV_CAND_NB)
+    parser.add_argument('-cov_ctx',                type=str, help="Bash file of parameters already chosen (for coverage crosses).", action='append', default=[])
+    parser.add_argument('-max_sim_cost',           type=float, help="Reject the parameter sets whose estimated simulation cost (see hpu_perf_model.py) is greater.", default=None)
+    parser.add_argument('-cache_dir',              type=str, help="Lattice cache directory.",                        default=LATTICE_CACHE_DIR)
+    parser.add_argument('-v', dest='verbose',                help="Run in verbose mode.", action="store_true",       default=False)
+
+    args = parser.parse_args()
+
+#=====================================================
+# Random variables
+#=====================================================
+    # Create randomizable object
+    r1 = LatticeObj(args.cache_dir)
+    r3 = LatticeObj(args.cache_dir)
+
+    add_base(r1, r3, args)
+    add_order2(r1, args.fpga)
+    add_rdxcut(r1, args.cut_l)
+
+#=====================================================
+# Randomize
+#=====================================================
+    # r1 and r3 use distinct seeds, so that they are drawn independently.
+    # The sets too long to simulate are redrawn: the draw stays uniform among the accepted ones.
+    # If none is drawn, the valid set is walked when it is small enough: a set is taken among the
+    # accepted ones, or there is none.
+    def draw(seed):
+        rng = random.Random(seed)
+        r3_seed = seed+1
+        for i in range(SIM_COST_TRIAL_NB):
+            val_d = r1.randomize(seed)
+            if (args.max_sim_cost is None) or (sim_cost(val_d) <= args.max_sim_cost):
+                return {**val_d, **r3.randomize(r3_seed)}
+            seed = rng.randrange(2**32)
+        if (r1.size() > SIM_COST_WALK_NB):
+            raise SimCostError(f"No parameter set with a simulation cost <= {args.max_sim_cost} drawn in {SIM_COST_TRIAL_NB} draws, "
+                               f"among {r1.size()} valid sets. Loosen the bound, or fix some parameters.")
+        idx_l = [i for (i,val_d) in enumerate(r1.solutions()) if sim_cost(val_d) <= args.max_sim_cost]
+        if (len(idx_l) == 0):
+            raise LatticeError(f"None of the {r1.size()} valid sets has a simulation cost <= {args.max_sim_cost}.")
+        return {**r1.at(rng.choice(idx_l)), **r3.randomize(r3_seed)}
+
+    cov_domain_d = {n: {**r1.var_d, **r3.var_d}[n][0] for n in BASE_COV_L + ORDER2_COV_L + RDXCUT_COV_L}
+
+    def cand_draw(seed):
+        try:
+            return draw(seed)
+        except (LatticeError, SimCostError):
+            return None
+
+    try:
+        draw(cov_seed(args, cov_domain_d, cand_draw))
+    except LatticeError as e:
+        sys.exit(f"ERROR> No solution found. {e}")
+    except SimCostError as e:
+        sys.exit(f"ERROR> {e}")
+    print(f"INFO> tb_hpu r1 : {r1.report()}")
+    if args.max_sim_cost is not None:
+        print(f"INFO> tb_hpu simulation cost : {sim_cost(r1.get_results()):.1f} (max {args.max_sim_cost})")
+
+    val_d = r1.get_results()
+    base_d   = {k: v for (k,v) in val_d.items() if k not in ORDER2_VAR_L + RDXCUT_VAR_L}
+    order2_d = {k: val_d[k] for k in ORDER2_VAR_L}
+    rdxcut_d = {k: val_d[k] for k in RDXCUT_VAR_L}
+
+#=====================================================
+# Print
+#=====================================================
+    # Bash file
+    # Same variables, in the same order, as the layer by layer generation
+    bfile_path = Path(args.out_bash)
+    with open(bfile_path, 'w') as b_fp:
+        for d in [base_d, r3.get_results(), base_extra(val_d), order2_d, order2_extra(val_d), rdxcut_d]:
+            for (k,v) in d.items():
+              b_fp.write(f"{k}={v}\n")
@@ -17,8 +17,6 @@ from pathlib import Path # Get current file path
 import pprint
 import datetime
 
-import random
-from constrainedrandom import RandObj, RandomizationError # For constrained random
 from gen_tb_hpu_param_global import *
 
 #=====================================================
@@ -54,7 +52,7 @@ def cstr_ksk_w (lbz, ksk_w):
     """
     return (lbz * ksk_w) <= RAM_W
 
-def cstr_ks (ks_l, lbx, lby, lbz, r, s, glwe_k, ksk_w, ntt_w, batch_pbs_nb):
+def cstr_ks (ks_l, lbx, lby, lbz, r, s, glwe_k, ksk_w, ntt_w, batch_pbs_nb, axi_w):
     """
     Check that there is enough time to empty the KS output pipe
     """
@@ -69,16 +67,16 @@ def cstr_ks (ks_l, lbx, lby, lbz, r, s, glwe_k, ksk_w, ntt_w, batch_pbs_nb):
         ksk_acs_w = 64
     else:
         ksk_acs_w = 32
-    ksk_coef_per_axi4_word  = AXI_W/ksk_acs_w
+    ksk_coef_per_axi4_word  = axi_w/ksk_acs_w
 
     if (q_w > 32):
         blwe_acs_w = 64
     else:
         blwe_acs_w = 32
-    if (lby < (AXI_W // blwe_acs_w)):
+    if (lby < (axi_w // blwe_acs_w)):
         blwe_subw_coef_nb = lby
     else:
-        blwe_subw_coef_nb = (AXI_W // blwe_acs_w)
+        blwe_subw_coef_nb = (axi_w // blwe_acs_w)
     blwe_subw_nb = lby // blwe_subw_coef_nb
 
 
@@ -159,10 +157,70 @@ def cstr_mod_ntt_w_arch (mod_ntt_w, ntt_arch):
     """
     return (ntt_arch != "NTT_CORE_ARCH_gf64") or (mod_ntt_w == 64)
 
+#==================================================================================================
+# add_base
+#==================================================================================================
+# Parameters followed by the coverage
+BASE_COV_L = ['NTT_ARCH', 'S', 'PSI', 'GLWE_K', 'BATCH_PBS_NB', 'PBS_L', 'BWD_PSI_DIV', 'KS_L', 'LBX', 'LBY', 'LBZ', 'REGF_SEQ', 'USE_BPIP', 'RAM_LATENCY']
+
+def add_base (r1, r3, args):
+    """
+    Declare the basic parameters and their constraints.
+    r1 gets the constrained parameters, r3 the independent ones.
+    args gives the values set by the user.
+    """
+    r1.add_rand_var("AXI_W"         , domain=[args.axi_w])
+    r1.add_rand_var("R"             , domain=power_of(2,set_val(args.r,2),set_val(args.r,2)))
+    r1.add_rand_var("S"             , domain=range(set_val(args.stage_nb,7),set_val(args.stage_nb,11)+1))
+    r1.add_rand_var("PSI"           , domain=power_of(2,set_val(args.psi,4),set_val(args.psi,64)))
+    r1.add_rand_var("NTT_ARCH"      , domain=set_list(args.ntt_arch,['NTT_CORE_ARCH_wmm_unfold_pcg','NTT_CORE_ARCH_gf64']))
+    r1.add_rand_var("MOD_NTT_W"     , domain=range(set_val(args.mod_ntt_w,32),set_val(args.mod_ntt_w,64)+1))
+    r1.add_rand_var("GLWE_K"        , domain=range(set_val(args.glwe_k,1),set_val(args.glwe_k,3)+1))
+    r1.add_rand_var("MOD_KSK_W"     , domain=range(set_val(args.mod_ksk_w,16),set_val(args.mod_ksk_w,64)+1))
+    r1.add_rand_var("BATCH_PBS_NB"  , domain=mult_by(4,4,32))
+    r1.add_rand_var("TOTAL_PBS_NB"  , domain=mult_by(4,8,64))
+    r1.add_rand_var("PBS_L"         , domain=range(1,3+1))
+    r1.add_rand_var("BWD_PSI_DIV"   , domain=range(1,2+1))
+    r1.add_rand_var("PBS_B_W"       , domain=range(2,48+1))
+    r1.add_rand_var("KS_L"          , domain=range(1,10+1))
+    r1.add_rand_var("KS_B_W"        , domain=range(2,5+1))
+    r1.add_rand_var("LBX"           , domain=range(1,4+1))
+    r1.add_rand_var("LBY"           , domain=power_of(2,2,128))
+    r1.add_rand_var("LBZ"           , domain=range(1,4+1))
+    r1.add_rand_var("REGF_COEF_NB"  , domain=power_of(2,4,64))
+    r1.add_rand_var("REGF_SEQ"      , domain=power_of(2,1,8))
+
+    r3.add_rand_var("USE_BPIP"      , domain={0: 1,1: 4}) # To keep some runs with IPIP (20%)
+    r3.add_rand_var("RAM_LATENCY"   , domain=range(1,3+1))
+
+    r1.add_constraint(cstr_r_psi_s, ('R','PSI','S'))
+    r1.add_constraint(cstr_gt,('MOD_NTT_W','MOD_KSK_W'))
+    r1.add_constraint(cstr_batch,('BATCH_PBS_NB','TOTAL_PBS_NB'))
+    r1.add_constraint(cstr_pbs_level_div, ('BWD_PSI_DIV', 'PBS_L', 'NTT_ARCH', 'PSI'))
+    r1.add_constraint(cstr_level, ('PBS_B_W','PBS_L','MOD_NTT_W'))
+    r1.add_constraint(cstr_level, ('KS_B_W','KS_L','MOD_NTT_W'))
+    r1.add_constraint(cstr_ks, ('KS_L', 'LBX', 'LBY', 'LBZ', 'R', 'S', 'GLWE_K', 'MOD_KSK_W', 'MOD_NTT_W','BATCH_PBS_NB','AXI_W'))
+    r1.add_constraint(cstr_ksk_w, ('LBZ', 'MOD_KSK_W'))
+    r1.add_constraint(cstr_regf_seq, ('REGF_SEQ', 'REGF_COEF_NB'))
+    r1.add_constraint(cstr_regf_lby, ('REGF_SEQ', 'REGF_COEF_NB', 'LBY'))
+    r1.add_constraint(cstr_mmacc_infifo,('R', 'S', 'PSI', 'GLWE_K'))
+    r1.add_constraint(cstr_run4, ('R', 'PSI', 'PBS_L', 'LBY', 'LBZ', 'KS_L'))
+    r1.add_constraint(cstr_run5, ('S', 'GLWE_K'))
+    r1.add_constraint(cstr_gram_arb, ('R','PSI','S'))
+    r1.add_constraint(cstr_mod_ntt_w_arch, ('MOD_NTT_W', 'NTT_ARCH'))
+
+def base_extra (val_d):
+    """
+    Parameters derived from the basic ones.
+    """
+    return {
+        "REGF_REG_NB" : max(2* val_d["REGF_COEF_NB"],MIN_REGF_REG),
+        "MOD_Q_W" : val_d["MOD_NTT_W"],
+    }
+
 #==================================================================================================
 # Main
 #==================================================================================================
-MAX_ITER=20
 if __name__ == '__main__':
 
 #=====================================================
@@ -179,88 +237,40 @@ if __name__ == '__main__':
     parser.add_argument('-D', dest='axi_w',        type=int, help="AXI4_DATA_W: Axi4 bus data width.",               default=512)
     parser.add_argument('-out_bash',               type=str, help="Output in bash format.", required=True)
     parser.add_argument('-s', dest='seed',         type=int, help="Seed.",                                           default=int(datetime.datetime.utcnow().timestamp()))
+    parser.add_argument('-cov',                    type=str, help="Coverage file. Bias the draw toward uncovered bins.", default=None)
+    parser.add_argument('-cov_cand',               type=int, help="Number of candidates drawn when biasing.",       default=COV_CAND_NB)
+    parser.add_argument('-cov_ctx',                type=str, help="Bash file of parameters already chosen (for coverage crosses).", action='append', default=[])
+    parser.add_argument('-cache_dir',              type=str, help="Lattice cache directory.",                        default=LATTICE_CACHE_DIR)
     parser.add_argument('-v', dest='verbose',                help="Run in verbose mode.", action="store_true",       default=False)
 
     args = parser.parse_args()
 
-    AXI_W = args.axi_w
-
-#=====================================================
-# Set global seed
-#=====================================================
-    random.seed(args.seed)
-
 #=====================================================
 # Random variables
 #=====================================================
 
     # Create randomizable object
-    r1 = RandObj(max_iterations=MAX_ITER)
-    r3 = RandObj(max_iterations=MAX_ITER)
-
-    r1.add_rand_var("R"             , fn=rand_power_of, args=(2,set_val(args.r,2),set_val(args.r,2)), order=0)
-    r1.add_rand_var("S"             , domain=range(set_val(args.stage_nb,7),set_val(args.stage_nb,11)+1), order=0)
-    r1.add_rand_var("PSI"           , fn=rand_power_of, args=(2,set_val(args.psi,4),set_val(args.psi,64)), order=0)
-    r1.add_rand_var("NTT_ARCH"      , domain=set_list(args.ntt_arch,['NTT_CORE_ARCH_wmm_unfold_pcg','NTT_CORE_ARCH_gf64']), order=0)
-    r1.add_rand_var("MOD_NTT_W"     , domain=range(set_val(args.mod_ntt_w,32),set_val(args.mod_ntt_w,64)+1), order=0)
-    r1.add_rand_var("GLWE_K"        , domain=range(set_val(args.glwe_k,1),set_val(args.glwe_k,3)+1), order=1)
-    r1.add_rand_var("MOD_KSK_W"     , domain=range(set_val(args.mod_ksk_w,16),set_val(args.mod_ksk_w,64)+1), order=1)
-    r1.add_rand_var("BATCH_PBS_NB"  , fn=rand_mult_by, args=(4,4,32), order=1)
-    r1.add_rand_var("TOTAL_PBS_NB"  , fn=rand_mult_by, args=(4,8,64), order=1)
-    r1.add_rand_var("PBS_L"         , domain=range(1,3+1), order=1)
-    r1.add_rand_var("BWD_PSI_DIV"   , domain=range(1,2+1), order=1)
-    r1.add_rand_var("PBS_B_W"       , domain=range(2,48+1), order=1)
-    r1.add_rand_var("KS_L"          , domain=range(1,10+1), order=1)
-    r1.add_rand_var("KS_B_W"        , domain=range(2,5+1), order=1)
-    r1.add_rand_var("LBX"           , domain=range(1,4+1), order=1)
-    r1.add_rand_var("LBY"           , fn=rand_power_of, args=(2,2,128), order=1)
-    r1.add_rand_var("LBZ"           , domain=range(1,4+1), order=1)
-    r1.add_rand_var("REGF_COEF_NB"  , fn=rand_power_of, args=(2,4,64), order=1)
-    r1.add_rand_var("REGF_SEQ"      , fn=rand_power_of, args=(2,1,8), order=1)
-
-    r3.add_rand_var("USE_BPIP"      , domain={0: 1,1: 4}) # To keep some runs with IPIP (20%)
-    r3.add_rand_var("RAM_LATENCY"   , domain=range(1,3+1))
+    r1 = LatticeObj(args.cache_dir)
+    r3 = LatticeObj(args.cache_dir)
 
-
-#=====================================================
-# Constraints
-#=====================================================
-#---------------
-# r1
-#---------------
-    r1.add_constraint(cstr_r_psi_s, ('R','PSI','S'))
-    r1.add_constraint(cstr_gt,('MOD_NTT_W','MOD_KSK_W'))
-    r1.add_constraint(cstr_batch,('BATCH_PBS_NB','TOTAL_PBS_NB'))
-    r1.add_constraint(cstr_pbs_level_div, ('BWD_PSI_DIV', 'PBS_L', 'NTT_ARCH', 'PSI'))
-    r1.add_constraint(cstr_level, ('PBS_B_W','PBS_L','MOD_NTT_W'))
-    r1.add_constraint(cstr_level, ('KS_B_W','KS_L','MOD_NTT_W'))
-    r1.add_constraint(cstr_ks, ('KS_L', 'LBX', 'LBY', 'LBZ', 'R', 'S', 'GLWE_K', 'MOD_KSK_W', 'MOD_NTT_W','BATCH_PBS_NB'))
-    r1.add_constraint(cstr_ksk_w, ('LBZ', 'MOD_KSK_W'))
-    r1.add_constraint(cstr_regf_seq, ('REGF_SEQ', 'REGF_COEF_NB'))
-    r1.add_constraint(cstr_regf_lby, ('REGF_SEQ', 'REGF_COEF_NB', 'LBY'))
-    r1.add_constraint(cstr_mmacc_infifo,('R', 'S', 'PSI', 'GLWE_K'))
-    r1.add_constraint(cstr_run4, ('R', 'PSI', 'PBS_L', 'LBY', 'LBZ', 'KS_L'))
-    r1.add_constraint(cstr_run5, ('S', 'GLWE_K'))
-    r1.add_constraint(cstr_gram_arb, ('R','PSI','S'))
-    r1.add_constraint(cstr_mod_ntt_w_arch, ('MOD_NTT_W', 'NTT_ARCH'))
+    add_base(r1, r3, args)
 
 #=====================================================
 # Randomize
 #=====================================================
-    try:
-        r1.randomize()
-    except RandomizationError:
-        sys.exit(f"ERROR> No solution found for r1 after {MAX_ITER} iterations.")
+    # r1 and r3 use distinct seeds, so that they are drawn independently
+    def draw(seed):
+        return {**r1.randomize(seed), **r3.randomize(seed+1)}
+
+    cov_domain_d = {n: {**r1.var_d, **r3.var_d}[n][0] for n in BASE_COV_L}
 
     try:
-        r3.randomize()
-    except RandomizationError:
-        sys.exit(f"ERROR> No solution found for r3 after {MAX_ITER} iterations.")
+        draw(cov_seed(args, cov_domain_d, draw))
+    except LatticeError:
+        sys.exit(f"ERROR> No solution found.")
+    print(f"INFO> base r1 : {r1.report()}")
 
-    extra_d = {
-        "REGF_REG_NB" : max(2* r1.REGF_COEF_NB,MIN_REGF_REG),
-        "MOD_Q_W" : r1.MOD_NTT_W,
-    }
+    extra_d = base_extra(r1.get_results())
 
 #=====================================================
 # Print
@@ -268,7 +278,6 @@ if __name__ == '__main__':
     # Bash file
     bfile_path = Path(args.out_bash)
     with open(bfile_path, 'w') as b_fp:
-        b_fp.write(f"AXI_W={AXI_W}\n")
         for (k,v) in r1.get_results().items():
           b_fp.write(f"{k}={v}\n")
         for (k,v) in r3.get_results().items():
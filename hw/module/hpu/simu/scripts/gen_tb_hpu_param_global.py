@@ -9,9 +9,18 @@
 #  This file contains shared constants and functions.
 # ==============================================================================================
 
+import os
+import sys
 import random
 import math
 
+# Shared exhaustive lattice sampler and parameter coverage
+PROJECT_DIR = os.getenv("PROJECT_DIR")
+sys.path.append(os.path.join(PROJECT_DIR, "hw/scripts/simu"))
+from param_lattice import LatticeObj, LatticeError, power_of, mult_by
+from param_coverage import Coverage, read_bash
+from hpu_perf_model import sim_cost
+
 #=====================================================
 # global var
 #=====================================================
@@ -25,6 +34,24 @@ BRAM_DEPTH = 1024
 MIN_INFIFO_CT_NB = 3
 MAX_NGC_RDX = 5
 MAX_CYC_RDX = 6
+# Enumerated valid sets are kept here from one run to the next
+LATTICE_CACHE_DIR = os.path.join(PROJECT_DIR, "hw/output/param_lattice")
+# Number of candidates drawn, when biasing toward uncovered bins
+COV_CAND_NB = 8
+# Number of draws, when rejecting the parameter sets too long to simulate (~1 ms each)
+SIM_COST_TRIAL_NB = 20000
+# If none is accepted, the valid set is walked when it has at most this number of sets
+SIM_COST_WALK_NB = 200000
+
+#=====================================================
+# SimCostError
+#=====================================================
+class SimCostError(Exception):
+    """
+    Raised when no parameter set within the simulation cost bound is drawn, while the valid set
+    is too large to be walked: some may exist.
+    """
+    pass
 
 #=====================================================
 # functions
@@ -78,30 +105,24 @@ def set_list (arg_val, l):
         return [arg_val]
 
 #=====================================================
-# rand_power_of
+# cov_seed
 #=====================================================
-def rand_power_of(p, min_v, max_v):
-    """
-    Randomize a value that is a power of p, within the range
-    [min, max]
-    """
-    log_min = math.ceil(math.log(min_v,p))
-    log_max = math.floor(math.log(max_v,p))
-    val = random.randrange(log_min,log_max+1)
-    return p ** val
-
-#=====================================================
-# rand_mult_by
-#=====================================================
-def rand_mult_by(f, min_v, max_v):
-    """
-    Randomize a value that is a multiple of f, within the range
-    [min, max]
-    """
-    div_min = math.ceil(min_v / f)
-    div_max = math.floor(max_v / f)
-    val = random.randrange(div_min,div_max+1)
-    return val * f
+def cov_seed(args, domain_d, draw_fn):
+    """
+    Return the seed to use for the draw.
+    Without coverage file, this is the user seed.
+    Else declare the coverpoints of domain_d, and return the seed of the candidate that hits the
+    least covered bins. The parameters of the bash files in args.cov_ctx are already chosen:
+    their crosses with the candidates are taken into account.
+    """
+    if (args.cov == None):
+        return args.seed
+    cov = Coverage(args.cov)
+    cov.declare(domain_d)
+    known_d = {}
+    for f in args.cov_ctx:
+        known_d.update(read_bash(f))
+    return cov.select_seed(draw_fn, args.seed, args.cov_cand, known_d)
 
 #=====================================================
 # is_ntt_wmm
@@ -19,70 +19,105 @@ import datetime
 
 from gen_tb_hpu_param_global import *
 
-import random
-from constrainedrandom import RandObj, RandomizationError # For constrained random
-
 #==================================================================================================
 # Constraints
 #==================================================================================================
-def cstr_lwe_k (lwe_k):
+def cstr_lwe_k (lwe_k, lbx, s):
     """
     LWE_K should not be too small, to avoid unsupported corner cases in the design
     """
-    return ((lwe_k // args.lbx) >= MIN_BCOL) and ((args.s > 9) or (lwe_k >= MIN_LWE_K))
+    return ((lwe_k // lbx) >= MIN_BCOL) and ((s > 9) or (lwe_k >= MIN_LWE_K))
 
 
-def cstr_bsk_pc (bsk_pc):
+def cstr_bsk_pc (bsk_pc, mod_ntt_w, r, psi, s, axi_w):
     """
     Number of coef presented by each PC should divide R*PSI
     Total number of coefficients sent should match N. (no croppping done)
     per cut (#cut = #pc)
     """
-    bsk_w = args.mod_ntt_w
+    bsk_w = mod_ntt_w
     if ((bsk_w) > 32):
         bsk_acs_w = 64
     else:
         bsk_acs_w = 32
-    pc_coef = AXI_W // bsk_acs_w
+    pc_coef = axi_w // bsk_acs_w
     return ((bsk_pc == 1)
-            or ((bsk_pc <= (args.r*args.psi))
-                and ((args.r**args.s) % (bsk_pc * pc_coef) == 0)))
+            or ((bsk_pc <= (r*psi))
+                and ((r**s) % (bsk_pc * pc_coef) == 0)))
 
-def cstr_ksk_pc (ksk_pc):
+def cstr_ksk_pc (ksk_pc, r, s, glwe_k, lbz, mod_ksk_w, lby, axi_w):
     """
     Number of coef presented by each PC should divide LBY
     Total number of coefficients sent should match BLWE_K. (no croppping done)
     per cut (#cut = #pc)
     """
-    blwe_k = (args.r**args.s) * args.glwe_k
-    if ((args.lbz * args.mod_ksk_w) > 32):
+    blwe_k = (r**s) * glwe_k
+    if ((lbz * mod_ksk_w) > 32):
         ksk_acs_w = 64
     else:
         ksk_acs_w = 32
-    pc_coef = AXI_W // ksk_acs_w
+    pc_coef = axi_w // ksk_acs_w
     return ( (ksk_pc == 1)
-             or ((ksk_pc <= args.lby)
+             or ((ksk_pc <= lby)
                   and (blwe_k % (ksk_pc * pc_coef) == 0)))
 
-def cstr_pem_pc (pem_pc):
+def cstr_pem_pc (pem_pc, regf_seq):
     """
     The number of PC should not exceed the number of sequences of the regfile
     """
-    return (pem_pc <= args.regf_seq)
+    return (pem_pc <= regf_seq)
 
-def cstr_run (lwe_k):
+def cstr_run (lwe_k, s):
     """
     To avoid too long simulations, artificially limit value of k
     """
-    if (args.s > 9):
+    if (s > 9):
         return (lwe_k < MAX_LWE_K)
     else:
         return True
 
+#==================================================================================================
+# add_order2
+#==================================================================================================
+# Parameters generated here, and parameters followed by the coverage
+ORDER2_VAR_L = ['BSK_PC', 'KSK_PC', 'LWE_K', 'PEM_PC']
+ORDER2_COV_L = ['BSK_PC', 'KSK_PC', 'PEM_PC']
+
+def add_order2 (r1, fpga):
+    """
+    Declare the parameters depending on the basic ones, and their constraints.
+    The basic parameters must already be declared in r1.
+    """
+    if (fpga == 'v80'):
+        BSK_PC_MAX = 16
+        KSK_PC_MAX = 16
+        PEM_PC_MAX = 2
+    else:
+        sys.exit(f"ERROR> Unsupported FPGA {fpga}.")
+
+    r1.add_rand_var("BSK_PC"        , domain=power_of(2,1,BSK_PC_MAX))
+    r1.add_rand_var("KSK_PC"        , domain=power_of(2,1,KSK_PC_MAX))
+    r1.add_rand_var("LWE_K"         , domain=range(28,45+1))
+    r1.add_rand_var("PEM_PC"        , domain=range(1,PEM_PC_MAX+1))
+
+    r1.add_constraint(cstr_lwe_k, ('LWE_K', 'LBX', 'S'))
+    r1.add_constraint(cstr_bsk_pc, ('BSK_PC', 'MOD_NTT_W', 'R', 'PSI', 'S', 'AXI_W'))
+    r1.add_constraint(cstr_ksk_pc, ('KSK_PC', 'R', 'S', 'GLWE_K', 'LBZ', 'MOD_KSK_W', 'LBY', 'AXI_W'))
+    r1.add_constraint(cstr_pem_pc, ('PEM_PC', 'REGF_SEQ'))
+    r1.add_constraint(cstr_run, ('LWE_K', 'S'))
+
+def order2_extra (val_d):
+    """
+    Parameters derived from the order2 ones.
+    """
+    return {
+        "BSK_CUT_NB" : val_d["BSK_PC"],
+        "KSK_CUT_NB" : val_d["KSK_PC"],
+    }
+
 #==================================================================================================
 # Main
 #==================================================================================================
-MAX_ITER=20
 if __name__ == '__main__':
 
 #=====================================================
@@ -113,60 +148,46 @@ if __name__ == '__main__':
     parser.add_argument('-FPGA', dest='fpga',      type=str, help="FPGA type",              choices=['v80'],         default="v80")
     parser.add_argument('-out_bash',               type=str, help="Output in bash format.", required=True)
     parser.add_argument('-s', dest='seed',         type=int, help="Seed.",                                           default=int(datetime.datetime.utcnow().timestamp()))
+    parser.add_argument('-cov',                    type=str, help="Coverage file. Bias the draw toward uncovered bins.", default=None)
+    parser.add_argument('-cov_cand',               type=int, help="Number of candidates drawn when biasing.",       default=COV_CAND_NB)
+    parser.add_argument('-cov_ctx',                type=str, help="Bash file of parameters already chosen (for coverage crosses).", action='append', default=[])
     parser.add_argument('-v', dest='verbose',                help="Run in verbose mode.", action="store_true",       default=False)
 
     args = parser.parse_args()
 
-    AXI_W = args.axi_w
-    FPGA  = args.fpga
-
-    if (FPGA == 'v80'):
-        BSK_PC_MAX = 16
-        KSK_PC_MAX = 16
-        PEM_PC_MAX = 2
-    else:
-        sys.exit(f"ERROR> Unsupported FPGA {{FPGA}}.")
-
-#=====================================================
-# Set global seed
-#=====================================================
-    random.seed(args.seed)
-
 #=====================================================
 # Random variables
 #=====================================================
     # Create randomizable object
-    r1 = RandObj(max_iterations=MAX_ITER)
-
-    r1.add_rand_var("BSK_PC"        , fn=rand_power_of, args=(2,1,BSK_PC_MAX), order=0)
-    r1.add_rand_var("KSK_PC"        , fn=rand_power_of, args=(2,1,KSK_PC_MAX), order=0)
-    r1.add_rand_var("LWE_K"         , domain=range(28,45+1), order=0)
-    r1.add_rand_var("PEM_PC"        , domain=range(1,PEM_PC_MAX+1), order=0)
-
-#=====================================================
-# Constraints
-#=====================================================
-#---------------
-# r1
-#---------------
-    r1.add_constraint(cstr_lwe_k, ('LWE_K'))
-    r1.add_constraint(cstr_bsk_pc, ('BSK_PC'))
-    r1.add_constraint(cstr_ksk_pc, ('KSK_PC'))
-    r1.add_constraint(cstr_pem_pc, ('PEM_PC'))
-    r1.add_constraint(cstr_run, ('LWE_K'))
+    # The domains are small: the valid set is enumerated on each run, without cache.
+    r1 = LatticeObj()
+
+    # The basic parameters are given by the user
+    r1.add_rand_var("AXI_W"         , domain=[args.axi_w])
+    r1.add_rand_var("R"             , domain=[args.r])
+    r1.add_rand_var("S"             , domain=[args.s])
+    r1.add_rand_var("PSI"           , domain=[args.psi])
+    r1.add_rand_var("GLWE_K"        , domain=[args.glwe_k])
+    r1.add_rand_var("MOD_KSK_W"     , domain=[args.mod_ksk_w])
+    r1.add_rand_var("MOD_NTT_W"     , domain=[args.mod_ntt_w])
+    r1.add_rand_var("LBX"           , domain=[args.lbx])
+    r1.add_rand_var("LBY"           , domain=[args.lby])
+    r1.add_rand_var("LBZ"           , domain=[args.lbz])
+    r1.add_rand_var("REGF_SEQ"      , domain=[args.regf_seq])
+
+    add_order2(r1, args.fpga)
 
 #=====================================================
 # Randomize
 #=====================================================
     try:
-        r1.randomize()
-    except RandomizationError:
-        sys.exit(f"ERROR> No solution found for r1 after {MAX_ITER} iterations.")
+        r1.randomize(cov_seed(args, {n: r1.var_d[n][0] for n in ORDER2_COV_L}, r1.randomize))
+    except LatticeError:
+        sys.exit(f"ERROR> No solution found for r1.")
+    print(f"INFO> order2 r1 : {r1.report()}")
 
-    extra_d = {
-        "BSK_CUT_NB" : r1.BSK_PC,
-        "KSK_CUT_NB" : r1.KSK_PC,
-    }
+    val_d = {n: r1.get_results()[n] for n in ORDER2_VAR_L}
+    extra_d = order2_extra(val_d)
 
 #=====================================================
 # Print
@@ -174,7 +195,7 @@ if __name__ == '__main__':
     # Bash file
     bfile_path = Path(args.out_bash)
     with open(bfile_path, 'w') as b_fp:
-        for (k,v) in r1.get_results().items():
+        for (k,v) in val_d.items():
           b_fp.write(f"{k}={v}\n")
         for (k,v) in extra_d.items():
           b_fp.write(f"{k}={v}\n")
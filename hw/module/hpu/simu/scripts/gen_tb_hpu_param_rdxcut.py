@@ -19,24 +19,21 @@ import datetime
 
 from gen_tb_hpu_param_global import *
 
-import random
-from constrainedrandom import RandObj, RandomizationError # For constrained random
-
 #==================================================================================================
 # Constraints
 #==================================================================================================
-def cstr_rdx_cut_nb(rdx_cut_nb):
+def cstr_rdx_cut_nb(rdx_cut_nb,ntt_arch):
     """
     The number of cuts has the following constraints:
     if wmm arch:
         rdx_cut_nb = 2
     """
-    if (is_ntt_wmm(args.ntt_arch)):
+    if (is_ntt_wmm(ntt_arch)):
         return (rdx_cut_nb == 2)
     else:
         return True
 
-def cstr_rdx_cut_0(rdx_cut_0,rdx_cut_nb):
+def cstr_rdx_cut_0(rdx_cut_0,rdx_cut_nb,ntt_arch,r,psi,s):
     """
       if rdx_cut_nb == 1 (only possible in ARCH_gf64)
         rdx_cut_0 = s
@@ -46,36 +43,36 @@ def cstr_rdx_cut_0(rdx_cut_0,rdx_cut_nb):
       Note that in ARCH_gf64, the first cut, is the negacyclic one.
       Only up to MAX_NGC_RDX is supported.
     """
-    if (is_ntt_wmm(args.ntt_arch)):
-        size_cond = rdx_cut_0 >= ((args.s+1)//2)
+    if (is_ntt_wmm(ntt_arch)):
+        size_cond = rdx_cut_0 >= ((s+1)//2)
     else:
-        size_cond = (args.r*args.psi >= 2**rdx_cut_0) and (rdx_cut_0 <= MAX_NGC_RDX)
+        size_cond = (r*psi >= 2**rdx_cut_0) and (rdx_cut_0 <= MAX_NGC_RDX)
 
     if (rdx_cut_nb == 1):
-        return (rdx_cut_0==args.s) and size_cond
+        return (rdx_cut_0==s) and size_cond
     else:
-        return (rdx_cut_0 > 0) and (rdx_cut_0 <= (args.s-(rdx_cut_nb-1))) and size_cond
+        return (rdx_cut_0 > 0) and (rdx_cut_0 <= (s-(rdx_cut_nb-1))) and size_cond
 
-def cstr_rdx_cut_1(rdx_cut_0,rdx_cut_1,rdx_cut_nb):
+def cstr_rdx_cut_1(rdx_cut_0,rdx_cut_1,rdx_cut_nb,ntt_arch,r,psi,s):
     """
       if rdx_cut_nb == 2
         SUM(rdx_cut_<i>) = s
       else
         rdx_cut_1 must not be too big, so that the other cuts could exist
     """
-    if (is_ntt_wmm(args.ntt_arch)):
+    if (is_ntt_wmm(ntt_arch)):
         size_cond = (rdx_cut_1 <= rdx_cut_0)
     else:
-        size_cond = (args.r*args.psi >= 2**rdx_cut_1) and (rdx_cut_1 <= MAX_CYC_RDX)
+        size_cond = (r*psi >= 2**rdx_cut_1) and (rdx_cut_1 <= MAX_CYC_RDX)
 
     if (rdx_cut_nb < 2):
         return (rdx_cut_1==0)
     elif (rdx_cut_nb == 2):
-        return (rdx_cut_1 > 0) and ((rdx_cut_0+rdx_cut_1) == args.s) and size_cond
+        return (rdx_cut_1 > 0) and ((rdx_cut_0+rdx_cut_1) == s) and size_cond
     else:
-        return (rdx_cut_1 > 0) and ((rdx_cut_0+rdx_cut_1) <= args.s-(rdx_cut_nb-2)) and size_cond
+        return (rdx_cut_1 > 0) and ((rdx_cut_0+rdx_cut_1) <= s-(rdx_cut_nb-2)) and size_cond
 
-def cstr_rdx_cut_2(rdx_cut_0,rdx_cut_1,rdx_cut_2,rdx_cut_nb):
+def cstr_rdx_cut_2(rdx_cut_0,rdx_cut_1,rdx_cut_2,rdx_cut_nb,ntt_arch,r,psi,s):
     """
       if rdx_cut_nb == 3
         SUM(rdx_cut_<i>) = s
@@ -83,17 +80,17 @@ def cstr_rdx_cut_2(rdx_cut_0,rdx_cut_1,rdx_cut_2,rdx_cut_nb):
         rdx_cut_2 must not be too big, so that the other cuts could exist
     """
     size_cond = True
-    if not(is_ntt_wmm(args.ntt_arch)):
-        size_cond = (args.r*args.psi >= 2**rdx_cut_2) and (rdx_cut_2 <= MAX_CYC_RDX)
+    if not(is_ntt_wmm(ntt_arch)):
+        size_cond = (r*psi >= 2**rdx_cut_2) and (rdx_cut_2 <= MAX_CYC_RDX)
 
     if (rdx_cut_nb < 3):
         return (rdx_cut_2==0)
     elif (rdx_cut_nb == 3):
-        return (rdx_cut_2 > 0) and ((rdx_cut_0+rdx_cut_1+rdx_cut_2) == args.s) and size_cond
+        return (rdx_cut_2 > 0) and ((rdx_cut_0+rdx_cut_1+rdx_cut_2) == s) and size_cond
     else:
-        return (rdx_cut_2 > 0) and ((rdx_cut_0+rdx_cut_1+rdx_cut_2) <= args.s-(rdx_cut_nb-3)) and size_cond
+        return (rdx_cut_2 > 0) and ((rdx_cut_0+rdx_cut_1+rdx_cut_2) <= s-(rdx_cut_nb-3)) and size_cond
 
-def cstr_rdx_cut_3(rdx_cut_0,rdx_cut_1,rdx_cut_2,rdx_cut_3,rdx_cut_nb):
+def cstr_rdx_cut_3(rdx_cut_0,rdx_cut_1,rdx_cut_2,rdx_cut_3,rdx_cut_nb,ntt_arch,r,psi,s):
     """
       if rdx_cut_nb == 4
         SUM(rdx_cut_<i>) = s
@@ -101,20 +98,54 @@ def cstr_rdx_cut_3(rdx_cut_0,rdx_cut_1,rdx_cut_2,rdx_cut_3,rdx_cut_nb):
         rdx_cut_3 must not be too big, so that the other cuts could exist
     """
     size_cond = True
-    if not(is_ntt_wmm(args.ntt_arch)):
-        size_cond = (args.r*args.psi >= 2**rdx_cut_3) and (rdx_cut_3 <= MAX_CYC_RDX)
+    if not(is_ntt_wmm(ntt_arch)):
+        size_cond = (r*psi >= 2**rdx_cut_3) and (rdx_cut_3 <= MAX_CYC_RDX)
 
     if (rdx_cut_nb < 4):
         return (rdx_cut_3==0)
     elif (rdx_cut_nb == 4):
-        return (rdx_cut_3 > 0) and ((rdx_cut_0+rdx_cut_1+rdx_cut_2+rdx_cut_3) == args.s) and size_cond
+        return (rdx_cut_3 > 0) and ((rdx_cut_0+rdx_cut_1+rdx_cut_2+rdx_cut_3) == s) and size_cond
     else:
-        return (rdx_cut_3 > 0) and ((rdx_cut_0+rdx_cut_1+rdx_cut_2+rdx_cut_3) <= args.s-(rdx_cut_nb-4)) and size_cond
+        return (rdx_cut_3 > 0) and ((rdx_cut_0+rdx_cut_1+rdx_cut_2+rdx_cut_3) <= s-(rdx_cut_nb-4)) and size_cond
+
+#==================================================================================================
+# add_rdxcut
+#==================================================================================================
+# Parameters generated here, and parameters followed by the coverage
+RDXCUT_VAR_L = ['RDX_CUT_NB', 'RDX_CUT_0', 'RDX_CUT_1', 'RDX_CUT_2', 'RDX_CUT_3']
+RDXCUT_COV_L = ['RDX_CUT_NB', 'RDX_CUT_0']
+
+def add_rdxcut (r1, cut_l):
+    """
+    Declare the NTT radix cut parameters, and their constraints.
+    cut_l is the cut pattern given by the user. Empty if random is required.
+    NTT_ARCH, R, PSI and S must already be declared in r1.
+    """
+    if (len(cut_l) > 4):
+        sys.exit("ERROR> Does not support more than 4 NTT radix cuts");
+
+    # cut_l - set default values
+    cut_l_length = len(cut_l)
+    if (cut_l_length == 0):
+        cut_l_length = -1
+    cut_l = cut_l + [-1] * (4 - len(cut_l))
+
+    r1.add_rand_var("RDX_CUT_NB"    , domain=range(set_val(cut_l_length,1),set_val(cut_l_length,4)+1))
+    r1.add_rand_var("RDX_CUT_0"     , domain=range(set_val(cut_l[0],2),set_val(cut_l[0],8)+1))
+    r1.add_rand_var("RDX_CUT_1"     , domain=range(set_val(cut_l[1],0),set_val(cut_l[1],8)+1))
+    r1.add_rand_var("RDX_CUT_2"     , domain=range(set_val(cut_l[2],0),set_val(cut_l[2],3)+1))
+    r1.add_rand_var("RDX_CUT_3"     , domain=range(set_val(cut_l[3],0),set_val(cut_l[3],3)+1))
+
+    arch_l = ('NTT_ARCH','R','PSI','S')
+    r1.add_constraint(cstr_rdx_cut_nb,('RDX_CUT_NB','NTT_ARCH'))
+    r1.add_constraint(cstr_rdx_cut_0,('RDX_CUT_0','RDX_CUT_NB')+arch_l)
+    r1.add_constraint(cstr_rdx_cut_1,('RDX_CUT_0','RDX_CUT_1','RDX_CUT_NB')+arch_l)
+    r1.add_constraint(cstr_rdx_cut_2,('RDX_CUT_0','RDX_CUT_1','RDX_CUT_2','RDX_CUT_NB')+arch_l)
+    r1.add_constraint(cstr_rdx_cut_3,('RDX_CUT_0','RDX_CUT_1','RDX_CUT_2','RDX_CUT_3','RDX_CUT_NB')+arch_l)
 
 #==================================================================================================
 # Main
 #==================================================================================================
-MAX_ITER=50
 if __name__ == '__main__':
 
 #=====================================================
@@ -128,57 +159,38 @@ if __name__ == '__main__':
     parser.add_argument('-J', dest="cut_l",        type=int, action='append', help="NTT cut pattern. Given from input to output. The first one is the ngc",default=[])
     parser.add_argument('-out_bash',               type=str, help="Output in bash format.", required=True)
     parser.add_argument('-s', dest='seed',         type=int, help="Seed.",                                           default=int(datetime.datetime.utcnow().timestamp()))
+    parser.add_argument('-cov',                    type=str, help="Coverage file. Bias the draw toward uncovered bins.", default=None)
+    parser.add_argument('-cov_cand',               type=int, help="Number of candidates drawn when biasing.",       default=COV_CAND_NB)
+    parser.add_argument('-cov_ctx',                type=str, help="Bash file of parameters already chosen (for coverage crosses).", action='append', default=[])
     parser.add_argument('-v', dest='verbose',                help="Run in verbose mode.", action="store_true",       default=False)
 
     args = parser.parse_args()
 
-    # cut_l - set default values
-    cut_l_length = len(args.cut_l)
-    if (cut_l_length == 0):
-        cut_l_length = -1
-
-    if (len(args.cut_l) > 4):
-        sys.exit("ERROR> Does not support more than 4 NTT radix cuts");
-    else:
-        for i in range(len(args.cut_l), 4):
-            args.cut_l.append(-1)
-
-#=====================================================
-# Set global seed
-#=====================================================
-    random.seed(args.seed)
-
 #=====================================================
 # Random variables
 #=====================================================
     # Create randomizable object
-    r1 = RandObj(max_iterations=MAX_ITER)
+    # The domains are small: the valid set is enumerated on each run, without cache.
+    r1 = LatticeObj()
 
-    r1.add_rand_var("RDX_CUT_NB"    , domain=range(set_val(cut_l_length,1),set_val(cut_l_length,4)+1), order=0)
-    r1.add_rand_var("RDX_CUT_0"     , domain=range(set_val(args.cut_l[0],2),set_val(args.cut_l[0],8)+1), order=1)
-    r1.add_rand_var("RDX_CUT_1"     , domain=range(set_val(args.cut_l[1],0),set_val(args.cut_l[1],8)+1), order=2)
-    r1.add_rand_var("RDX_CUT_2"     , domain=range(set_val(args.cut_l[2],0),set_val(args.cut_l[2],3)+1), order=3)
-    r1.add_rand_var("RDX_CUT_3"     , domain=range(set_val(args.cut_l[3],0),set_val(args.cut_l[3],3)+1), order=4)
+    # The basic parameters are given by the user
+    r1.add_rand_var("NTT_ARCH"      , domain=[args.ntt_arch])
+    r1.add_rand_var("R"             , domain=[args.r])
+    r1.add_rand_var("PSI"           , domain=[args.psi])
+    r1.add_rand_var("S"             , domain=[args.s])
 
-#=====================================================
-# Constraints
-#=====================================================
-#---------------
-# r1
-#---------------
-    r1.add_constraint(cstr_rdx_cut_nb,('RDX_CUT_NB'))
-    r1.add_constraint(cstr_rdx_cut_0,('RDX_CUT_0','RDX_CUT_NB'))
-    r1.add_constraint(cstr_rdx_cut_1,('RDX_CUT_0','RDX_CUT_1','RDX_CUT_NB'))
-    r1.add_constraint(cstr_rdx_cut_2,('RDX_CUT_0','RDX_CUT_1','RDX_CUT_2','RDX_CUT_NB'))
-    r1.add_constraint(cstr_rdx_cut_3,('RDX_CUT_0','RDX_CUT_1','RDX_CUT_2','RDX_CUT_3','RDX_CUT_NB'))
+    add_rdxcut(r1, args.cut_l)
 
 #=====================================================
 # Randomize
 #=====================================================
     try:
-        r1.randomize()
-    except RandomizationError:
-        sys.exit(f"ERROR> No solution found for r1 after {MAX_ITER} iterations.")
+        r1.randomize(cov_seed(args, {n: r1.var_d[n][0] for n in RDXCUT_COV_L}, r1.randomize))
+    except LatticeError:
+        sys.exit(f"ERROR> No solution found for r1.")
+    print(f"INFO> rdxcut r1 : {r1.report()}")
+
+    val_d = {n: r1.get_results()[n] for n in RDXCUT_VAR_L}
 
 #=====================================================
 # Print
@@ -186,5 +198,5 @@ if __name__ == '__main__':
     # Bash file
     bfile_path = Path(args.out_bash)
     with open(bfile_path, 'w') as b_fp:
-        for (k,v) in r1.get_results().items():
+        for (k,v) in val_d.items():
           b_fp.write(f"{k}={v}\n")
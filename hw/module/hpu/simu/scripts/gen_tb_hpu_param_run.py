@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# ==============================================================================================
+# BSD 3-Clause Clear License
+# Copyright © 2025 ZAMA. All rights reserved.
+# ----------------------------------------------------------------------------------------------
+#  This script generates HPU parameters randomly.
+#  Use this script to get coherent and supported parameters.
+#
+#  This module generates the run level parameters : NTT modulo, IOP, integer size, AXI width,
+#  FPGA, MSPLIT type and inter part pipe.
+#  They are independent. With a coverage file, the draw is biased toward the uncovered bins.
+# ==============================================================================================
+
+import argparse # parse input argument
+from pathlib import Path # Get current file path
+import datetime
+
+from gen_tb_hpu_param_global import *
+
+#=====================================================
+# Domains
+#=====================================================
+NTT_MOD_L         = ["NTT_MOD_goldilocks", "NTT_MOD_solinas2_44_14"]
+IOP_L             = ["IOP[0]", "IOP[16]", "ADD", "ADDS", "SUB", "SUBS", "SSUB", "MUL", "MULS", "BW_AND", "BW_OR", "BW_XOR", "CMP_GT", "CMP_GTE", "CMP_LT", "CMP_LTE", "CMP_EQ", "CMP_NEQ"]
+INT_SIZE_L        = [2, 4, 8]
+AXI_DATA_W_L      = [512, 256, 128]
+FPGA_L            = ["v80"]
+MSPLIT_TYPE_L     = ["PEP_MSPLIT_main2_subs2", "PEP_MSPLIT_main1_subs3", "PEP_MSPLIT_main3_subs1"]
+INTER_PART_PIPE_L = [0, 1, 2]
+
+# The custom IOP deal with a 2b word
+CUSTOM_IOP_INT_SIZE = 2
+
+#=====================================================
+# draw
+#=====================================================
+def draw (seed):
+    """
+    Draw the run level parameters.
+    """
+    rng = random.Random(seed)
+    val_d = {
+        "NTT_MOD_FLAG"    : rng.choice(NTT_MOD_L),
+        "FPGA"            : rng.choice(FPGA_L),
+        "IOP"             : rng.choice(IOP_L),
+        "AXI_DATA_W"      : rng.choice(AXI_DATA_W_L),
+        "INTER_PART_PIPE" : rng.choice(INTER_PART_PIPE_L),
+        "INT_SIZE"        : rng.choice(INT_SIZE_L),
+        "MSPLIT_TYPE"     : rng.choice(MSPLIT_TYPE_L),
+    }
+    if val_d["IOP"].startswith("IOP["):
+        val_d["INT_SIZE"] = CUSTOM_IOP_INT_SIZE
+    return val_d
+
+#==================================================================================================
+# Main
+#==================================================================================================
+if __name__ == '__main__':
+
+#=====================================================
+# Parse input arguments
+#=====================================================
+    parser = argparse.ArgumentParser(description = "Generate HPU run level parameters")
+    parser.add_argument('-out_bash',               type=str, help="Output in bash format.", required=True)
+    parser.add_argument('-cov',                    type=str, help="Coverage file. Bias the draw toward uncovered bins.", default=None)
+    parser.add_argument('-cov_cand',               type=int, help="Number of candidates drawn when biasing.",       default=COV_CAND_NB)
+    parser.add_argument('-s', dest='seed',         type=int, help="Seed.",                                           default=int(datetime.datetime.utcnow().timestamp()))
+    parser.add_argument('-v', dest='verbose',                help="Run in verbose mode.", action="store_true",       default=False)
+
+    args = parser.parse_args()
+
+#=====================================================
+# Randomize
+#=====================================================
+    seed = args.seed
+    if args.cov is not None:
+        cov = Coverage(args.cov)
+        cov.declare({"NTT_MOD_FLAG"    : NTT_MOD_L,
+                     "IOP"             : IOP_L,
+                     "INT_SIZE"        : INT_SIZE_L,
+                     "AXI_DATA_W"      : AXI_DATA_W_L,
+                     "MSPLIT_TYPE"     : MSPLIT_TYPE_L,
+                     "INTER_PART_PIPE" : INTER_PART_PIPE_L})
+        seed = cov.select_seed(draw, args.seed, args.cov_cand)
+    val_d = draw(seed)
+
+#=====================================================
+# Print
+#=====================================================
+    # Bash file
+    bfile_path = Path(args.out_bash)
+    with open(bfile_path, 'w') as b_fp:
+        for (k,v) in val_d.items():
+          b_fp.write(f"{k}={v}\n")
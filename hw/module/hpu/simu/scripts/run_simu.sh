@@ -21,6 +21,7 @@ echo "Usage : run_simu.sh runs all the simulations for ${module}."
 echo "./run_simu.sh [options]"
 echo "Options are:"
 echo "-h                       : print this help."
+echo "-s <seed>                : seed of the parameter generation (default : random)."
 echo "-- <run_edalize options> : run_edalize options."
 }
 
@@ -33,12 +34,16 @@ echo "-- <run_edalize options> : run_edalize options."
 OPTIND=1         # Reset in case getopts has been used previously in the shell.
 
 # Initialize your own variables here:
-while getopts "h" opt; do
+seed=$(( (RANDOM << 15) | RANDOM ))
+while getopts "hs:" opt; do
   case "$opt" in
     h)
       usage
       exit 0
       ;;
+    s)
+      seed=$OPTARG
+      ;;
   esac
 done
 
@@ -60,18 +65,28 @@ TMP_FILE="${PROJECT_DIR}/hw/output/${RANDOM}${RANDOM}._tmp"
 echo -n "" > $SEED_FILE
 echo -n "" > $TMP_FILE
 
-NTT_MOD_L=("NTT_MOD_goldilocks" "NTT_MOD_solinas2_44_14" )
-IOP_L=("IOP[0]" "IOP[16]" "ADD" "ADDS" "SUB" "SUBS" "SSUB" "MUL" "MULS" "BW_AND" "BW_OR" "BW_XOR" "CMP_GT" "CMP_GTE" "CMP_LT" "CMP_LTE" "CMP_EQ" "CMP_NEQ")
-INT_SIZE_L=("2" "4" "8")
-AXI_DATA_W_L=("512" "256" "128")
-FPGA_L=("v80")
-MSPLIT_TYPE_L=("PEP_MSPLIT_main2_subs2" "PEP_MSPLIT_main1_subs3" "PEP_MSPLIT_main3_subs1")
-INTER_PART_PIPE_L=("0" "1" ""2)
+# All the random choices of this script derive from the seed: a run is replayed with -s <seed>.
+echo "INFO> Parameter seed : $seed"
+RANDOM=$seed
+
+# Coverage of the randomized parameters, kept from one run to the next.
+# The generators bias their draws toward the uncovered bins.
+# Report : python3 ${PROJECT_DIR}/hw/scripts/simu/param_coverage.py -cov $COV_FILE -report
+COV_FILE="${PROJECT_DIR}/hw/output/${module}_coverage.json"
 
 for ((j = 0; j < 1; j++)); do
-  size=${#NTT_MOD_L[@]}
-  index=$(($RANDOM % $size))
-  NTT_MOD_FLAG=${NTT_MOD_L[$index]}
+  # Choose NTT modulo, FPGA, IOP program, AXI_DATA_W, inter part pipe, INT size and msplit type
+  PARAM_FILE_RUN="${PROJECT_DIR}/hw/output/${module}_param_run.sh"
+  cmd_gen="python3 ${SCRIPT_DIR}/gen_tb_hpu_param_run.py -out_bash $PARAM_FILE_RUN -cov $COV_FILE \
+        -s $(( (RANDOM << 15) | RANDOM ))"
+  echo "> INFO: generate tb_hpu parameters : run"
+  echo "> INFO: run $cmd_gen"
+  $cmd_gen || exit 1
+  echo "INFO> Parameter file : $PARAM_FILE_RUN"
+  cat $PARAM_FILE_RUN
+  echo "INFO> Parameter file end"
+  source $PARAM_FILE_RUN
+
   if [[ $NTT_MOD_FLAG =~ NTT_MOD_goldilocks ]]; then
     run_args="-q 2**64 -W 64"
     MOD_NTT_W=64
@@ -86,94 +101,39 @@ for ((j = 0; j < 1; j++)); do
     exit 1
   fi
 
-  # Choose FPGA
-  size=${#FPGA_L[@]}
-  index=$(($RANDOM % $size))
-  FPGA=${FPGA_L[$index]}
-
-  # Choose IOP program
-  size=${#IOP_L[@]}
-  index=$(($RANDOM % $size))
-  IOP=${IOP_L[$index]}
-
-  # Choose AXI_DATA_W
-  size=${#AXI_DATA_W_L[@]}
-  index=$(($RANDOM % $size))
-  AXI_DATA_W=${AXI_DATA_W_L[$index]}
-
-  # Choose inter part pipe
-  size=${#INTER_PART_PIPE_L[@]}
-  index=$(($RANDOM % $size))
-  INTER_PART_PIPE=${INTER_PART_PIPE_L[$index]}
-
   if [[ $IOP =~ ^IOP\[([0-9]+)\]$ ]]; then
     # the custom code deals with a 2b word
-    run_args="$run_args -a $IOP -n 2 -y ${PROJECT_DIR}/hw/module/hpu/simu/ucode"
+    run_args="$run_args -a $IOP -n $INT_SIZE -y ${PROJECT_DIR}/hw/module/hpu/simu/ucode"
   else
-    # Choose INT size
-    size=${#INT_SIZE_L[@]}
-    index=$(($RANDOM % $size))
-    INT_SIZE=${INT_SIZE_L[$index]}
     run_args="$run_args -a $IOP -n $INT_SIZE"
   fi
 
 
 
   # generate random parameters
-  PARAM_FILE_BASE="${PROJECT_DIR}/hw/output/${module}_param_base.sh"
-  PARAM_FILE_ORDER2="${PROJECT_DIR}/hw/output/${module}_param_order2.sh"
-  PARAM_FILE_RDXCUT="${PROJECT_DIR}/hw/output/${module}_param_rdxcut.sh"
+  # All the layers (base, order2, rdxcut) are solved together, in a single process.
+  # gen_tb_hpu_param_{base,order2,rdxcut}.py generate them one after the other, if needed.
+  PARAM_FILE="${PROJECT_DIR}/hw/output/${module}_param.sh"
 
-  cmd_gen="python3 ${SCRIPT_DIR}/gen_tb_hpu_param_base.py -w $MOD_NTT_W -out_bash $PARAM_FILE_BASE"
-  echo "> INFO: generate tb_hpu parameters : base"
-  echo "> INFO: run $cmd_gen"
-  $cmd_gen \
-        -D $AXI_DATA_W \
-        || exit 1
-
-  cat $PARAM_FILE_BASE
-  source $PARAM_FILE_BASE
-
-  cmd_gen="python3 ${SCRIPT_DIR}/gen_tb_hpu_param_order2.py -out_bash $PARAM_FILE_ORDER2"
-  echo "> INFO: generate tb_hpu parameters : order2"
-  echo "> INFO: run $cmd_gen"
-  $cmd_gen -A $NTT_ARCH \
-        -R $R \
-        -P $PSI \
-        -S $S \
-        -g $GLWE_K \
-        -V $MOD_KSK_W \
-        -w $MOD_NTT_W \
-        -c $BATCH_PBS_NB \
-        -H $TOTAL_PBS_NB \
-        -e $BWD_PSI_DIV \
-        -l $PBS_L \
-        -b $PBS_B_W \
-        -L $KS_L \
-        -B $KS_B_W \
-        -X $LBX \
-        -Y $LBY \
-        -Z $LBZ \
-        -i $REGF_REG_NB \
-        -j $REGF_COEF_NB \
-        -k $REGF_SEQ \
+  # The generator commands and the content of the generated files are printed, so that a run can
+  # be reproduced from its log.
+  cmd_gen="python3 ${SCRIPT_DIR}/gen_tb_hpu_param.py -w $MOD_NTT_W -out_bash $PARAM_FILE \
         -D $AXI_DATA_W \
         -FPGA $FPGA \
-        || exit 1
-  cat $PARAM_FILE_ORDER2
-  source $PARAM_FILE_ORDER2
+        -cov $COV_FILE -cov_ctx $PARAM_FILE_RUN \
+        -s $(( (RANDOM << 15) | RANDOM ))"
+  echo "> INFO: generate tb_hpu parameters"
+  echo "> INFO: run $cmd_gen"
+  $cmd_gen || exit 1
 
+  echo "INFO> Parameter file : $PARAM_FILE"
+  cat $PARAM_FILE
+  echo "INFO> Parameter file end"
+  source $PARAM_FILE
 
-  cmd_gen="python3 ${SCRIPT_DIR}/gen_tb_hpu_param_rdxcut.py -out_bash $PARAM_FILE_RDXCUT"
-  echo "> INFO: generate tb_hpu parameters : rdxcut"
-  echo "> INFO: run $cmd_gen"
-  $cmd_gen -A $NTT_ARCH \
-        -R $R \
-        -P $PSI \
-        -S $S \
-        || exit 1
-  cat $PARAM_FILE_RDXCUT
-  source $PARAM_FILE_RDXCUT
+  # Check the whole parameter set against all the design rules, before simulating.
+  python3 ${PROJECT_DIR}/hw/scripts/simu/param_validator.py -skip_sim \
+        -param $PARAM_FILE_RUN -param $PARAM_FILE || exit 1
 
   NTT_RDX_CUT_S=($RDX_CUT_0)
   ntt_cut_arg="-J $RDX_CUT_0"
@@ -190,11 +150,6 @@ for ((j = 0; j < 1; j++)); do
     ntt_cut_arg="$ntt_cut_arg -J $RDX_CUT_3"
   fi
 
-  # Choose an msplit_type
-  size=${#MSPLIT_TYPE_L[@]}
-  index=$(($RANDOM % $size))
-  MSPLIT_TYPE=${MSPLIT_TYPE_L[$index]}
-
   if [ $USE_BPIP -eq 1 ] ; then
     USE_BPIP_OPPORTUNISM=$(($RANDOM % 2))
   else
@@ -252,6 +207,9 @@ for ((j = 0; j < 1; j++)); do
     exit $exit_status
   else
     echo -e "${GREEN}SUCCEED>${NC} $cmd" 1>&2
+    # Record the parameters of this run in the coverage, once simulated
+    python3 ${PROJECT_DIR}/hw/scripts/simu/param_coverage.py -cov $COV_FILE \
+          -record $PARAM_FILE_RUN $PARAM_FILE || exit 1
   fi
 done
 
@@ -7,9 +7,72 @@ import argparse # parse input argument
 
 #==================================================================================================
 # This script checks if the LBX LBY and LBZ parameters are supported.
+# The checks are also available as functions, for the scripts exploring the KS parameters.
 #==================================================================================================
 
 
+#=====================================================
+# ks_param
+#=====================================================
+def ks_param(batch_pbs_nb, r, s, glwe_k, ks_l, lbx, lby, lbz, ksk_w, axi_w, q_w):
+    """
+    Intermediate values of the KS.
+    """
+    KS_LG_NB = (ks_l + lbz-1) // lbz;
+    BLWE_K = (r ** s) * glwe_k
+    KS_BLOCK_LINE_NB = (BLWE_K + lby-1) // lby;
+    COLUMN_PROC_CYCLE_MIN = KS_BLOCK_LINE_NB * KS_LG_NB;
+    READ_PIPE_CYCLE_MAX   = lbx * batch_pbs_nb;
+    if ((lbz * ksk_w) > 32):
+        KSK_ACS_W = 64
+    else:
+        KSK_ACS_W = 32
+    KSK_COEF_PER_AXI4_WORD  = axi_w/KSK_ACS_W
+
+    if (q_w > 32):
+        BLWE_ACS_W = 64
+    else:
+        BLWE_ACS_W = 32
+    if (lby < (axi_w // BLWE_ACS_W)):
+        BLWE_SUBW_COEF_NB = lby
+    else:
+        BLWE_SUBW_COEF_NB = (axi_w // BLWE_ACS_W)
+    BLWE_SUBW_NB = lby // BLWE_SUBW_COEF_NB
+
+    return {"KS_LG_NB"               : KS_LG_NB,
+            "BLWE_K"                 : BLWE_K,
+            "KS_BLOCK_LINE_NB"       : KS_BLOCK_LINE_NB,
+            "COLUMN_PROC_CYCLE_MIN"  : COLUMN_PROC_CYCLE_MIN,
+            "READ_PIPE_CYCLE_MAX"    : READ_PIPE_CYCLE_MAX,
+            "KSK_ACS_W"              : KSK_ACS_W,
+            "KSK_COEF_PER_AXI4_WORD" : KSK_COEF_PER_AXI4_WORD,
+            "BLWE_ACS_W"             : BLWE_ACS_W,
+            "BLWE_SUBW_COEF_NB"      : BLWE_SUBW_COEF_NB,
+            "BLWE_SUBW_NB"           : BLWE_SUBW_NB}
+
+#=====================================================
+# check_ks
+#=====================================================
+def check_ks(batch_pbs_nb, r, s, glwe_k, ks_l, lbx, lby, lbz, ksk_w, axi_w, q_w):
+    """
+    Return the list of the reasons why the KS parameters are not supported.
+    Empty if they are.
+    """
+    p = ks_param(batch_pbs_nb, r, s, glwe_k, ks_l, lbx, lby, lbz, ksk_w, axi_w, q_w)
+    err_l = []
+    # From KS process
+    if (p["COLUMN_PROC_CYCLE_MIN"] < p["READ_PIPE_CYCLE_MAX"]):
+        err_l.append("Unsupported LBX, LBY, LBZ. Not enough time to empty the KS output pipe.")
+    if (p["BLWE_SUBW_NB"]*p["BLWE_SUBW_COEF_NB"] != lby):
+        err_l.append(f"Unsupported LBY value. Should have: BLWE_SUBW_NB({p['BLWE_SUBW_NB']})*BLWE_SUBW_COEF_NB({p['BLWE_SUBW_COEF_NB']}) == LBY({lby})")
+    # From ksk_if
+    ksk_coef = p["KSK_COEF_PER_AXI4_WORD"]
+    if ((lby > ksk_coef) and ((lby // ksk_coef)*ksk_coef != lby)):
+        err_l.append(f"Unsupported : LBY {lby} should be a multiple of KSK_COEF_PER_AXI4_WORD {ksk_coef:.0f}")
+    if ((lby < ksk_coef) and (ksk_coef//lby)*lby != ksk_coef ):
+        err_l.append(f"Unsupported : LBY {lby} should divide KSK_COEF_PER_AXI4_WORD {ksk_coef:.0f}")
+    return err_l
+
 #=====================================================
 # Main
 #=====================================================
@@ -66,56 +129,20 @@ if __name__ == '__main__':
     AXI_W = args.axi_w
     Q_W = args.q_w
 
-#=====================================================
-# Intermediate values
-#=====================================================
-
-    KS_LG_NB = (KS_L + LBZ-1) // LBZ;
-    BLWE_K = (R ** S) * GLWE_K
-    KS_BLOCK_LINE_NB = (BLWE_K + LBY-1) // LBY;
-    COLUMN_PROC_CYCLE_MIN = KS_BLOCK_LINE_NB * KS_LG_NB;
-    READ_PIPE_CYCLE_MAX   = LBX * BATCH_PBS_NB;
-    if ((LBZ * KSK_W) > 32):
-        KSK_ACS_W = 64
-    else:
-        KSK_ACS_W = 32
-    KSK_COEF_PER_AXI4_WORD  = AXI_W/KSK_ACS_W
-
-    if (Q_W > 32):
-        BLWE_ACS_W = 64
-    else:
-        BLWE_ACS_W = 32
-    if (LBY < (AXI_W // BLWE_ACS_W)):
-        BLWE_SUBW_COEF_NB = LBY
-    else:
-        BLWE_SUBW_COEF_NB = (AXI_W // BLWE_ACS_W)
-    BLWE_SUBW_NB = LBY // BLWE_SUBW_COEF_NB
-
 #=====================================================
 # Check
 #=====================================================
+    p = ks_param(BATCH_PBS_NB, R, S, GLWE_K, KS_L, LBX, LBY, LBZ, KSK_W, AXI_W, Q_W)
     if (VERBOSE):
-      print("INFO> KS_LG_NB={:0d}".format(KS_LG_NB))
-      print("INFO> KS_BLOCK_LINE_NB={:0d}".format(KS_BLOCK_LINE_NB))
+      print("INFO> KS_LG_NB={:0d}".format(p["KS_LG_NB"]))
+      print("INFO> KS_BLOCK_LINE_NB={:0d}".format(p["KS_BLOCK_LINE_NB"]))
       print("INFO> BATCH_PBS_NB={:0d}".format(BATCH_PBS_NB))
       print("INFO> LBX={:0d}".format(LBX))
-      print("INFO> READ_PIPE_CYCLE_MAX={:0d}".format(READ_PIPE_CYCLE_MAX))
+      print("INFO> READ_PIPE_CYCLE_MAX={:0d}".format(p["READ_PIPE_CYCLE_MAX"]))
 
-    # From KS process
-    if (COLUMN_PROC_CYCLE_MIN < READ_PIPE_CYCLE_MAX):
-        if (VERBOSE):
-            print("ERROR> Unsupported LBX, LBY, LBZ. Not enough time to empty the KS output pipe.")
-        sys.exit(1)
-    if (BLWE_SUBW_NB*BLWE_SUBW_COEF_NB != LBY):
-        if (VERBOSE):
-            print("ERROR> Unsupported LBY value. Should have: BLWE_SUBW_NB(%0d)*BLWE_SUBW_COEF_NB(%0d) == LBY(%0d)", BLWE_SUBW_NB,BLWE_SUBW_COEF_NB,LBY)
-        sys.exit(1)
-    # From ksk_if
-    if ((LBY > KSK_COEF_PER_AXI4_WORD) and ((LBY // KSK_COEF_PER_AXI4_WORD)*KSK_COEF_PER_AXI4_WORD != LBY)):
-        if (VERBOSE):
-            print("ERROR> Unsupported : LBY {:0d} should be a multiple of KSK_COEF_PER_AXI4_WORD {:0d}",LBY,KSK_COEF_PER_AXI4_WORD)
-        sys.exit(1)
-    if ((LBY < KSK_COEF_PER_AXI4_WORD) and (KSK_COEF_PER_AXI4_WORD//LBY)*LBY != KSK_COEF_PER_AXI4_WORD ):
+    err_l = check_ks(BATCH_PBS_NB, R, S, GLWE_K, KS_L, LBX, LBY, LBZ, KSK_W, AXI_W, Q_W)
+    if (len(err_l) > 0):
         if (VERBOSE):
-            print("ERROR> Unsupported : LBY {:0d} should divide KSK_COEF_PER_AXI4_WORD {:0d}",LBY,KSK_COEF_PER_AXI4_WORD)
+            for e in err_l:
+                print(f"ERROR> {e}")
         sys.exit(1)
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# BSD 3-Clause Clear License
+# Copyright © 2025 ZAMA. All rights reserved.
+
+import os
+import sys
+import csv
+import argparse # parse input argument
+
+from pep_ks_check_param import ks_param, check_ks
+
+# Shared performance model
+sys.path.append(os.path.join(os.getenv("PROJECT_DIR"), "hw/scripts/simu"))
+from hpu_perf_model import ks_cost, DEFAULT_CLK_MHZ
+
+#==================================================================================================
+# This script explores the LBX LBY and LBZ parameters.
+# For a parameter set, all the supported (LBX, LBY, LBZ) are enumerated (see pep_ks_check_param.py).
+# For each of them are estimated (see hpu_perf_model.py):
+#   * the KS cycles per batch, and the corresponding throughput
+#   * the KSK bandwidth needed not to slow the KS down, in GB/s
+#   * resource proxies : number of multipliers, depth and size of the BLWE RAM. The size counts
+#     whole RAM blocks : the depth is rounded up to BRAM_DEPTH.
+# The Pareto front of the throughput against the resources is output.
+#==================================================================================================
+
+#=====================================================
+# Global var
+#=====================================================
+RAM_W = 64
+# Depth of a RAM block. Same as the tb_hpu parameter generation.
+BRAM_DEPTH = 1024
+COL_L = ['LBX', 'LBY', 'LBZ', 'ks_cycle', 'ks_bound', 'pbs_per_s', 'ksk_gBps', 'mult_nb', 'blram_depth', 'blram_kbit']
+
+#=====================================================
+# check_ksk
+#=====================================================
+def check_ksk(ksk_pc, r, s, glwe_k, lby, lbz, ksk_w, axi_w):
+    """
+    Checks the KSK storage and its split among the PC.
+    Same as cstr_ksk_w and cstr_ksk_pc of the tb_hpu parameter generation.
+    """
+    if ((lbz * ksk_w) > RAM_W):
+        return False
+    ksk_acs_w = 64 if ((lbz * ksk_w) > 32) else 32
+    pc_coef   = axi_w // ksk_acs_w
+    blwe_k    = (r**s) * glwe_k
+    return ((ksk_pc == 1)
+            or ((ksk_pc <= lby)
+                 and (blwe_k % (ksk_pc * pc_coef) == 0)))
+
+#=====================================================
+# explore
+#=====================================================
+def explore(args):
+    """
+    Return the estimations of all the supported (LBX, LBY, LBZ).
+    """
+    row_l = []
+    lby_l = [2**i for i in range(args.lby_max.bit_length()) if 2**i <= args.lby_max]
+    for lbx in range(1, args.lbx_max+1):
+        for lby in lby_l:
+            for lbz in range(1, args.lbz_max+1):
+                if (len(check_ks(args.batch_pbs_nb, args.radix, args.stage, args.glwe_k, args.ks_l,
+                                 lbx, lby, lbz, args.ksk_w, args.axi_w, args.q_w)) > 0):
+                    continue
+                if not(check_ksk(args.ksk_pc, args.radix, args.stage, args.glwe_k, lby, lbz, args.ksk_w, args.axi_w)):
+                    continue
+                p = ks_param(args.batch_pbs_nb, args.radix, args.stage, args.glwe_k, args.ks_l,
+                             lbx, lby, lbz, args.ksk_w, args.axi_w, args.q_w)
+                c = ks_cost({'R': args.radix, 'S': args.stage, 'GLWE_K': args.glwe_k, 'BATCH_PBS_NB': args.batch_pbs_nb,
+                             'LWE_K': args.lwe_k, 'KS_L': args.ks_l, 'LBX': lbx, 'LBY': lby, 'LBZ': lbz,
+                             'MOD_KSK_W': args.ksk_w, 'KSK_PC': args.ksk_pc, 'AXI_W': args.axi_w})
+                blram_depth = p["KS_BLOCK_LINE_NB"] * args.batch_pbs_nb
+                blram_block_depth = ((blram_depth + BRAM_DEPTH-1) // BRAM_DEPTH) * BRAM_DEPTH
+                row_l.append({'LBX'         : lbx,
+                              'LBY'         : lby,
+                              'LBZ'         : lbz,
+                              'ks_cycle'    : c["ks_cycle"],
+                              'ks_bound'    : c["ks_bound"],
+                              'pbs_per_s'   : args.batch_pbs_nb * args.clk_mhz * 1e6 / c["ks_cycle"],
+                              # Bandwidth needed to keep the multipliers busy
+                              'ksk_gBps'    : c["ksk_bit"] / 8 * args.clk_mhz * 1e6 / c["ks_mult_cycle"] / 1e9,
+                              'mult_nb'     : lbx * lby * lbz,
+                              'blram_depth' : blram_depth,
+                              'blram_kbit'  : blram_block_depth * lby * p["BLWE_ACS_W"] / 1024})
+    return row_l
+
+#=====================================================
+# pareto
+#=====================================================
+def pareto(row_l):
+    """
+    Keep the configurations that are not dominated : no other one is at least as fast,
+    with at most as many multipliers and as much RAM, and strictly better on one of them.
+    """
+    def key(r):
+        return (r['ks_cycle'], r['mult_nb'], r['blram_kbit'])
+    def dominates(a, b):
+        return all(x <= y for (x,y) in zip(key(a), key(b))) and (key(a) != key(b))
+    front_l = [r for r in row_l if not(any(dominates(o, r) for o in row_l))]
+    return sorted(front_l, key=lambda r: (r['mult_nb'], r['ks_cycle']))
+
+#=====================================================
+# Main
+#=====================================================
+if __name__ == '__main__':
+    # Default values
+    BATCH_PBS_NB=8
+    R=2
+    S=11
+    GLWE_K=1
+    AXI_W=512
+    KSK_W=21
+    Q_W=64
+    LWE_K=32
+    KSK_PC=16
+#=====================================================
+# Parse input arguments
+#=====================================================
+    parser = argparse.ArgumentParser(description = "Explore LBX, LBY, LBZ")
+    parser.add_argument('-dM', dest='batch_pbs_nb',  type=int, help="Max number of PBS per batch",
+                               default=BATCH_PBS_NB)
+    parser.add_argument('-R',  dest='radix',          type=int, help="Radix.",
+                               default=R)
+    parser.add_argument('-S', dest='stage',           type=int, help="Number of NTT stages.",
+                               default=S)
+    parser.add_argument('-g',  dest="glwe_k",         type=int, help="GLWE_K: Number of polynomials",
+                               default=GLWE_K)
+    parser.add_argument('-K',  dest="lwe_k",          type=int, help="LWE_K: Number of LWE mask coefficients",
+                               default=LWE_K)
+    parser.add_argument('-L', dest='ks_l',        type=int, help="Number key_switch levels",
+                               required=True)
+    parser.add_argument('-A', dest='axi_w',       type=int, help="AXI4 bus width",
+                               default=AXI_W)
+    parser.add_argument('-V', dest='ksk_w',       type=int, help="KSK width",
+                               default=KSK_W)
+    parser.add_argument('-W', dest='q_w',         type=int, help="Ciphertext coef width",
+                               default=Q_W)
+    parser.add_argument('-P', dest='ksk_pc',      type=int, help="Number of KSK memory PC",
+                               default=KSK_PC)
+    parser.add_argument('-lbx_max',               type=int, help="Max LBX explored",
+                               default=8)
+    parser.add_argument('-lby_max',               type=int, help="Max LBY explored (power of 2)",
+                               default=128)
+    parser.add_argument('-lbz_max',               type=int, help="Max LBZ explored",
+                               default=4)
+    parser.add_argument('-clk_mhz',               type=float, help="Clock frequency in MHz",
+                               default=DEFAULT_CLK_MHZ)
+    parser.add_argument('-csv',                   type=str, help="Write the Pareto front in this csv file",
+                               default=None)
+    parser.add_argument('-all',                             help="Output all the supported configurations, not only the Pareto front",
+                               default=False, action="store_true")
+
+    args = parser.parse_args()
+
+#=====================================================
+# Explore
+#=====================================================
+    row_l = explore(args)
+    if (len(row_l) == 0):
+        sys.exit("ERROR> No supported LBX, LBY, LBZ.")
+    front_l = pareto(row_l)
+    print(f"INFO> {len(row_l)} supported (LBX, LBY, LBZ), {len(front_l)} on the Pareto front")
+    out_l = sorted(row_l, key=lambda r: (r['mult_nb'], r['ks_cycle'])) if args.all else front_l
+
+#=====================================================
+# Output
+#=====================================================
+    print(" ".join(f"{c:>11}" for c in COL_L))
+    for r in out_l:
+        print(" ".join(f"{r[c]:>11.1f}" if isinstance(r[c], float) else f"{r[c]:>11}" for c in COL_L))
+
+    if (args.csv != None):
+        with open(args.csv, 'w', newline='') as fp:
+            w = csv.DictWriter(fp, fieldnames=COL_L)
+            w.writeheader()
+            w.writerows(out_l)
+        print(f"INFO> Written in {args.csv}")
@@ -10,18 +10,175 @@
 # ==============================================================================================
 
 import argparse
-from collections import namedtuple
+from collections import deque, namedtuple
+import contextlib
+import ctypes
+import datetime
+import hashlib
+import heapq
+import hmac
+import io
+import json
 import junit_xml as jxml
-from threading import Lock
-import concurrent.futures
+from threading import Lock, Thread, Timer
 import os
 import pandas
 from pathlib import Path
+import queue
 import random
-import resource
+import re
+import secrets
+import shutil
+import signal
+import socket
+import socketserver
+import sqlite3
 import subprocess
+import sys
+import time
 
-test_t = namedtuple('test', ('name group path seed timeout'))
+# File lists are resolved by run_edalize
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'edalize'))
+import run_edalize
+
+# Coordinator/worker protocol: JSON objects, one per line.
+# Worker -> coordinator:
+#  * hello  : worker name and shared token. The coordinator closes the connection of a worker
+#             with a wrong token, or that does not start with hello.
+#  * get    : request a build group fitting in the free cpus and memory of the worker
+#  * log    : one output line of a running test
+#  * log_end: the build of a group is over, its log is complete
+#  * result : result of a test, same format as the journal
+# Coordinator -> worker, answer to get:
+#  * group  : build group to run
+#  * wait   : no group fits, ask again later
+#  * done   : the campaign is over
+# When a worker disconnects, its unfinished tests are rescheduled.
+WORKER_POLL_PERIOD = 1.0
+# Host of the coordinator when none is given: listening on other interfaces must be explicit.
+DEFAULT_HOST = '127.0.0.1'
+# Environment variable holding the shared token, when not given with --token
+TOKEN_ENV = 'NREG_TOKEN'
+
+# Resources used by a test, when not given in the csv file
+DEFAULT_CPUS = 1
+DEFAULT_MEM_GB = 1
+# Predicted duration of a test without history nor timeout, in second.
+# Large enough for unknown tests to be scheduled early.
+DEFAULT_DURATION = 3600
+# Number of past passing runs used to predict the duration of a test
+HISTORY_DEPTH = 5
+
+# Run history database
+DB_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id         INTEGER PRIMARY KEY AUTOINCREMENT,
+    campaign   TEXT,
+    git_commit TEXT,
+    name       TEXT,
+    test_group TEXT,
+    path       TEXT,
+    seed       TEXT,
+    build      TEXT,
+    status     TEXT,
+    rcode      INTEGER,
+    start      TEXT,
+    duration   REAL,
+    utime      REAL,
+    stime      REAL,
+    maxrss_kb  INTEGER,
+    signature  TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_name ON runs (name);
+CREATE TABLE IF NOT EXISTS params (
+    run_id     INTEGER,
+    name       TEXT,
+    value      TEXT
+);
+CREATE INDEX IF NOT EXISTS params_run ON params (run_id);
+"""
+# Randomized parameters are read in the run_edalize commands printed by the simu scripts:
+# -P <name> <type> <value> and -F <name> <value>
+RUN_CMD_TAG = 'INFO> Running :'
+
+# Reproducer bundles
+# Parameter generator commands, and generated parameter files content, printed by the simu scripts
+GEN_CMD_RE = re.compile(r'> INFO: run (.*gen_\w*param\w*\.py.*)$')
+PARAM_FILE_TAG = 'INFO> Parameter file :'
+PARAM_FILE_END_TAG = 'INFO> Parameter file end'
+# Stimuli directories, relative to the test Path, copied with --repro-stimuli
+STIMULI_DIR_L = ['gen/input']
+
+# Adaptive seed budgeting
+# Number of last runs of a test used to evaluate its failure rate and parameter discovery rate
+ADAPT_WINDOW = 20
+# A test gets between 1 and ADAPT_MAX_FACTOR times its csv seed count
+ADAPT_MAX_FACTOR = 4
+# Weight of a test = ADAPT_BASE_WEIGHT + failure rate + discovery rate
+ADAPT_BASE_WEIGHT = 0.1
+# Number of last log lines kept in memory per test, for the junit report
+TAIL_LINES = 200
+
+# Time given to the processes of a test to exit after SIGTERM, before SIGKILL, in second
+TERM_GRACE = 10
+# Time given to the processes to exit after SIGKILL, before giving up on them (ex: uninterruptible sleep)
+KILL_GRACE = 5
+# prctl option making nreg the parent of the orphaned processes of its tests
+PR_SET_CHILD_SUBREAPER = 36
+
+# Change-based selection
+# A change in these directories (run_edalize, CI scripts) affects all the tests.
+GLOBAL_DEP_DIRS = ['hw/scripts']
+# Project files used by the simu scripts: ${PROJECT_DIR}/<path>. Outputs are not dependencies.
+SCRIPT_REF_RE = re.compile(r'\$\{?PROJECT_DIR\}?/([\w./-]+)')
+SCRIPT_REF_EXCL_DIRS = ['hw/output']
+
+ANSI_RE = re.compile(r'\x1b\[[0-9;]*m')
+# Failure signatures
+# Simulator $error/$fatal messages, and testbench errors (> ERROR: ...)
+SIM_ERROR_RE = re.compile(r'\bERROR\b|\bError\b|\bFATAL\b|\bFatal\b')
+TRACEBACK_TAG = 'Traceback (most recent call last):'
+# Fallback: any error-like line. FAILURE>/SUCCEED> lines of the simu scripts only repeat the command.
+SIGNATURE_RE = re.compile(r'error|fail|fatal', re.IGNORECASE)
+SCRIPT_STATUS_RE = re.compile(r'^(FAILURE|SUCCEED)>')
+# Normalization: variable parts of a message are masked. A number is masked with its decimals,
+# exponent and time unit, but not within an identifier (tb_1).
+SIGNATURE_MASK_L = [(re.compile(r'(?<![\w.])(/[\w.+-]+)+'), '<PATH>'),
+                    (re.compile(r'\b0x[0-9a-fA-F_]+\b'), '<HEX>'),
+                    (re.compile(r"\b\d+'[bdhoBDHO][0-9a-fA-FxXzZ_]+"), '<N>'),
+                    (re.compile(r'(?<![\w.])\d+(\.\d+)?([eE][+-]?\d+)?([fpnum]?s)?(?!\w)'), '<N>'),
+                    (re.compile(r'\s+'), ' ')]
+
+# phase is set for the jobs of a build group: 'build' to build its testbench, 'run' to run the
+# simulation of a seed from a copy of the build. See get_group_jobs.
+test_t = namedtuple('test', ('name group path seed timeout cpus mem build phase'),
+                    defaults=(DEFAULT_CPUS, DEFAULT_MEM_GB, None, None))
+# stdout and stderr are the tails of the outputs, the full log is in file
+log_t = namedtuple('log', ('stdout stderr file'))
+# Resource usage of a test read back from the journal
+rusage_t = namedtuple('rusage', ('ru_utime ru_stime ru_maxrss'))
+
+JOURNAL_LOCK = Lock()
+
+# Running tests, for the status line: (name, seed) -> [start time, last log line]
+RUNNING_D = {}
+RUNNING_LOCK = Lock()
+
+# Leftover processes of the tests, killed and reaped: (test name, seed, pid, command line)
+REAPED_L = []
+REAPED_LOCK = Lock()
+
+# Lines of run_simu.sh that draw compile-time parameters. Such scripts build a different
+# testbench at each call, hence their seeds cannot share the same build.
+# The temporary file name drawn with $RANDOM does not affect the build.
+RANDOM_PARAM_RE = re.compile(r'\$RANDOM|\bshuf\b|gen_\w*param\w*\.py')
+# Calls of run_edalize in run_simu.sh, directly or through the run.sh of the testbench, and the
+# loops around them.
+BUILD_CALL_RE = re.compile(r'\$\{?run_edalize\b|python3?\s+\S*run_edalize\.py|/run\.sh\b')
+LOOP_DO_RE = re.compile(r'(?:^|;)\s*do\b')
+LOOP_DONE_RE = re.compile(r'(?:^|;)\s*done\b')
+# Line printed by run_edalize once the testbench is built, when the simulation is skipped (-y run).
+BUILD_DONE_RE = re.compile(rb'^INFO> Build done : run stage skipped\.')
 
 def add_cli_args(cli_parser):
     # Nreg arguments {{{
@@ -44,6 +201,16 @@ def add_cli_args(cli_parser):
             action='append',
             help='Specify the filtering rules for regression kind. [%(default)s]\n')
 
+    nreg_grp.add_argument('-c', '--changed', type=str, dest='changed', default=None,
+            help='Only run the tests affected by the files changed in the git revision range\n'
+                 '(ex: origin/main..HEAD, or a single revision to compare with the working tree).\n'
+                 'A test is affected if a changed file is in the dependency closure of its\n'
+                 'file_list.json, whatever the parsing flags, in its Path, or used by its scripts.\n')
+    nreg_grp.add_argument('-su', '--sample-unaffected', type=int, dest='sample_unaffected',
+                          default=0,
+            help='With --changed, also run this number of tests randomly chosen among the\n'
+                 'unaffected ones. [%(default)s]\n')
+
     nreg_grp.add_argument(type=str, dest='csv_file',
                           nargs='?', default='nreg.csv',
             help='Specify the csv file that describes regression content. [%(default)s]\n')
@@ -53,13 +220,69 @@ def add_cli_args(cli_parser):
     exec_grp = cli_parser.add_argument_group(title='Execution options')
     exec_grp.add_argument('-mc', '--max-cpus', type=int, dest='max_cpus',
             help='Specify the maximum number of cpus to use. [All cpus]\n', default=None)
+    exec_grp.add_argument('-mm', '--max-mem', type=float, dest='max_mem',
+            help='Specify the maximum memory, in GB, used by the running tests. The memory of a\n'
+                 'test is given by the optional MemGB column of the csv file, its number of\n'
+                 'cpus by the optional Cpus column. [All memory]\n', default=None)
+    exec_grp.add_argument('-sb', '--seed-budget', type=float, dest='seed_budget', default=None,
+            help='Adaptive seeds: distribute this budget of cpu-hours among the Seed<0 tests,\n'
+                 'instead of their fixed seed count. Tests with recent failures, or whose last seeds\n'
+                 'still produced new randomized parameter values, get more seeds. The long-stable\n'
+                 'ones get fewer. Each test gets between 1 and 4x its seed count.\n')
+    exec_grp.add_argument('-db', '--db', type=str, dest='db',
+                          default=None,
+            help='Specify the SQLite database where the test results are recorded. The durations\n'
+                 'are used to run the longest tests first. [<out_path>/nreg_history.db]\n')
+    exec_grp.add_argument('-q', '--query', type=str, dest='query',
+                          choices=['flaky', 'duration', 'first-fail'], default=None,
+            help='Query the database instead of running the tests, for the tests selected with\n'
+                 '-tn, or all the tests:\n'
+                 ' * flaky      : failure rate, and number of commits with both pass and fail\n'
+                 ' * duration   : mean duration and peak memory of the last commits\n'
+                 ' * first-fail : for the failing tests, first commit of the failure streak\n')
     exec_grp.add_argument('-out', '--out-path', type=str, dest='out_path',
                           default='hw/output/ci',
             help='Specify the output path folder. [%(default)s]\n')
 
+    exec_grp.add_argument('-nb', '--no-build-share', dest='build_share',
+                          action='store_false', default=True,
+            help='Build the testbench for each seed, instead of once per build group.\n')
+
     exec_grp.add_argument('-r', '--report-junit', type=str, dest='report_junit',
                           default='nreg_rpt.xml',
             help='Specify the junit report filename. [%(default)s]\n')
+    exec_grp.add_argument('-rp', '--report-period', type=float, dest='report_period',
+                          default=30.0,
+            help='Specify the minimum time, in seconds, between two junit report renderings.\n'
+                 'The report is always rendered at exit. [%(default)s]\n')
+    exec_grp.add_argument('-j', '--journal', type=str, dest='journal',
+                          default=None,
+            help='Specify the journal file, where the planned tests and the results are appended.\n'
+                 '[<out_path>/nreg_journal.jsonl]\n')
+    exec_grp.add_argument('--resume', dest='resume', action='store_true', default=False,
+            help='Resume the campaign of the journal: run only its planned tests that are not\n'
+                 'recorded as finished. Test selection and seeds are taken from the journal.\n')
+    exec_grp.add_argument('--serve', type=str, dest='serve', default=None,
+            help='Coordinator mode: serve the tests to workers on [HOST:]PORT, instead of running\n'
+                 'them locally. Reports, journal and database are written by the coordinator.\n'
+                 'HOST is 127.0.0.1 by default: give 0.0.0.0, or an interface address, to serve\n'
+                 'remote workers.\n')
+    exec_grp.add_argument('--worker', type=str, dest='worker', default=None,
+            help='Worker mode: run the tests served by the coordinator [HOST:]PORT, within -mc cpus\n'
+                 'and -mm memory. Outputs are streamed back to the coordinator. Only the tests of\n'
+                 'the local csv file are run.\n')
+    exec_grp.add_argument('--token', type=str, dest='token', default=os.environ.get(TOKEN_ENV),
+            help='Shared token of the coordinator and its workers. Prefer the NREG_TOKEN\n'
+                 'environment variable, not visible in the process list. When the coordinator\n'
+                 'has none, it generates and prints one. [$NREG_TOKEN]\n')
+    exec_grp.add_argument('--repro-stimuli', dest='repro_stimuli', action='store_true',
+                          default=False,
+            help='Copy the stimuli of the failing tests in their reproducer bundle. By default,\n'
+                 'the replay regenerates them from the recorded seed.\n')
+    exec_grp.add_argument('-st', '--status', type=float, dest='status', nargs='?',
+                          const=2.0, default=None,
+            help='Display a status line with the running tests, their elapsed time and their\n'
+                 'last log line, refreshed every STATUS seconds. [2.0 when set]\n')
     # }}}
 
 def get_list_of_test(args):
@@ -88,19 +311,110 @@ def get_list_of_test(args):
     # Also remove all !Enabled test
     return nreg_list[nreg_list["Enabled"] == True]
 
-def expand_tests(nreg_list, args):
+def get_changed_files(pdir, rev_range):
+    """
+    Return the files changed in the git revision range, relative to pdir.
+    """
+    out = subprocess.run(['git', '-C', pdir, 'diff', '--name-only', '--relative', rev_range],
+                         capture_output=True, check=True).stdout.decode("UTF-8")
+    return [l for l in out.splitlines() if len(l) > 0]
+
+def get_test_dependencies(path, pdir):
+    """
+    Return the dependencies of a test that are not in its file_list.json: directories relative
+    to pdir.
+    * the test Path directory: testbench sources, simu scripts, parameter generators,
+    * the project files referenced by its scripts,
+    * GLOBAL_DEP_DIRS.
+    """
+    dir_l = [os.path.normpath(path)] + GLOBAL_DEP_DIRS
+    script_dir = Path(pdir) / path / 'scripts'
+    for script in list(script_dir.glob('*.sh')) if script_dir.is_dir() else []:
+        for ref in SCRIPT_REF_RE.findall(script.read_text(errors='replace')):
+            ref = os.path.normpath(ref)
+            if not any(ref == d or ref.startswith(d + '/') for d in SCRIPT_REF_EXCL_DIRS):
+                dir_l.append(ref)
+    return dir_l
+
+def get_impacting_files(changed_l, path, pdir):
+    """
+    Return the changed files, relative to pdir, that the file_list.json of a test depends on.
+    The file_lists are resolved by run_edalize. Unlike a run of run_edalize, no parsing flag, tool
+    env nor sva selection is given, since they are chosen by run_simu.sh, possibly at random: all
+    the flagged files and dependencies are taken. The file_lists generated by the simu scripts,
+    in the test directory, are skipped when missing.
+    Return None if the test has no file_list.json, or if it cannot be resolved.
+    """
+    top_file_list = os.path.join(pdir, path, 'info', 'file_list.json')
+    if not os.path.isfile(top_file_list):
+        return None
+    files_d = {}
+    dag_d = {}
+    try:
+        # The file_lists are kept in run_edalize cache, for the next tests
+        with contextlib.redirect_stdout(io.StringIO()):
+            run_edalize.parse_files(top_file_list, files_d, True, [], {}, True, ['all'], dag_d, True)
+    except SystemExit:
+        return None
+    impacted_l = run_edalize.get_impacting_files([os.path.join(pdir, c) for c in changed_l],
+                                                 top_file_list, dag_d, files_d)
+    return [os.path.relpath(c, pdir) for c in impacted_l]
+
+def select_changed(nreg_list, args, pdir):
+    """
+    Keep the tests affected by the changes of args.changed, and args.sample_unaffected randomly
+    chosen unaffected tests.
+    """
+    changed_l = get_changed_files(pdir, args.changed)
+    print(f"Files changed in {args.changed}: {len(changed_l)}")
+    affected_l = []
+    unaffected_l = []
+    for (idx, row) in nreg_list.iterrows():
+        impacted_l = get_impacting_files(changed_l, row["Path"], pdir)
+        if impacted_l is None:
+            print(f"WARNING: {row['Name']} has no valid file_list.json, considered as affected")
+            affected_l.append(idx)
+            continue
+        dir_l = get_test_dependencies(row["Path"], pdir)
+        reason_l = [c for c in changed_l
+                    if c in impacted_l or any(c == d or c.startswith(d + '/') for d in dir_l)]
+        if reason_l:
+            print(f"\t {row['Name']} affected by {' '.join(reason_l[:3])}{' ...' if len(reason_l) > 3 else ''}")
+            affected_l.append(idx)
+        else:
+            unaffected_l.append(idx)
+    sample_l = random.sample(unaffected_l, min(args.sample_unaffected, len(unaffected_l)))
+    print(f"Affected tests: {len(affected_l)}, unaffected: {len(unaffected_l)}, sampled unaffected: {len(sample_l)}")
+    return nreg_list[nreg_list.index.isin(affected_l + sample_l)]
+
+def get_resource(entry, column, default):
+    """
+    Read an optional resource column of the csv file.
+    """
+    val = entry.get(column, default)
+    if pandas.isna(val):
+        return default
+    return val
+
+def expand_tests(nreg_list, args, seed_nb_d=None):
     """
     Expand the Seed field to convert a Dataframe into a list of test to execute.
     Seed meaning is as follow:
      * Positive value -> run the test with the given seed
      * Negative value -> run the test multiple time with a random seed
+    seed_nb_d, if given, overrides the number of random seeds: test name -> number of seeds
      """
     test_list = []
     for row in nreg_list.iterrows():
         entry = dict(row[1])
         seed = entry['Seed']
+        cpus = int(get_resource(entry, "Cpus", DEFAULT_CPUS))
+        mem = float(get_resource(entry, "MemGB", DEFAULT_MEM_GB))
         if seed < 0:
-            for i in range(int(abs(seed))):
+            seed_nb = int(abs(seed))
+            if seed_nb_d is not None:
+                seed_nb = seed_nb_d.get(entry["Name"], seed_nb)
+            for i in range(seed_nb):
                 rseed = random.randrange(0, 1<<64)
                 test_list.append(test_t(
                     name = entry["Name"],
@@ -108,28 +422,170 @@ def expand_tests(nreg_list, args):
                     path = entry["Path"],
                     seed = rseed,
                     timeout = entry["Timeout"],
+                    cpus = cpus,
+                    mem = mem,
                     ))
         else:
             test_list.append(test_t(
                 name = entry["Name"],
                 group = entry["Group"],
                 path = entry["Path"],
-                seed = rseed,
+                seed = seed,
                 timeout = entry["Timeout"],
+                cpus = cpus,
+                mem = mem,
             ))
     return test_list
 
-def run_test(test, pdir, out_path, args=None):
+def is_build_shareable(script):
     """
-    Run a single test defined in a test_t namedtuple
+    Check that run_simu.sh builds a single testbench, with fixed compile-time parameters: it
+    does not randomize them, and calls run_edalize once, outside any loop. A script looping over
+    several parameter combinations stops after the first one when the simulation is skipped
+    (-y run), so the build phase could not build the others.
+    """
+    depth = 0
+    call_nb = 0
+    with open(script, 'r') as fp:
+        for l in fp.readlines():
+            l = l.split('#')[0]
+            if 'TMP_FILE=' in l:
+                continue
+            if RANDOM_PARAM_RE.search(l):
+                return False
+            if BUILD_CALL_RE.search(l):
+                call_nb += 1
+                if (depth > 0) or (call_nb > 1):
+                    return False
+            depth += len(LOOP_DO_RE.findall(l)) - len(LOOP_DONE_RE.findall(l))
+    return True
+
+def group_tests(nreg_tests, pdir, args):
+    """
+    Group the tests that share the same build : same Path and same run_simu.sh content.
+    The compile-time parameters are fixed in run_simu.sh, hence are covered by its content.
+    Return a list of groups. Each group is a list of tests: the testbench is built once, then the
+    simulations of the seeds are run in parallel (see get_group_jobs).
+    Tests whose run_simu.sh randomizes compile-time parameters are alone in their group, with a
+    'build' field set to None.
+    """
+    group_d = {}
+    group_l = []
+    for test in nreg_tests:
+        script = Path(pdir) / test.path / 'scripts/run_simu.sh'
+        if not(args.build_share) or not(script.exists()) or not(is_build_shareable(script)):
+            group_l.append([test])
+            continue
+        with open(script, 'rb') as fp:
+            digest = hashlib.sha256(fp.read()).hexdigest()[:8]
+        key = (os.path.normpath(test.path), digest)
+        if key not in group_d:
+            group_d[key] = []
+            group_l.append(group_d[key])
+        group_d[key].append(test._replace(build=f'{Path(test.path).name}_{digest}'))
+    return group_l
+
+def get_group_jobs(group):
+    """
+    Return the first jobs of a group, for schedule_groups. A job is a list of tests run
+    sequentially.
+    A build group starts with the build of its testbench, a job of its own (phase 'build'). The
+    simulations of its seeds follow, see get_seed_jobs. The other tests are a job each.
+    """
+    if group[0].build is None:
+        return [[t] for t in group]
+    return [[group[0]._replace(phase='build')]]
+
+def get_seed_jobs(group, build_result, out_path, line_fn=None):
+    """
+    Return the jobs following the build of a group, and the results of its tests that will not run.
+    Once the testbench is built, the simulation of each seed is a job of its own (phase 'run').
+    If the build failed, the tests fail with the log of the build, also given to line_fn if any.
+    """
+    (build, log, info, rcode, is_timeout, duration) = build_result
+    if rcode == 0:
+        return ([[t._replace(phase='run')] for t in group], [])
+    result_l = []
+    for test in group:
+        log_file = Path(out_path) / 'logs' / f'{get_test_key(test)}.log'
+        shutil.copyfile(log.file, log_file)
+        if line_fn is not None:
+            with open(log_file, 'rb') as fp:
+                for l in fp:
+                    line_fn(test, l)
+        result_l.append((test, log._replace(file=log_file), info, rcode, is_timeout, duration))
+    return ([], result_l)
+
+def get_build_error_results(group, exc, out_path, line_fn=None):
+    """
+    Return the failed results of the tests of a group whose build raised exc: each test gets a log
+    with the error, also given to line_fn if any.
+    """
+    msg = f'ERROR: build of {group[0].build} generated an exception: {exc}\n'.encode()
+    result_l = []
+    for test in group:
+        log_file = Path(out_path) / 'logs' / f'{get_test_key(test)}.log'
+        log_file.parent.mkdir(parents=True, exist_ok=True)
+        log_file.write_bytes(msg)
+        if line_fn is not None:
+            line_fn(test, msg)
+        result_l.append((test, log_t(stdout=b'', stderr=msg, file=log_file), rusage_t(0.0, 0.0, 0),
+                         1, False, 0.0))
+    return result_l
+
+def get_test_key(test):
+    """
+    Return the name of the log of a test: <name>_<seed>, or <build>_build for the build of a group.
+    """
+    if test.phase == 'build':
+        return f'{test.build}_build'
+    return f'{test.name}_{test.seed}'
+
+def get_work_path(test, out_path):
+    """
+    Return the work directory of a test, given to run_simu.sh.
+    The build of a group is kept in out_path/build/<build>, from one campaign to the next: run_edalize
+    incremental strategy skips it when the sources and parameters are unchanged.
+    The other tests have their own work directory, since they run concurrently. The simulations of
+    a build group start from a copy of the build.
+    """
+    if test.phase == 'build':
+        return os.path.join(out_path, 'build', test.build)
+    return os.path.join(out_path, f'{test.name}_{test.seed}')
+
+def get_test_cmd(test, pdir, out_path):
+    """
+    Return the command line of a test.
     """
     # Construct path to script run_simu.sh and scripts args
     cmd = [Path(pdir) / test.path / 'scripts/run_simu.sh']
     cmd.extend(['--',
                 '-s', f'{test.seed} ',
-                '-d', f'{out_path} ',
+                '-d', f'{get_work_path(test, out_path)} ',
                 ]
                )
+    if test.phase is not None:
+        cmd.extend(['-k', 'incr'])
+    if test.phase == 'build':
+        cmd.extend(['-y', 'run'])
+    return cmd
+
+def copy_build(test, out_path):
+    """
+    Copy the build of the group of a test in its work directory: its simulation skips the build.
+    """
+    work_path = get_work_path(test, out_path)
+    shutil.rmtree(work_path, ignore_errors=True)
+    shutil.copytree(get_work_path(test._replace(phase='build'), out_path), work_path, symlinks=True)
+
+def run_test(test, pdir, out_path, args=None, line_fn=None):
+    """
+    Run a single test defined in a test_t namedtuple
+    line_fn(test, line) is called for each output line, in a reader thread.
+    """
+    cmd = get_test_cmd(test, pdir, out_path)
+    if test.phase == 'run':
+        copy_build(test, out_path)
 
     # Timeout is expressed in second
     if test.timeout > 0:
@@ -137,48 +593,986 @@ def run_test(test, pdir, out_path, args=None):
     else:
         timeout = None
 
-    # Call simu_run.sh and capture output
+    # Call simu_run.sh and stream its output in the log file
+    # Only the last lines are kept in memory, for the report.
+    # The child is started in its own session: on timeout, the whole process group is killed,
+    # and the processes left in the session when it exits are killed too.
+    # The child is reaped with wait4 to get its own resource usage, and not the cumulated one
+    # of all the children of nreg.
+    log_file = Path(out_path) / 'logs' / f'{get_test_key(test)}.log'
+    log_file.parent.mkdir(parents=True, exist_ok=True)
+    key = (test.name if test.phase != 'build' else f'{test.build} (build)', test.seed)
+    start = time.monotonic()
+    with RUNNING_LOCK:
+        RUNNING_D[key] = [start, b'']
+    log_fp = open(log_file, 'wb')
+    log_lock = Lock()
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            start_new_session=True)
+    tail_d = {'stdout': deque(maxlen=TAIL_LINES), 'stderr': deque(maxlen=TAIL_LINES)}
+    def read_pipe(key_out, pipe):
+        for l in iter(pipe.readline, b''):
+            tail_d[key_out].append(l)
+            with log_lock:
+                log_fp.write(l)
+            RUNNING_D[key][1] = l
+            if line_fn is not None:
+                line_fn(test, l)
+    reader_l = [Thread(target=read_pipe, args=(k, p), daemon=True)
+                for (k, p) in (('stdout', proc.stdout), ('stderr', proc.stderr))]
+    for r in reader_l:
+        r.start()
+
+    timeout_d = {'expired': False, 'kill_timer': None}
+    def expire():
+        timeout_d['expired'] = True
+        signal_group(proc.pid, signal.SIGTERM)
+        timeout_d['kill_timer'] = Timer(TERM_GRACE, signal_group, (proc.pid, signal.SIGKILL))
+        timeout_d['kill_timer'].start()
+    timer = Timer(timeout, expire) if timeout is not None else None
+    if timer is not None:
+        timer.start()
+
+    (pid, status, info) = os.wait4(proc.pid, 0)
+    duration = time.monotonic() - start
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    if timer is not None:
+        timer.cancel()
+    if timeout_d['kill_timer'] is not None:
+        timeout_d['kill_timer'].cancel()
+
+    # Kill what is left in the session, and add the resources of the reaped orphans
+    (utime, stime, maxrss) = (info.ru_utime, info.ru_stime, info.ru_maxrss)
+    for (o_pid, o_cmd, o_info) in kill_session(proc.pid):
+        with REAPED_LOCK:
+            REAPED_L.append((test.name, test.seed, o_pid, o_cmd))
+        if o_info is not None:
+            utime += o_info.ru_utime
+            stime += o_info.ru_stime
+            maxrss = max(maxrss, o_info.ru_maxrss)
+    info = rusage_t(utime, stime, maxrss)
+    for r in reader_l:
+        r.join()
+    log_fp.close()
+    with RUNNING_LOCK:
+        del RUNNING_D[key]
+
+    log = log_t(stdout=b''.join(tail_d['stdout']), stderr=b''.join(tail_d['stderr']), file=log_file)
+    is_timeout = timeout_d['expired']
+    rcode = 1 if is_timeout else proc.returncode
+    if test.phase == 'build' and not is_timeout:
+        # run_simu.sh reports the skipped simulation as a failure: the testbench is built when
+        # run_edalize says so. The shareable scripts call it once (see is_build_shareable).
+        with open(log_file, 'rb') as fp:
+            rcode = 0 if any(BUILD_DONE_RE.match(l) for l in fp) else 1
+    return(test, log, info, rcode, is_timeout, duration)
+
+def set_child_subreaper():
+    """
+    Make nreg the parent of the orphaned processes of its tests, instead of init, so that they can
+    be reaped and their resources measured. Linux only: no-op elsewhere.
+    """
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        if libc.prctl(PR_SET_CHILD_SUBREAPER, 1, 0, 0, 0) != 0:
+            print(f"WARNING: prctl(PR_SET_CHILD_SUBREAPER) failed: {os.strerror(ctypes.get_errno())}")
+    except (OSError, AttributeError):
+        None
+
+def signal_group(pgid, sig):
+    """
+    Send a signal to a process group, if it still exists.
+    """
+    try:
+        os.killpg(pgid, sig)
+    except (ProcessLookupError, PermissionError):
+        None
+
+def get_session_pids(sid):
+    """
+    Return the processes of a session: pid -> (parent pid, state, command line).
+    """
+    pid_d = {}
+    for proc_dir in Path('/proc').glob('[0-9]*'):
+        try:
+            stat = (proc_dir / 'stat').read_text()
+            # Command name is between parentheses, and may contain spaces
+            field_l = stat[stat.rindex(')')+2:].split()
+            if int(field_l[3]) != sid:
+                continue
+            cmdline = (proc_dir / 'cmdline').read_bytes().replace(b'\0', b' ').decode(errors='replace').strip()
+            pid_d[int(proc_dir.name)] = (int(field_l[1]), field_l[0], cmdline)
+        except (OSError, ValueError, IndexError):
+            continue
+    return pid_d
+
+def kill_session(sid):
+    """
+    Kill the processes left in the session of a finished test: SIGTERM, then SIGKILL after
+    TERM_GRACE seconds. The ones that are children of nreg (orphans) are reaped.
+    Processes still alive KILL_GRACE seconds after SIGKILL are left behind, with a warning.
+    Return the list of (pid, command line, rusage or None if not reaped by nreg). Orphans that
+    exited by themselves are also returned, with an empty command line.
+    """
+    killed_d = {}
+    reaped_d = {}
+    deadline = None
+    while True:
+        pid_d = get_session_pids(sid)
+        # Reap the dead orphans
+        for (pid, (ppid, state, cmdline)) in pid_d.items():
+            if ppid == os.getpid() and state == 'Z':
+                try:
+                    reaped_d[pid] = os.wait4(pid, 0)[2]
+                except ChildProcessError:
+                    None
+        alive_d = {p: v for (p, v) in pid_d.items() if v[1] != 'Z'}
+        for (pid, (ppid, state, cmdline)) in alive_d.items():
+            killed_d.setdefault(pid, cmdline)
+        if len(pid_d) == 0 or (len(alive_d) == 0 and all(v[0] != os.getpid() for v in pid_d.values())):
+            break
+        if deadline is None:
+            deadline = time.monotonic() + TERM_GRACE
+            for pid in alive_d:
+                try:
+                    os.kill(pid, signal.SIGTERM)
+                except ProcessLookupError:
+                    None
+        elif time.monotonic() > deadline + KILL_GRACE:
+            print(f"WARNING: session {sid}: {len(alive_d)} process(es) still alive after SIGKILL, left behind:")
+            for (pid, (ppid, state, cmdline)) in alive_d.items():
+                print(f'\t pid {pid} state {state} {cmdline[:120]}')
+            break
+        elif time.monotonic() > deadline:
+            for pid in alive_d:
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    None
+        time.sleep(0.1)
+    return [(pid, killed_d.get(pid, ''), reaped_d.get(pid)) for pid in set(killed_d) | set(reaped_d)]
+
+def print_reaped():
+    """
+    Print the leftover processes of the tests that have been killed or reaped.
+    """
+    if REAPED_L:
+        print(f"WARNING: {len(REAPED_L)} leftover process(es) of the tests were killed or reaped:")
+        for (name, seed, pid, cmdline) in REAPED_L:
+            print(f'\t {name} seed {seed}: pid {pid} {cmdline[:120]}')
+
+def run_job(job, pdir, out_path, args=None, test_done=None, line_fn=None):
+    """
+    Run sequentially the tests of a job.
+    test_done(test_result) is called after each test, in the running thread. The build of a group
+    is not a test: its result is only returned.
+    """
+    job_result = []
+    for test in job:
+        job_result.append(run_test(test, pdir, out_path, args, line_fn))
+        if test_done is not None and test.phase != 'build':
+            test_done(job_result[-1])
+    return job_result
+
+def run_group(group, pdir, out_path, max_cpus, max_mem, args=None, test_done=None, line_fn=None,
+              build_fn=None):
+    """
+    Run the tests of a group within max_cpus and max_mem, and return their results. The testbench
+    of a build group is built once, then the simulations of its seeds are run in parallel.
+    test_done(test_result) is called after each test, build_fn(build test) once the build is over.
+    """
+    group_result = []
+    def job_done(job, job_result, exc):
+        if build_fn is not None and job[0].phase == 'build':
+            build_fn(job[0])
+        if exc is not None:
+            print('ERROR: tests {} generated an exception: {}'.format([t.name for t in job], exc))
+            if job[0].phase != 'build':
+                return None
+            (job_l, fail_l) = ([], get_build_error_results(group, exc, out_path, line_fn))
+        elif job[0].phase != 'build':
+            group_result.extend(job_result)
+            return None
+        else:
+            (job_l, fail_l) = get_seed_jobs(group, job_result[0], out_path, line_fn)
+        for test_result in fail_l:
+            if test_done is not None:
+                test_done(test_result)
+        group_result.extend(fail_l)
+        return job_l
+    schedule_groups(get_group_jobs(group), {}, max_cpus, max_mem,
+                    lambda job: run_job(job, pdir, out_path, args, test_done, line_fn),
+                    job_done)
+    return group_result
+
+def journal_append(journal_file, record):
+    """
+    Append a record to the journal. The record is on disk when the function returns.
+    """
+    line = json.dumps(record, default=lambda o: o.item()) + '\n'
+    with JOURNAL_LOCK:
+        with open(journal_file, 'a') as fp:
+            fp.write(line)
+            fp.flush()
+            os.fsync(fp.fileno())
+
+def journal_plan(journal_file, campaign, commit, nreg_tests):
+    """
+    Start a new journal with the list of planned tests.
+    """
+    Path(journal_file).parent.mkdir(parents=True, exist_ok=True)
+    with open(journal_file, 'w'):
+        None
+    journal_append(journal_file, {'type': 'plan', 'campaign': campaign, 'commit': commit,
+                                  'tests': [t._asdict() for t in nreg_tests]})
+
+def result_to_record(test_result):
+    """
+    Convert a test result into a JSON serializable record.
+    """
+    (test, log, info, rcode, is_timeout, duration) = test_result
+    return {'type': 'result', 'test': test._asdict(),
+            'rcode': rcode, 'is_timeout': is_timeout, 'duration': duration,
+            'utime': info.ru_utime, 'stime': info.ru_stime, 'maxrss': info.ru_maxrss,
+            'stdout': log.stdout.decode("UTF-8", errors='replace'),
+            'stderr': log.stderr.decode("UTF-8", errors='replace'),
+            'log': str(log.file)}
+
+def result_from_record(record):
+    """
+    Convert back a record into a test result.
+    """
+    test = test_t(**record['test'])
+    log = log_t(stdout=record['stdout'].encode("UTF-8"),
+                stderr=record['stderr'].encode("UTF-8"),
+                file=Path(record['log']))
+    info = rusage_t(record['utime'], record['stime'], record['maxrss'])
+    return (test, log, info, record['rcode'], record['is_timeout'], record['duration'])
+
+def journal_result(journal_file, test_result):
+    """
+    Append a test result to the journal.
+    """
+    journal_append(journal_file, result_to_record(test_result))
+
+def journal_load(journal_file):
+    """
+    Read a journal. Return (campaign, commit, planned tests, finished test results).
+    A truncated last line, from an interrupted write, is ignored.
+    """
+    plan = None
+    result_l = []
+    with open(journal_file, 'r') as fp:
+        for l in fp:
+            try:
+                record = json.loads(l)
+            except ValueError:
+                continue
+            if record['type'] == 'plan':
+                plan = record
+                result_l = []
+            elif record['type'] == 'result':
+                result_l.append(result_from_record(record))
+    if plan is None:
+        raise ValueError(f'No plan found in journal {journal_file}')
+    return (plan['campaign'], plan['commit'], [test_t(**t) for t in plan['tests']], result_l)
+
+def get_git_commit(pdir):
+    """
+    Return the commit of the project directory, with a '-dirty' suffix if it has local
+    modifications. None if it is not a git repository.
+    """
+    try:
+        commit = subprocess.run(['git', '-C', pdir, 'rev-parse', 'HEAD'],
+                                capture_output=True, check=True).stdout.decode("UTF-8").strip()
+        dirty = subprocess.run(['git', '-C', pdir, 'status', '--porcelain', '--untracked-files=no'],
+                               capture_output=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ('-dirty' if dirty else '')
+
+def normalize_signature(line):
+    """
+    Mask the paths, numbers and seeds of a message, so that the failures with the same root cause
+    get the same signature.
+    """
+    for (mask_re, repl) in SIGNATURE_MASK_L:
+        line = mask_re.sub(repl, line)
+    return line.strip()[:200]
+
+def failure_signature(log, is_timeout=False, rcode=None):
+    """
+    Return the (normalized signature, raw line) of a failure. The signature comes from the first of:
+    * a simulator or testbench error ($error, $fatal, > ERROR:),
+    * a Python traceback: its exception line,
+    in the log. Otherwise, from the first error-like line of the log, or the timeout or exit code.
+    """
+    fallback = None
+    in_traceback = False
+    try:
+        with open(log.file, 'rb') as fp:
+            for l_b in fp:
+                l = ANSI_RE.sub('', l_b.decode("UTF-8", errors='replace')).rstrip()
+                if in_traceback:
+                    # Frames are indented, the exception line is not
+                    if len(l) > 0 and not l[0].isspace():
+                        return (normalize_signature(l), l.strip())
+                    continue
+                if TRACEBACK_TAG in l:
+                    in_traceback = True
+                elif SCRIPT_STATUS_RE.match(l):
+                    continue
+                elif SIM_ERROR_RE.search(l):
+                    return (normalize_signature(l), l.strip())
+                elif fallback is None and SIGNATURE_RE.search(l):
+                    fallback = l
+    except OSError:
+        None
+    if fallback is not None:
+        return (normalize_signature(fallback), fallback.strip())
+    if is_timeout:
+        return ('TIMEOUT', 'TIMEOUT')
+    return (f'exit code {rcode}', f'exit code {rcode}')
+
+def get_repro_dir(test, out_path):
+    """
+    Return the reproducer bundle directory of a failing test.
+    """
+    return Path(out_path) / 'repro' / f'{test.name}_{test.seed}'
+
+def write_repro_bundle(test_result, signature, pdir, out_path, campaign, commit, with_stimuli):
+    """
+    Write the reproducer bundle of a failing test, from its log:
+    * info.json      : test, campaign, commit, status and failure signature,
+    * seed.txt       : seed given to run_simu.sh,
+    * commands.txt   : resolved commands run by run_simu.sh (INFO> Running), the last one failed,
+    * generators.txt : parameter generator commands,
+    * params/        : generated parameter files, as sourced by run_simu.sh,
+    * replay.sh      : runs again the failing resolved command,
+    * stimuli/       : optional copy of the test stimuli.
+    Absolute paths in the project are replaced by ${PROJECT_DIR}, so that the bundle can be
+    replayed in another clone.
+    """
+    (test, log, info, rcode, is_timeout, duration) = test_result
+    repro_dir = get_repro_dir(test, out_path)
+    if repro_dir.exists():
+        shutil.rmtree(repro_dir)
+    (repro_dir / 'params').mkdir(parents=True)
+
+    def portable(l):
+        return l.replace(str(Path(pdir).resolve()), '${PROJECT_DIR}').replace(pdir, '${PROJECT_DIR}')
+
+    cmd_l = []
+    gen_l = []
+    param_d = {}
+    param_name = None
+    with open(log.file, 'r', errors='replace') as fp:
+        for l in fp:
+            l = ANSI_RE.sub('', l).rstrip('\n')
+            if param_name is not None:
+                if PARAM_FILE_END_TAG in l:
+                    param_name = None
+                else:
+                    param_d[param_name].append(l)
+            elif PARAM_FILE_TAG in l:
+                # Last occurrence wins: it is the one of the failing iteration
+                param_name = os.path.basename(l.split(PARAM_FILE_TAG, 1)[1].strip())
+                param_d[param_name] = []
+            elif RUN_CMD_TAG in l:
+                cmd_l.append(portable(' '.join(l.split(RUN_CMD_TAG, 1)[1].split())))
+            elif GEN_CMD_RE.search(l):
+                gen_l.append(portable(' '.join(GEN_CMD_RE.search(l).group(1).split())))
+
+    with open(repro_dir / 'info.json', 'w') as fp:
+        json.dump({'name': test.name, 'group': test.group, 'path': test.path, 'seed': test.seed,
+                   'build': test.build, 'campaign': campaign, 'commit': commit, 'rcode': rcode,
+                   'timeout': is_timeout, 'signature': signature[0], 'error': signature[1],
+                   'log': str(log.file)}, fp, indent=2, default=lambda o: o.item())
+    (repro_dir / 'seed.txt').write_text(f'{test.seed}\n')
+    (repro_dir / 'commands.txt').write_text(''.join(f'{c}\n' for c in cmd_l))
+    (repro_dir / 'generators.txt').write_text(''.join(f'{c}\n' for c in gen_l))
+    for (name, content_l) in param_d.items():
+        (repro_dir / 'params' / name).write_text(''.join(f'{c}\n' for c in content_l))
+
+    if cmd_l:
+        replay = cmd_l[-1]
+        note = '# Failing command, with the parameters drawn by run_simu.sh.'
+    else:
+        # No resolved command printed: run_simu.sh again, with the same seed
+        replay = portable(' '.join(str(c).strip() for c in get_test_cmd(test, pdir, out_path)))
+        note = '# run_simu.sh did not print its commands: random parameters are drawn again.'
+    (repro_dir / 'replay.sh').write_text('\n'.join([
+        '#! /usr/bin/bash',
+        f'# Replay of {test.name}, seed {test.seed}',
+        f'# Campaign {campaign}, commit {commit}',
+        '# Prerequisite : source setup.sh',
+        note,
+        '# Stimuli are regenerated from the seed.' if not with_stimuli else
+        '# Stimuli of the failing run are in the stimuli directory of this bundle.',
+        '',
+        'cd ${PROJECT_DIR}',
+        replay,
+        '']))
+    os.chmod(repro_dir / 'replay.sh', 0o755)
+
+    if with_stimuli:
+        for stim_dir in STIMULI_DIR_L:
+            src = Path(pdir) / test.path / stim_dir
+            if src.is_dir():
+                shutil.copytree(src, repro_dir / 'stimuli' / stim_dir, symlinks=True)
+    return repro_dir
+
+def cluster_failures(result_l, signature_d, pdir, out_path):
+    """
+    Group the failing tests by signature. Return a list of clusters, largest first:
+    (signature, raw line of the representative, list of failing tests, reproduction command,
+     representative test).
+    The representative is the shortest failing run.
+    """
+    cluster_d = {}
+    for (test, log, info, rcode, is_timeout, duration) in result_l:
+        if rcode == 0:
+            continue
+        (signature, raw) = signature_d[(test.name, test.seed)]
+        cluster_d.setdefault(signature, []).append((duration, test, raw))
+    cluster_l = []
+    for (signature, fail_l) in cluster_d.items():
+        (duration, test, raw) = min(fail_l, key=lambda x: x[0])
+        cluster_l.append((signature, raw, [f[1] for f in fail_l],
+                          ' '.join(str(c).strip() for c in get_test_cmd(test, pdir, out_path)), test))
+    return sorted(cluster_l, key=lambda c: len(c[2]), reverse=True)
+
+def print_clusters(cluster_l, out_path):
+    """
+    Print the failure clusters summary.
+    """
+    fail_nb = sum(len(c[2]) for c in cluster_l)
+    print(f"Failures: {fail_nb} in {len(cluster_l)} cluster(s)")
+    for (idx, (signature, raw, test_l, cmd, rep_test)) in enumerate(cluster_l):
+        name_s = sorted(set(t.name for t in test_l))
+        print(f"  [{idx}] {len(test_l)} failure(s) in {', '.join(name_s)}")
+        print(f"      signature : {signature}")
+        print(f"      first     : {raw[:200]}")
+        print(f"      repro     : {cmd}")
+        print(f"      bundle    : {get_repro_dir(rep_test, out_path)}")
+
+def status_line(period, stop_l):
+    """
+    Display the running tests, their elapsed time and their last log line, every period seconds.
+    On a terminal, the line is overwritten, otherwise a new line is printed.
+    Stop when stop_l is not empty.
+    """
+    is_tty = sys.stdout.isatty()
+    while not stop_l:
+        with RUNNING_LOCK:
+            running_l = sorted(RUNNING_D.items(), key=lambda x: x[1][0])
+        now = time.monotonic()
+        item_l = []
+        for ((name, seed), (start, last)) in running_l:
+            elapsed = datetime.timedelta(seconds=int(now - start))
+            last = ANSI_RE.sub('', last.decode("UTF-8", errors='replace')).strip()
+            item_l.append(f'{name} {elapsed} [{last}]')
+        line = f'RUNNING {len(running_l)}: ' + ' | '.join(item_l)
+        if is_tty:
+            width = shutil.get_terminal_size().columns
+            print('\r\x1b[K' + line[:width-1], end='', flush=True)
+        else:
+            print(line, flush=True)
+        time.sleep(period)
+    if is_tty:
+        print('\r\x1b[K', end='', flush=True)
+
+def open_db(db_file):
+    """
+    Open the run history database, and create its tables if needed.
+    """
+    Path(db_file).parent.mkdir(parents=True, exist_ok=True)
+    db = sqlite3.connect(db_file)
+    db.executescript(DB_SCHEMA)
+    return db
+
+def extract_params(log_file):
+    """
+    Return the set of (name, value) of the parameters and flags given to run_edalize by the
+    simu script, read in the printed commands.
+    """
+    param_s = set()
+    try:
+        with open(log_file, 'r', errors='replace') as fp:
+            for l in fp:
+                if RUN_CMD_TAG not in l:
+                    continue
+                tok_l = l.split(RUN_CMD_TAG, 1)[1].split()
+                for (i, tok) in enumerate(tok_l):
+                    if tok == '-P' and i+3 < len(tok_l):
+                        param_s.add((tok_l[i+1], tok_l[i+3]))
+                    elif tok == '-F' and i+2 < len(tok_l):
+                        param_s.add((tok_l[i+1], tok_l[i+2]))
+    except OSError:
+        None
+    return param_s
+
+def record_results(db, campaign, commit, group_result, signature_d):
+    """
+    Append the outcome of the tests of a group to the database, with the randomized parameter
+    values of each seed. signature_d gives the failure signatures: (name, seed) -> (signature, line)
+    """
+    for (test, log, info, rcode, is_timeout, duration) in group_result:
+        if is_timeout:
+            status = 'TIMEOUT'
+        elif rcode == 0:
+            status = 'PASS'
+        else:
+            status = 'FAIL'
+        db.execute('INSERT INTO runs (campaign, git_commit, name, test_group, path, seed, build,'
+                   ' status, rcode, start, duration, utime, stime, maxrss_kb, signature)'
+                   ' VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                   (campaign, commit, test.name, test.group, test.path, str(test.seed), test.build,
+                    status, rcode, datetime.datetime.now().isoformat(timespec='seconds'), duration,
+                    info.ru_utime, info.ru_stime, info.ru_maxrss,
+                    None if status == 'PASS' else signature_d[(test.name, test.seed)][0]))
+        run_id = db.execute('SELECT last_insert_rowid()').fetchone()[0]
+        db.executemany('INSERT INTO params (run_id, name, value) VALUES (?, ?, ?)',
+                       [(run_id, n, v) for (n, v) in sorted(extract_params(log.file))])
+    db.commit()
+
+def get_adaptive_weight(db, name):
+    """
+    Return the weight of a test for the seed budget, from its last ADAPT_WINDOW runs:
+    ADAPT_BASE_WEIGHT + failure rate + parameter discovery rate.
+    The discovery rate is the fraction of these runs that produced a parameter value never seen
+    in the previous runs: it stays high while the randomized space is not explored.
+    A test without history gets the maximum weight.
+    """
+    run_l = db.execute('SELECT id, status FROM runs WHERE name = ? ORDER BY id', (name,)).fetchall()
+    if len(run_l) == 0:
+        return ADAPT_BASE_WEIGHT + 2
+    seen_s = set()
+    new_l = []
+    param_d = {}
+    for (run_id, n, v) in db.execute('SELECT params.run_id, params.name, params.value FROM params'
+                                     ' JOIN runs ON runs.id = params.run_id WHERE runs.name = ?',
+                                     (name,)):
+        param_d.setdefault(run_id, set()).add((n, v))
+    for (run_id, status) in run_l:
+        new_l.append(len(param_d.get(run_id, set()) - seen_s) > 0)
+        seen_s |= param_d.get(run_id, set())
+    window_l = run_l[-ADAPT_WINDOW:]
+    fail_rate = len([r for r in window_l if r[1] != 'PASS']) / len(window_l)
+    # The first run always discovers: not significant
+    new_l = new_l[1:][-ADAPT_WINDOW:]
+    discovery_rate = sum(new_l) / len(new_l) if new_l else 1
+    return ADAPT_BASE_WEIGHT + fail_rate + discovery_rate
+
+def adapt_seed_counts(nreg_list, db, history, budget):
+    """
+    Distribute a budget of cpu-hours among the random seed tests (Seed<0).
+    Each test gets one seed, then seeds are given one by one to the test with the best
+    weight / (seeds + 1) / cost ratio, until the budget is spent or all the tests reach
+    ADAPT_MAX_FACTOR times their csv seed count.
+    The cpu-hours of the fixed seed tests are deducted first.
+    Return test name -> number of seeds.
+    """
+    remaining = budget * 3600
+    heap_l = []
+    seed_nb_d = {}
+    weight_d = {}
+    for (idx, row) in nreg_list.iterrows():
+        entry = dict(row)
+        test = test_t(name=entry["Name"], group=entry["Group"], path=entry["Path"],
+                      seed=entry["Seed"], timeout=entry["Timeout"],
+                      cpus=int(get_resource(entry, "Cpus", DEFAULT_CPUS)))
+        cost = max(predict_duration(test, history), 1) * test.cpus
+        remaining -= cost
+        if test.seed >= 0:
+            continue
+        weight = get_adaptive_weight(db, test.name)
+        weight_d[test.name] = weight
+        seed_nb_d[test.name] = 1
+        heapq.heappush(heap_l, (-weight / 2 / cost, test.name, weight, cost,
+                                ADAPT_MAX_FACTOR * int(abs(test.seed))))
+    if remaining < 0:
+        print(f"WARNING: seed budget too small, one seed per test needs {budget - remaining/3600:.1f} cpu-hours")
+    while heap_l and remaining > 0:
+        (prio, name, weight, cost, max_nb) = heapq.heappop(heap_l)
+        if cost > remaining:
+            continue
+        seed_nb_d[name] += 1
+        remaining -= cost
+        if seed_nb_d[name] < max_nb:
+            heapq.heappush(heap_l, (-weight / (seed_nb_d[name] + 1) / cost, name, weight, cost, max_nb))
+    print(f"Adaptive seeds, budget {budget} cpu-hours, {max(remaining, 0)/3600:.1f} left:")
+    for (name, nb) in seed_nb_d.items():
+        print(f'\t {name:40s} {nb:4d} seed(s), weight {weight_d[name]:.2f}')
+    return seed_nb_d
+
+def load_durations(db):
+    """
+    Read the durations of the last passing runs: test name -> list of durations in second.
+    Timed out and failing runs are not used: they may stop early.
+    """
+    history = {}
+    for (name, duration) in db.execute("SELECT name, duration FROM runs WHERE status = 'PASS'"
+                                       " ORDER BY id"):
+        history[name] = (history.get(name, []) + [duration])[-HISTORY_DEPTH:]
+    return history
+
+def query_db(db, query, name_l=None):
+    """
+    Print the result of a query on the run history.
+    """
+    runs_d = {}
+    for (name, commit, status, duration, maxrss, signature) in db.execute(
+            'SELECT name, git_commit, status, duration, maxrss_kb, signature FROM runs ORDER BY id'):
+        if name_l and not("all" in name_l) and not(name in name_l):
+            continue
+        runs_d.setdefault(name, []).append((commit, status, duration, maxrss, signature))
+
+    if query == 'flaky':
+        print(f'{"Test":40s} {"Runs":>6s} {"Fails":>6s} {"Rate":>7s} {"Flaky commits":>14s}')
+        for (name, run_l) in sorted(runs_d.items()):
+            fail_nb = len([r for r in run_l if r[1] != 'PASS'])
+            status_d = {}
+            for r in run_l:
+                status_d.setdefault(r[0], set()).add(r[1] == 'PASS')
+            flaky_nb = len([c for c in status_d.values() if len(c) == 2])
+            print(f'{name:40s} {len(run_l):6d} {fail_nb:6d} {100*fail_nb/len(run_l):6.1f}% {flaky_nb:14d}')
+
+    elif query == 'duration':
+        # Mean duration and peak memory of the passing runs, per commit, oldest first
+        for (name, run_l) in sorted(runs_d.items()):
+            commit_l = []
+            commit_d = {}
+            for (commit, status, duration, maxrss, signature) in run_l:
+                if status != 'PASS':
+                    continue
+                if commit not in commit_d:
+                    commit_l.append(commit)
+                    commit_d[commit] = []
+                commit_d[commit].append((duration, maxrss))
+            print(f'{name}')
+            for commit in commit_l[-HISTORY_DEPTH:]:
+                d_l = commit_d[commit]
+                print(f'\t {str(commit)[:12]:18s} {len(d_l):4d} runs'
+                      f' {sum(d for (d, m) in d_l)/len(d_l):10.1f} s'
+                      f' {max(m for (d, m) in d_l)/(1<<20):8.2f} GB')
+
+    elif query == 'first-fail':
+        # For the tests whose last run failed: first failing run after the last pass
+        for (name, run_l) in sorted(runs_d.items()):
+            if run_l[-1][1] == 'PASS':
+                continue
+            idx = len(run_l) - 1
+            while idx > 0 and run_l[idx-1][1] != 'PASS':
+                idx -= 1
+            last_pass = run_l[idx-1][0] if idx > 0 else None
+            print(f'{name:40s} first fail: {run_l[idx][0]} (last pass: {last_pass})'
+                  f' {run_l[idx][4]}')
+
+def predict_duration(test, history):
+    """
+    Predict the duration of a test: mean of its previous durations, its timeout if it has no
+    history, DEFAULT_DURATION otherwise.
+    """
+    if history.get(test.name):
+        return sum(history[test.name]) / len(history[test.name])
+    if test.timeout > 0:
+        return test.timeout
+    return DEFAULT_DURATION
+
+def schedule_groups(nreg_groups, history, max_cpus, max_mem, run_fn, done_fn):
+    """
+    Run the build groups with the longest-processing-time-first policy.
+    Groups are sorted by decreasing predicted duration. Each time resources are freed, the first
+    groups that fit in the remaining cpus and memory are started. A group whose requirement exceeds
+    the machine is started alone.
+    run_fn(group) runs a group in a thread, done_fn(group, result, exc) is called in the caller
+    thread on completion. done_fn can return new groups to schedule, ex: the simulations of the
+    seeds once their testbench is built.
+    """
+    pending_l = sorted(nreg_groups,
+                       key=lambda g: sum(predict_duration(t, history) for t in g),
+                       reverse=True)
+    done_q = queue.Queue()
+    free_cpus = max_cpus
+    free_mem = max_mem
+    running = 0
+
+    def worker(group):
+        try:
+            done_q.put((group, run_fn(group), None))
+        except Exception as exc:
+            done_q.put((group, None, exc))
+
+    while pending_l or running > 0:
+        # Start all the groups that fit, in LPT order
+        for group in list(pending_l):
+            cpus = max(t.cpus for t in group)
+            mem = max(t.mem for t in group)
+            fit = (cpus <= free_cpus and mem <= free_mem) or running == 0
+            if fit:
+                pending_l.remove(group)
+                free_cpus -= cpus
+                free_mem -= mem
+                running += 1
+                Thread(target=worker, args=(group,), daemon=True).start()
+
+        # Wait for a completion
+        (group, result, exc) = done_q.get()
+        free_cpus += max(t.cpus for t in group)
+        free_mem += max(t.mem for t in group)
+        running -= 1
+        next_l = done_fn(group, result, exc)
+        if next_l:
+            pending_l = sorted(pending_l + next_l,
+                               key=lambda g: sum(predict_duration(t, history) for t in g),
+                               reverse=True)
+
+def parse_address(address):
+    """
+    Parse [HOST:]PORT. Default host is DEFAULT_HOST, the loopback interface.
+    """
+    (host, _, port) = address.rpartition(':')
+    return (host if host else DEFAULT_HOST, int(port))
+
+def send_msg(sock_file, lock, msg):
+    """
+    Send a JSON line on a socket file. The lock serializes the writes of several threads.
+    """
+    line = (json.dumps(msg, default=lambda o: o.item()) + '\n').encode("UTF-8")
+    with lock:
+        sock_file.write(line)
+        sock_file.flush()
+
+class CoordinatorHandler(socketserver.StreamRequestHandler):
+    """
+    Serve a worker connection. The coordinator state is in self.server.coord.
+    """
+    def handle(self):
+        coord = self.server.coord
+        send_lock = Lock()
+        assigned_d = {} # group id -> tests not finished yet
+        log_fp_d = {}
+        worker = str(self.client_address)
+        try:
+            # Handshake: a worker must first prove it knows the shared token
+            msg = json.loads(self.rfile.readline() or '{}')
+            if (msg.get('type') != 'hello' or
+                not hmac.compare_digest(str(msg.get('token')).encode("UTF-8"), coord['token'].encode("UTF-8"))):
+                print(f'WARNING: connection from {worker} rejected: bad handshake')
+                return
+            worker = f"{msg['worker']} {self.client_address}"
+            print(f'INFO: worker {worker} connected')
+            for l in self.rfile:
+                msg = json.loads(l)
+                if msg['type'] == 'get':
+                    with coord['lock']:
+                        reply = {'type': 'done' if coord['finished'] else 'wait'}
+                        for group in coord['pending']:
+                            fit = (max(t.cpus for t in group) <= msg['free_cpus'] and
+                                   max(t.mem for t in group) <= msg['free_mem'])
+                            # A group larger than the worker runs alone
+                            if fit or msg['running'] == 0:
+                                coord['pending'].remove(group)
+                                coord['group_id'] += 1
+                                assigned_d[coord['group_id']] = list(group)
+                                reply = {'type': 'group', 'id': coord['group_id'],
+                                         'tests': [t._asdict() for t in group]}
+                                break
+                    send_msg(self.wfile, send_lock, reply)
+                elif msg['type'] == 'log':
+                    if msg['key'] not in log_fp_d:
+                        log_file = Path(coord['out_path']) / 'logs' / f"{msg['key']}.log"
+                        log_file.parent.mkdir(parents=True, exist_ok=True)
+                        log_fp_d[msg['key']] = open(log_file, 'w')
+                    # Flushed, so that the log can be followed during the test
+                    log_fp_d[msg['key']].write(msg['line'])
+                    log_fp_d[msg['key']].flush()
+                elif msg['type'] == 'log_end':
+                    # The build of a group is over. It has no result of its own.
+                    if msg['key'] in log_fp_d:
+                        log_fp_d.pop(msg['key']).close()
+                elif msg['type'] == 'result':
+                    test_result = result_from_record(msg)
+                    test = test_result[0]
+                    key = f'{test.name}_{test.seed}'
+                    if key in log_fp_d:
+                        log_fp_d.pop(key).close()
+                    else:
+                        # Test without output: create an empty log
+                        (Path(coord['out_path']) / 'logs').mkdir(parents=True, exist_ok=True)
+                        open(Path(coord['out_path']) / 'logs' / f'{key}.log', 'w').close()
+                    # Log file is the local copy
+                    test_result = (test, test_result[1]._replace(file=Path(coord['out_path']) / 'logs' / f'{key}.log'),
+                                   *test_result[2:])
+                    # The simulation of a seed of a build group is run as a 'run' phase
+                    assigned_d[msg['group']] = [t for t in assigned_d[msg['group']]
+                                                if (t.name, t.seed) != (test.name, test.seed)]
+                    coord['result_q'].put(test_result)
+        except (OSError, ValueError) as exc:
+            print(f'WARNING: connection with worker {worker} lost: {exc}')
+        finally:
+            for fp in log_fp_d.values():
+                fp.close()
+            requeue_l = [g for g in assigned_d.values() if len(g) > 0]
+            if requeue_l:
+                print(f'WARNING: worker {worker} left, rescheduling {sum(len(g) for g in requeue_l)} test(s)')
+                with coord['lock']:
+                    coord['pending'] = requeue_l + coord['pending']
+            print(f'INFO: worker {worker} disconnected')
+
+def serve_groups(nreg_groups, history, address, token, out_path, test_done, done_fn):
+    """
+    Coordinator: serve the build groups to the workers, longest first, and collect the results.
+    Only the workers that know the shared token are served.
+    test_done(test_result) and done_fn(group, result, exc) are called in the caller thread for each
+    test result.
+    """
+    test_nb = sum(len(g) for g in nreg_groups)
+    coord = {'lock': Lock(),
+             'pending': sorted(nreg_groups,
+                               key=lambda g: sum(predict_duration(t, history) for t in g),
+                               reverse=True),
+             'group_id': 0,
+             'finished': False,
+             'out_path': out_path,
+             'token': token,
+             'result_q': queue.Queue()}
+
+    socketserver.ThreadingTCPServer.allow_reuse_address = True
+    socketserver.ThreadingTCPServer.daemon_threads = True
+    with socketserver.ThreadingTCPServer(parse_address(address), CoordinatorHandler) as server:
+        server.coord = coord
+        Thread(target=server.serve_forever, daemon=True).start()
+        print(f'INFO: serving {test_nb} test(s) on {address}')
+        for i in range(test_nb):
+            test_result = coord['result_q'].get()
+            test_done(test_result)
+            done_fn([test_result[0]], [test_result], None)
+        with coord['lock']:
+            coord['finished'] = True
+        # Let the workers poll the end of the campaign
+        time.sleep(2*WORKER_POLL_PERIOD)
+        server.shutdown()
+
+def check_served_test(test, pdir, local_test_s):
+    """
+    Check that a test served by the coordinator can be run by the worker: its path is inside pdir,
+    and the test is in the local csv file. Return None, or the reason of the rejection.
+    """
     try:
-        log = subprocess.run(cmd,
-                                timeout=timeout,
-                                capture_output=True,
-                                )
-        rcode = log.returncode
-        is_timeout = False
+        Path(pdir, test.path).resolve().relative_to(Path(pdir).resolve())
+    except ValueError:
+        return f'path {test.path} is outside {pdir}'
+    if (test.name, test.path) not in local_test_s:
+        return f'test {test.name} ({test.path}) is not in the local csv file'
+    return None
+
+def run_worker(address, token, pdir, out_path, max_cpus, max_mem, args):
+    """
+    Worker: pull build groups from the coordinator and run them within max_cpus and max_mem.
+    Outputs and results are streamed back. The served tests that are not in the local csv file
+    are not run, and reported as failed.
+    """
+    nreg_list = pandas.read_csv(args.csv_file, comment='#', skip_blank_lines=True)
+    local_test_s = set(zip(nreg_list['Name'], nreg_list['Path']))
+
+    sock = socket.create_connection(parse_address(address))
+    sock_r = sock.makefile('rb')
+    sock_w = sock.makefile('wb')
+    send_lock = Lock()
+    send_msg(sock_w, send_lock, {'type': 'hello', 'worker': socket.gethostname(), 'token': token})
+    print(f'INFO: connected to coordinator {address}')
+
+    done_q = queue.Queue()
+    free_cpus = max_cpus
+    free_mem = max_mem
+    running = 0
+
+    def line_fn(test, line):
+        send_msg(sock_w, send_lock, {'type': 'log', 'key': get_test_key(test),
+                                     'line': line.decode("UTF-8", errors='replace')})
 
-    except subprocess.TimeoutExpired as excpt:
-        log = excpt
-        rcode = 1 # Error
-        is_timeout = True
+    def worker(group_id, group, cpus, mem):
+        def test_done(test_result):
+            print('INFO: test {} is done'.format(test_result[0].name))
+            send_msg(sock_w, send_lock, dict(result_to_record(test_result), group=group_id))
+        try:
+            reject_l = [(t, check_served_test(t, pdir, local_test_s)) for t in group]
+            reject_l = [(t, reason) for (t, reason) in reject_l if reason is not None]
+            if reject_l:
+                for (test, reason) in reject_l:
+                    print(f'ERROR: served {reason}: rejected')
+                for test in group:
+                    line = f"ERROR: worker: {dict(reject_l).get(test, 'rejected with its build group')}\n".encode("UTF-8")
+                    line_fn(test, line)
+                    test_done((test, log_t(stdout=b'', stderr=line, file=None), rusage_t(0, 0, 0), 1, False, 0))
+            else:
+                run_group(group, pdir, out_path, cpus, mem, args, test_done, line_fn,
+                          lambda build: send_msg(sock_w, send_lock, {'type': 'log_end', 'key': get_test_key(build)}))
+        except Exception as exc:
+            print('ERROR: tests {} generated an exception: {}'.format([t.name for t in group], exc))
+        done_q.put((cpus, mem))
 
-    info = resource.getrusage(resource.RUSAGE_CHILDREN)
-    return(test, log, info, rcode, is_timeout)
+    while True:
+        send_msg(sock_w, send_lock, {'type': 'get', 'free_cpus': free_cpus, 'free_mem': free_mem,
+                                     'running': running})
+        l = sock_r.readline()
+        reply = json.loads(l) if l else {'type': 'done'}
+        if reply['type'] == 'group':
+            group = [test_t(**t) for t in reply['tests']]
+            # The seeds of a build group run in parallel, on the free resources
+            cpus = max(max(t.cpus for t in group), min(free_cpus, sum(t.cpus for t in group)))
+            mem = max(max(t.mem for t in group), min(free_mem, sum(t.mem for t in group)))
+            free_cpus -= cpus
+            free_mem -= mem
+            running += 1
+            Thread(target=worker, args=(reply['id'], group, cpus, mem), daemon=True).start()
+            continue
+        if reply['type'] == 'done' and running == 0:
+            break
+        # Wait for a completion, or poll again
+        try:
+            (cpus, mem) = done_q.get(timeout=WORKER_POLL_PERIOD)
+            free_cpus += cpus
+            free_mem += mem
+            running -= 1
+        except queue.Empty:
+            None
+    sock.close()
+    print('INFO: campaign is over')
+    print_reaped()
 
 def as_junit(exec_log):
     """!@brief: Format execution log as xml junit string
          @return junit.Testcase
     """
-    (test, log, info, rcode, is_timeout) = exec_log
+    (test, log, info, rcode, is_timeout, duration) = exec_log
+    if test.build is not None:
+        build_info = f'INFO> Build group : {test.build}\n'
+    else:
+        build_info = 'INFO> Build group : none (compile-time parameters randomized)\n'
+    log_info = f'INFO> Full log : {log.file} (last {TAIL_LINES} lines of stdout below)\n'
     junit_tc = jxml.TestCase(
         name= test.name,
         classname=test.group,
         elapsed_sec=info.ru_utime,
-        stdout=log.stdout.decode("UTF-8"),
-        stderr=log.stderr.decode("UTF-8"),
+        stdout=build_info + log_info + log.stdout.decode("UTF-8", errors='replace'),
+        stderr=log.stderr.decode("UTF-8", errors='replace'),
         # assertions=None,
         # timestamp=None,
         status='SUCCESS' if 0 == rcode else 'FAILED',
         category=test.group,
         # file=None,
         # line=None,
-        # log=None,
+        log=str(log.file),
         # url=None,
         allow_multiple_subelements=True
     )
     # Add custom messages
     if 0 != rcode:
         msg = "TIMEOUT" if is_timeout else "FAILED"
-        junit_tc.add_failure_info(message=msg, output=log.stderr.decode("UTF-8"))
+        junit_tc.add_failure_info(message=msg, output=log.stderr.decode("UTF-8", errors='replace'))
     # junit_tc.add_error_info(message=msg, output=out)
     return junit_tc
 
@@ -188,7 +1582,40 @@ def add_testcase(junit_testsuite, exec_log):
     # Append to junit TestSuite
     junit_testsuite.test_cases.append(junit_tc)
 
-def create_junit_testsuite(args):
+def create_cluster_testsuite(args, cluster_l, out_path):
+    """
+    Build a junit TestSuite with a failing testcase per failure cluster.
+    """
+    cluster_ts = jxml.TestSuite(name=f'{args.csv_file} failure clusters', test_cases=[])
+    for (idx, (signature, raw, test_l, cmd, rep_test)) in enumerate(cluster_l):
+        junit_tc = jxml.TestCase(name=f'cluster {idx}: {signature}',
+                                 classname='failure_clusters',
+                                 stdout='\n'.join([f'Representative : {raw}',
+                                                   f'Reproduction   : {cmd}',
+                                                   f'Bundle         : {get_repro_dir(rep_test, out_path)}',
+                                                   'Failures       :']
+                                                  + [f'  {t.name} seed {t.seed}' for t in test_l]))
+        junit_tc.add_failure_info(message=f'{len(test_l)} failure(s): {signature}',
+                                  output=f'{raw}\n{cmd}')
+        cluster_ts.test_cases.append(junit_tc)
+    return cluster_ts
+
+def write_junit(junit_testsuite, report_junit, cluster_ts=None):
+    """
+    Render the junit report atomically: an interrupted write never leaves a truncated file.
+    """
+    tmp_file = f'{report_junit}.tmp'
+    suite_l = [junit_testsuite] if cluster_ts is None else [junit_testsuite, cluster_ts]
+    with open(tmp_file, 'w') as rf:
+        junit_testsuite.to_file(rf, suite_l)
+    os.replace(tmp_file, report_junit)
+
+def create_junit_testsuite(args, nreg_groups):
+    # Build groups are reported as properties: group -> tests and seeds
+    properties = {}
+    for group in nreg_groups:
+        if group[0].build is not None:
+            properties[f'build_group.{group[0].build}'] = ' '.join(f'{t.name}:{t.seed}' for t in group)
     # Build junit TestSuite
     junit_rpt = jxml.TestSuite(
                   name= args.csv_file,
@@ -197,7 +1624,7 @@ def create_junit_testsuite(args):
                   id=None,
                   package=None,
                   timestamp=None,
-                  properties=None,
+                  properties=properties,
                   file=None,
                   log=None,
                   url=None,
@@ -211,17 +1638,8 @@ if __name__ == '__main__':
     cli_parser = argparse.ArgumentParser()
     add_cli_args(cli_parser)
     cli_args = cli_parser.parse_args()
-    print(f"User arguments: {cli_args}");
-
-
-    # Parse csv file and filtered based on user arguments
-    nreg_list = get_list_of_test(cli_args)
-
-    # Expand Seed field and start test execution
-    nreg_tests = expand_tests(nreg_list, cli_args)
-    print("The following test will be run: ")
-    for t in nreg_tests:
-        print(f'\t {t}')
+    # The token is a secret: not printed
+    print(f"User arguments: {argparse.Namespace(**dict(vars(cli_args), token=None))}");
 
     # Handle Environment variables
     # TODO move this elsewhere
@@ -235,21 +1653,150 @@ if __name__ == '__main__':
         out_path = cli_args.out_path
     else:
         out_path = pdir + "/" + cli_args.out_path
+
+    # Scheduling resources
+    max_cpus = cli_args.max_cpus if cli_args.max_cpus else os.cpu_count()
+    if cli_args.max_mem:
+        max_mem = cli_args.max_mem
+    else:
+        max_mem = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') / (1<<30)
+
+    set_child_subreaper()
+
+    if cli_args.worker:
+        if not cli_args.token:
+            sys.exit(f"ERROR> Worker mode needs the token of the coordinator: --token or {TOKEN_ENV}")
+        run_worker(cli_args.worker, cli_args.token, pdir, out_path, max_cpus, max_mem, cli_args)
+        sys.exit(0)
+
+    db_file = cli_args.db if cli_args.db else os.path.join(out_path, 'nreg_history.db')
+    db = open_db(db_file)
+    if cli_args.query:
+        query_db(db, cli_args.query, cli_args.test_name)
+        sys.exit(0)
+
+    journal_file = cli_args.journal if cli_args.journal else os.path.join(out_path, 'nreg_journal.jsonl')
+    if cli_args.resume:
+        # Planned tests and seeds are those of the interrupted campaign
+        (campaign, commit, nreg_tests, prev_result_l) = journal_load(journal_file)
+        print(f"Resuming campaign {campaign}: {len(prev_result_l)}/{len(nreg_tests)} test(s) already finished")
+    else:
+        # Parse csv file and filtered based on user arguments
+        nreg_list = get_list_of_test(cli_args)
+        if cli_args.changed:
+            nreg_list = select_changed(nreg_list, cli_args, pdir)
+
+        # Expand Seed field and start test execution
+        seed_nb_d = None
+        if cli_args.seed_budget:
+            seed_nb_d = adapt_seed_counts(nreg_list, db, load_durations(db), cli_args.seed_budget)
+        nreg_tests = expand_tests(nreg_list, cli_args, seed_nb_d)
+        campaign = datetime.datetime.now().isoformat(timespec='seconds')
+        commit = get_git_commit(pdir)
+        prev_result_l = []
+    print("The following test will be run: ")
+    for t in nreg_tests:
+        print(f'\t {t}')
+
     Path(cli_args.out_path).parent.mkdir(parents=True, exist_ok=True)
 
     Path(cli_args.report_junit).parent.mkdir(parents=True, exist_ok=True)
-    junit_ts = create_junit_testsuite(cli_args)
-    junit_ts_lock = Lock()
-    # Spawn futures on multiple threads and convert them in concrete results
-    with concurrent.futures.ThreadPoolExecutor(max_workers=cli_args.max_cpus) as executor:
-        exec_fut = {executor.submit(run_test, test, pdir, out_path, cli_args): test for test in nreg_tests}
-        for fut in concurrent.futures.as_completed(exec_fut):
-            try:
-                test_result = fut.result()
-                print('INFO: test {} is done'.format(test_result[0].name))
-                with junit_ts_lock:
-                    add_testcase(junit_ts, test_result)
-                    with open(cli_args.report_junit, 'w') as rf:
-                        junit_ts.to_file(rf, [junit_ts])
-            except Exception as exc:
-                print('ERROR: test {} generated an exception: {}'.format(fut, exc))
+    nreg_groups = group_tests(nreg_tests, pdir, cli_args)
+    print("Build groups: ")
+    for g in nreg_groups:
+        if g[0].build is not None:
+            print(f'\t {g[0].build} : {len(g)} test(s), built once')
+        else:
+            print(f'\t {g[0].name} seed {g[0].seed} : not shareable, compile-time parameters randomized')
+
+    junit_ts = create_junit_testsuite(cli_args, nreg_groups)
+    # All the results of the campaign, and the signatures of the failures
+    result_l = []
+    signature_d = {}
+    for test_result in prev_result_l:
+        add_testcase(junit_ts, test_result)
+        result_l.append(test_result)
+        if test_result[3] != 0:
+            signature_d[(test_result[0].name, test_result[0].seed)] = failure_signature(test_result[1], test_result[4], test_result[3])
+
+    # Remove the finished tests from the groups, when resuming
+    finished_s = set((r[0].name, r[0].seed) for r in prev_result_l)
+    nreg_groups = [[t for t in g if (t.name, t.seed) not in finished_s] for g in nreg_groups]
+    nreg_groups = [g for g in nreg_groups if len(g) > 0]
+    if not cli_args.resume:
+        journal_plan(journal_file, campaign, commit, nreg_tests)
+
+    # Durations history
+    history = load_durations(db)
+    if not cli_args.serve:
+        print(f"Scheduling on {max_cpus} cpus and {max_mem:.1f} GB, longest tests first")
+    print(f"Recording results in {db_file}, campaign {campaign}, commit {commit}")
+
+    def group_done(group, group_result, exc):
+        if exc is not None:
+            print('ERROR: tests {} generated an exception: {}'.format([t.name for t in group], exc))
+            return
+        # A reporting error is logged: it must not stop the scheduling of the other groups.
+        try:
+            for test_result in group_result:
+                (test, log, info, rcode, is_timeout, duration) = test_result
+                print('INFO: test {} is done'.format(test.name))
+                add_testcase(junit_ts, test_result)
+                result_l.append(test_result)
+                if rcode != 0:
+                    signature_d[(test.name, test.seed)] = failure_signature(log, is_timeout, rcode)
+                    write_repro_bundle(test_result, signature_d[(test.name, test.seed)], pdir, out_path,
+                                       campaign, commit, cli_args.repro_stimuli)
+            record_results(db, campaign, commit, group_result, signature_d)
+            if time.monotonic() - report_d['last'] >= cli_args.report_period:
+                write_junit(junit_ts, cli_args.report_junit,
+                            create_cluster_testsuite(cli_args, cluster_failures(result_l, signature_d, pdir, out_path), out_path))
+                report_d['last'] = time.monotonic()
+        except Exception as err:
+            print('ERROR: results of tests {} could not be reported: {}'.format([t.name for t in group], err))
+    report_d = {'last': time.monotonic()}
+
+    status_stop_l = []
+    if cli_args.status:
+        Thread(target=status_line, args=(cli_args.status, status_stop_l), daemon=True).start()
+
+    try:
+        if cli_args.serve:
+            token = cli_args.token
+            if not token:
+                token = secrets.token_hex(16)
+                print(f'INFO: workers token: {token}')
+            serve_groups(nreg_groups, history, cli_args.serve, token, out_path,
+                         lambda r: journal_result(journal_file, r),
+                         group_done)
+        else:
+            # The seeds of a build group are scheduled once its testbench is built
+            group_d = {g[0].build: g for g in nreg_groups if g[0].build is not None}
+            def job_done(job, job_result, exc):
+                if job[0].phase != 'build':
+                    group_done(job, job_result, exc)
+                    return None
+                group = group_d[job[0].build]
+                if exc is not None:
+                    print(f'ERROR: build of {job[0].build} generated an exception: {exc}')
+                    (job_l, fail_l) = ([], get_build_error_results(group, exc, out_path))
+                else:
+                    (job_l, fail_l) = get_seed_jobs(group, job_result[0], out_path)
+                    if fail_l:
+                        print(f'ERROR: build of {job[0].build} failed, see {job_result[0][1].file}')
+                for test_result in fail_l:
+                    journal_result(journal_file, test_result)
+                if fail_l:
+                    group_done(group, fail_l, None)
+                return job_l
+            schedule_groups([j for g in nreg_groups for j in get_group_jobs(g)], history, max_cpus, max_mem,
+                            lambda job: run_job(job, pdir, out_path, cli_args,
+                                                lambda r: journal_result(journal_file, r)),
+                            job_done)
+    finally:
+        status_stop_l.append(True)
+        cluster_l = cluster_failures(result_l, signature_d, pdir, out_path)
+        write_junit(junit_ts, cli_args.report_junit, create_cluster_testsuite(cli_args, cluster_l, out_path))
+
+    print_clusters(cluster_l, out_path)
+    print_reaped()
@@ -8,22 +8,29 @@
 # ==============================================================================================
 
 import argparse # parse input argument
+import copy
 import os       # OS functions
 import sys      # manage errors
 import shutil
 import time     # seed
+import resource # phase timing
 from edalize import *
 import json
 import re
 import warnings
+import hashlib
 from pathlib import Path
 import subprocess as sbprc
+import concurrent.futures
 
 #=====================================================
 # Global variables
 #=====================================================
 VERBOSE = False
+SEVERITY = "low"
 PROJECT_DIR = ""
+FILE_LIST_CACHE = {}     # file_list.json content, per absolute path
+TOP_FILE_LIST_CACHE = {} # file_list.json path, per top name
 FILE_EXTENSION = {".asm"     : "asmSource",
                   ".c"       : "cSource",
                   ".cpp"     : "cppSource",
@@ -55,6 +62,34 @@ SUPPORTED_TOOL_FEATURES = {"vivado"        : ["ooc"],
                            "modelsim"      : ["wave", "cov"],
                            "vcs"           : ["wave", "wave_dve", "cov", "lint"],
                            "veribleformat" : ["stdout", "rec"]}
+# Tool options that are only used by the run stage. They are not part of the build fingerprint.
+RUN_TOOL_OPTIONS = {"vivado"        : [],
+                    "xsim"          : ["xsim_options"],
+                    "modelsim"      : ["vsim_options"],
+                    "vcs"           : ["run_options", "run_simu_options"],
+                    "veribleformat" : []}
+# EDAlize parameter types that are taken into account at compile/elaboration time.
+BUILD_PARAM_TYPES = ["vlogparam", "vlogdefine", "generic"]
+FINGERPRINT_FILE = "fingerprint.json"
+# Printed when the config and build stages passed, and the run stage is skipped (-y run).
+BUILD_DONE_PRINT = "INFO> Build done : run stage skipped."
+TIMING_FILE = "edalize_timing.json"
+# Pre-check
+PRECHECK_FILE_TYPES = ["systemVerilogSource", "verilogSource", "SVASource"]
+PRECHECK_BLOCKS = ["module", "package", "interface", "program"]
+PRECHECK_LEXEM_RE = re.compile(r'"(?:\\.|[^"\\])*"|//[^\n]*|/\*.*?\*/', re.S)
+PRECHECK_INCLUDE_RE = re.compile(r'`include\s+"([^"]+)"')
+PRECHECK_DECL_RE = re.compile(r'^\s*(module|macromodule|package|interface|program)\s+(?:(?:automatic|static)\s+)?(\w+)', re.M)
+# Shared library cache
+# A shared file is compiled in the library SHARED_LIB_NAME_<its logical library>, so that the
+# libraries of the work directory are not redirected to the cache.
+SHARED_LIB_NAME = "edalize_shared"
+# Library of the files without logical name, as in EDAlize.
+DEFAULT_LIB_NAME = "work"
+# bin : compiler, options : its tool options, sv : its SystemVerilog option
+LIB_CACHE_TOOLS = {"vcs"  : {"bin" : "vlogan", "home" : "VCS_HOME",      "options" : "vlogan_options", "sv" : "-sverilog"},
+                   "xsim" : {"bin" : "xvlog",  "home" : "XILINX_VIVADO", "options" : "xvlog_options",  "sv" : "--sv"}}
+LIB_CACHE_DEFAULT_ROOTS = ["hw/common_lib", "hw/module/param"]
 ENV_OF_TOOLS = {"vivado"        : ["synth"],
                 "tcl_dict"      : ["synth_xrt"],
                 "xsim"          : ["simu"],
@@ -150,10 +185,27 @@ def get_file_type(file_name):
         return FILE_EXTENSION[file_name_split[1]]
 
 
+#=====================================================
+# load_file_list
+#=====================================================
+def load_file_list(file_list_path):
+    '''
+    Load a file_list.json.
+    The content is kept in FILE_LIST_CACHE, so that the jobs of a batch parse each file_list once.
+    '''
+    key = os.path.abspath(file_list_path)
+    if not(key in FILE_LIST_CACHE):
+        try:
+            with open(file_list_path) as file_list_fp:
+                FILE_LIST_CACHE[key] = json.load(file_list_fp)
+        except FileNotFoundError:
+            sys.exit(ERROR_PRINT + " file_list not found: {:s}.".format(file_list_path) + RESET_COLOR)
+    return FILE_LIST_CACHE[key]
+
 #=====================================================
 # parse_files
 #=====================================================
-def parse_files(file_list_path, files_d, recursive, tool_env, parse_flag_d, is_top, sva_l):
+def parse_files(file_list_path, files_d, recursive, tool_env, parse_flag_d, is_top, sva_l, dag_d=None, missing_ok=False):
     '''
     Parse the json file_list, extract the file names of "rtl_files", and recursively retrieve the rtl_files
     of the dependencies.
@@ -162,18 +214,34 @@ def parse_files(file_list_path, files_d, recursive, tool_env, parse_flag_d, is_t
     If none of the flags is present, parse the file.
     If all the flags of the list are present, parse the file that matches all.
     If some of the flags of the list are present, parse the file for which the present flags match.
+    If dag_d is given, it is filled with the parsed hierarchy. For each file_list absolute path:
+        dir         : module directory
+        is_top      : True for the top file_list
+        dep         : file_list paths of the selected dependencies
+        files       : paths of the selected files. A file overridden by another one with the same
+                      name (see the files_d keys) is still listed in the node that selects it.
+        include_dir : selected include directories
+    If missing_ok is set, the missing file_lists are skipped (ex: file_lists generated by the
+    simulation scripts, for a dependency query).
     '''
 
+    if (missing_ok and not(os.path.isfile(file_list_path))):
+        return
+
     # Open file_list.json
-    try:
-        with open(file_list_path) as file_list_fp:
-            file_d = json.load(file_list_fp)
-    except FileNotFoundError:
-        sys.exit(ERROR_PRINT + " file_list not found: {:s}.".format(file_list_path) + RESET_COLOR)
+    file_d = load_file_list(file_list_path)
 
 
     info_dir_path = os.path.dirname(os.path.abspath(file_list_path))
 
+    if (dag_d != None):
+        dag_node = dag_d.setdefault(os.path.abspath(file_list_path),
+                                    {"dir"         : os.path.dirname(info_dir_path),
+                                     "is_top"      : is_top,
+                                     "dep"         : [],
+                                     "files"       : [],
+                                     "include_dir" : []})
+
     if (VERBOSE):
         print("INFO> Parsing file_list : {:s}".format(file_list_path))
 
@@ -259,6 +327,8 @@ def parse_files(file_list_path, files_d, recursive, tool_env, parse_flag_d, is_t
                     if (VERBOSE):
                         print("INFO> inc_path   : {:s}".format(inc_path))
                     include_dir_l.append(inc_path)
+                    if (dag_d != None) and not(inc_path in dag_node["include_dir"]):
+                        dag_node["include_dir"].append(inc_path)
 
 
     # Parse dependencies
@@ -300,7 +370,9 @@ def parse_files(file_list_path, files_d, recursive, tool_env, parse_flag_d, is_t
                         if (VERBOSE):
                             print(f"INFO> Optional dependency, not present, not used : {dep}")
                     if (do_continue):
-                        parse_files(dep_file_list_path, files_d, recursive, tool_env, cur_flag_d, False, sva_l)
+                        if (dag_d != None) and not(os.path.abspath(dep_file_list_path) in dag_node["dep"]):
+                            dag_node["dep"].append(os.path.abspath(dep_file_list_path))
+                        parse_files(dep_file_list_path, files_d, recursive, tool_env, cur_flag_d, False, sva_l, dag_d, missing_ok)
 
 
     # Parse rtl_files
@@ -348,6 +420,8 @@ def parse_files(file_list_path, files_d, recursive, tool_env, parse_flag_d, is_t
                 if (entry['name'] != files_d[file_name]['name']):
                     print("WARNING> Same file given several times: {:s}\n  use:\t\t{:s},\n  instead of:\t{:s}".format(file_name, entry['name'],files_d[file_name]['name']));
             files_d[file_name] = entry
+            if (dag_d != None) and not(file_path in dag_node["files"]):
+                dag_node["files"].append(file_path)
 
 
     # Parse constraint_files
@@ -368,6 +442,9 @@ def parse_files(file_list_path, files_d, recursive, tool_env, parse_flag_d, is_t
 #=====================================================
 def search_file_list(top_name):
 
+    if (top_name in TOP_FILE_LIST_CACHE):
+        return TOP_FILE_LIST_CACHE[top_name]
+
     file_list = []
     extensions = ['.v', '.sv']
 
@@ -398,12 +475,527 @@ def search_file_list(top_name):
     work_path = str(file_list[0]).rsplit("/",2)
 
     # Return the path of the file list
-    return work_path[0] + "/info/file_list.json"
+    TOP_FILE_LIST_CACHE[top_name] = work_path[0] + "/info/file_list.json"
+    return TOP_FILE_LIST_CACHE[top_name]
+
+#=====================================================
+# file_digest
+#=====================================================
+def file_digest(file_path):
+    '''
+    Return the sha256 of the file content. Missing files get a fixed digest, so that
+    their later creation is seen as a change.
+    '''
+    h = hashlib.sha256()
+    try:
+        with open(file_path, 'rb') as fp:
+            for chunk in iter(lambda: fp.read(1 << 20), b''):
+                h.update(chunk)
+    except OSError:
+        return "missing"
+    return h.hexdigest()
+
+#=====================================================
+# compute_fingerprint
+#=====================================================
+def compute_fingerprint(tool, top_name, files_l, parameters_d, tool_options_d, hooks_d, seed, extra=None):
+    '''
+    Compute the fingerprints of a work directory.
+    extra is any additional build input, for instance the shared library key.
+    output :
+        dictionary with 2 entries:
+        build : hash of everything the config and build stages depend on : resolved file
+                contents, defines, compile-time parameters and tool options.
+        run   : hash of what is only used by the run stage : run options and seed.
+    '''
+    build_d = {"tool"   : tool,
+               "top"    : top_name,
+               "files"  : [],
+               "params" : {},
+               "options": {},
+               "hooks"  : {},
+               "extra"  : extra}
+    run_d   = {"seed"   : seed,
+               "params" : {},
+               "options": {}}
+
+    for f in files_l:
+        entry = {k: v for (k,v) in f.items()}
+        entry["digest"] = file_digest(f["name"])
+        build_d["files"].append(entry)
+
+    for (k,v) in parameters_d.items():
+        if (v["paramtype"] in BUILD_PARAM_TYPES):
+            build_d["params"][k] = v
+        else:
+            run_d["params"][k] = v
+
+    for (k,v) in tool_options_d[tool].items():
+        if (k in RUN_TOOL_OPTIONS[tool]):
+            run_d["options"][k] = v
+        else:
+            build_d["options"][k] = v
+
+    for (k,v) in hooks_d.items():
+        if (k.endswith("_run")):
+            run_d["options"][k] = v
+        else:
+            build_d["hooks"][k] = v
+
+    return {"build" : hashlib.sha256(json.dumps(build_d, sort_keys=True, default=str).encode()).hexdigest(),
+            "run"   : hashlib.sha256(json.dumps(run_d, sort_keys=True, default=str).encode()).hexdigest()}
+
+#=====================================================
+# read_fingerprint
+#=====================================================
+def read_fingerprint(work_dir):
+    '''
+    Return the fingerprint stored in the work directory, or None if there is none.
+    '''
+    try:
+        with open(os.path.join(work_dir, FINGERPRINT_FILE)) as fp:
+            return json.load(fp)
+    except (OSError, ValueError):
+        return None
+
+#=====================================================
+# write_fingerprint
+#=====================================================
+def write_fingerprint(work_dir, fingerprint_d):
+    with open(os.path.join(work_dir, FINGERPRINT_FILE), 'w') as fp:
+        json.dump(fingerprint_d, fp, indent=2)
+
+#=====================================================
+# dag_closure
+#=====================================================
+def dag_closure(dag_d, node_path, closure_s=None, visited_s=None):
+    '''
+    Return the set of files of a file_list and of all its dependencies.
+    '''
+    if (closure_s == None):
+        closure_s = set()
+    if (visited_s == None):
+        visited_s = set()
+    if (node_path in visited_s):
+        return closure_s
+    visited_s.add(node_path)
+    closure_s.update(dag_d[node_path]["files"])
+    for dep in dag_d[node_path]["dep"]:
+        dag_closure(dag_d, dep, closure_s, visited_s)
+    return closure_s
+
+#=====================================================
+# get_shared_files
+#=====================================================
+def get_shared_files(dag_d, files_d, root_l):
+    '''
+    Return the keys of files_d whose file belongs to the dependency sub-DAG of a module located
+    under one of the root_l directories. The top file_list is never shared.
+    The order of files_d, which is the compilation order, is kept.
+    '''
+    shared_s = set()
+    for (node_path, node) in dag_d.items():
+        if (node["is_top"]):
+            continue
+        for root in root_l:
+            if (os.path.commonpath([node["dir"], root]) == root):
+                dag_closure(dag_d, node_path, shared_s)
+                break
+    return [k for k in files_d.keys()
+            if (files_d[k]["name"] in shared_s) and (files_d[k]['file_type'] in ["systemVerilogSource", "verilogSource"])]
+
+#=====================================================
+# get_tool_version
+#=====================================================
+def get_tool_version(tool):
+    '''
+    Identify the tool installation : compiler binary real path and installation directory.
+    Our tool installations are versioned directories.
+    '''
+    tool_bin = shutil.which(LIB_CACHE_TOOLS[tool]["bin"])
+    if (tool_bin == None):
+        sys.exit(ERROR_PRINT + " {:s} not found. Needed by the shared library cache.".format(LIB_CACHE_TOOLS[tool]["bin"]) + RESET_COLOR)
+    return "{:s}:{:s}".format(os.path.realpath(tool_bin), str(os.getenv(LIB_CACHE_TOOLS[tool]["home"])))
+
+#=====================================================
+# get_define_l
+#=====================================================
+def get_define_l(parameters_d):
+    '''
+    Return the list of (name, value) of the defines. Bool defines are only kept when set.
+    '''
+    define_l = []
+    for (k,v) in parameters_d.items():
+        if (v["paramtype"] == "vlogdefine"):
+            if (v["datatype"] == "bool"):
+                if (v["default"]):
+                    define_l.append((k, None))
+            else:
+                define_l.append((k, v["default"]))
+    return define_l
+
+#=====================================================
+# get_shared_lib_l
+#=====================================================
+def get_shared_lib_name(entry):
+    '''
+    Return the library of a shared file in the cache.
+    '''
+    return "{:s}_{:s}".format(SHARED_LIB_NAME, entry.get("logical_name", DEFAULT_LIB_NAME))
+
+def get_shared_lib_l(files_d, shared_l):
+    '''
+    Return the libraries of the shared files, in compilation order.
+    '''
+    lib_l = []
+    for k in shared_l:
+        lib = get_shared_lib_name(files_d[k])
+        if not(lib in lib_l):
+            lib_l.append(lib)
+    return lib_l
+
+#=====================================================
+# compute_lib_key
+#=====================================================
+def compute_lib_key(tool, files_d, shared_l, parameters_d, tool_options_d):
+    '''
+    Key of a shared library: tool version, defines, compile options of the tool,
+    libraries and content of the shared files.
+    '''
+    key_d = {"tool"    : tool,
+             "version" : get_tool_version(tool),
+             "defines" : get_define_l(parameters_d),
+             "options" : tool_options_d[tool].get(LIB_CACHE_TOOLS[tool]["options"], []),
+             "libs"    : get_shared_lib_l(files_d, shared_l),
+             "files"   : []}
+    for k in shared_l:
+        entry = {k: v for (k,v) in files_d[k].items()}
+        entry["digest"] = file_digest(files_d[k]["name"])
+        key_d["files"].append(entry)
+    return hashlib.sha256(json.dumps(key_d, sort_keys=True, default=str).encode()).hexdigest()
+
+#=====================================================
+# build_shared_lib
+#=====================================================
+def build_shared_lib(tool, lib_dir, files_d, shared_l, parameters_d, tool_options_d):
+    '''
+    Compile the shared files into their libraries (see get_shared_lib_name), in lib_dir.
+    Each file is compiled with the options of its type, in compilation order.
+    Nothing is done if the library already exists.
+    The library is compiled in a temporary directory, then renamed, so that concurrent
+    jobs never see a partial library.
+    '''
+    if (os.path.isdir(lib_dir)):
+        print("INFO> Shared library found : {:s}".format(lib_dir))
+        return
+
+    print("INFO> Compile shared library : {:s}".format(lib_dir))
+    tmp_dir = "{:s}.tmp{:d}".format(lib_dir, os.getpid())
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    incdir_l = []
+    for k in shared_l:
+        for inc in files_d[k].get("include_path", []):
+            if not(inc in incdir_l):
+                incdir_l.append(inc)
+    define_l = get_define_l(parameters_d)
+    option_l = " ".join(tool_options_d[tool].get(LIB_CACHE_TOOLS[tool]["options"], [])).split()
+
+    # Consecutive files of the same library and type are compiled by the same command
+    batch_l = []
+    for k in shared_l:
+        if (files_d[k].get("is_include_file", False)):
+            continue
+        batch = (get_shared_lib_name(files_d[k]), files_d[k]["file_type"] == "systemVerilogSource")
+        if (len(batch_l) == 0) or (batch_l[-1][0] != batch):
+            batch_l.append((batch, []))
+        batch_l[-1][1].append(files_d[k]["name"])
+
+    if (tool == "vcs"):
+        with open(os.path.join(tmp_dir, "synopsys_sim.setup"), 'w') as fp:
+            fp.write("WORK > DEFAULT\n")
+            fp.write("DEFAULT : ./work\n")
+            for lib in get_shared_lib_l(files_d, shared_l):
+                fp.write("{:s} : ./{:s}\n".format(lib, lib))
+
+    for ((lib, is_sv), src_l) in batch_l:
+        if (tool == "vcs"):
+            cmd = ["vlogan", "-full64", "-work", lib]
+            cmd += [LIB_CACHE_TOOLS[tool]["sv"]] if is_sv else []
+            cmd += option_l
+            cmd += ["+incdir+{:s}".format(inc) for inc in incdir_l]
+            cmd += ["+define+{:s}".format(k) if (v == None) else "+define+{:s}={:s}".format(k, str(v)) for (k,v) in define_l]
+        else: # xsim
+            cmd = ["xvlog", "--work", "{:s}=./{:s}".format(lib, lib)]
+            cmd += [LIB_CACHE_TOOLS[tool]["sv"]] if is_sv else []
+            cmd += option_l
+            for inc in incdir_l:
+                cmd += ["-i", inc]
+            for (k,v) in define_l:
+                cmd += ["-d", k if (v == None) else "{:s}={:s}".format(k, str(v))]
+        cmd += src_l
+
+        if (VERBOSE):
+            print("INFO> Run : {:s}".format(" ".join(cmd)))
+        ret = sbprc.run(cmd, cwd=tmp_dir)
+        if (ret.returncode != 0):
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            sys.exit(ERROR_PRINT + " Shared library compilation failed : {:s}".format(" ".join(cmd)) + RESET_COLOR)
+
+    try:
+        os.rename(tmp_dir, lib_dir)
+    except OSError:
+        # Built in the meantime by another job
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+#=====================================================
+# link_shared_lib
+#=====================================================
+def link_shared_lib(tool, work_dir, lib_dir, lib_l):
+    '''
+    Map the shared libraries lib_l in the work directory library setup file.
+    '''
+    if (tool == "vcs"):
+        setup_file = os.path.join(work_dir, "synopsys_sim.setup")
+        fmt = "{:s} : {:s}\n"
+    else: # xsim
+        setup_file = os.path.join(work_dir, "xsim.ini")
+        fmt = "{:s}={:s}\n"
+
+    line_l = []
+    if (os.path.exists(setup_file)):
+        with open(setup_file) as fp:
+            line_l = [l for l in fp.readlines() if not(re.match(r'\s*{:s}\w*\s*[:=]'.format(SHARED_LIB_NAME), l))]
+    elif (tool == "vcs"):
+        line_l = ["WORK > DEFAULT\n", "DEFAULT : ./work\n"]
+    line_l += [fmt.format(lib, os.path.join(lib_dir, lib)) for lib in lib_l]
+    with open(setup_file, 'w') as fp:
+        fp.writelines(line_l)
+
+#=====================================================
+# phase_start
+#=====================================================
+def phase_start():
+    '''
+    Return the start point of a timed phase. To be given to phase_end.
+    '''
+    return (time.time(), resource.getrusage(resource.RUSAGE_SELF), resource.getrusage(resource.RUSAGE_CHILDREN))
+
+#=====================================================
+# phase_end
+#=====================================================
+def phase_end(timing_l, name, start):
+    '''
+    Append the timing of the phase started at start to timing_l:
+        wall_s          : elapsed time
+        self_cpu_s      : CPU time of this script
+        child_user_s    : user CPU time of the tools run during the phase
+        child_sys_s     : system CPU time of the tools run during the phase
+        child_maxrss_kb : peak RSS of the largest tool that ended during the phase, or None.
+                          getrusage only gives the maximum over all the children so far: when
+                          it rose during the phase, the new value is the peak of one of its tools.
+                          Otherwise the tools of the phase were smaller than a previous one.
+    '''
+    (t0, self0, child0) = start
+    self1  = resource.getrusage(resource.RUSAGE_SELF)
+    child1 = resource.getrusage(resource.RUSAGE_CHILDREN)
+    timing_l.append({"phase"           : name,
+                     "wall_s"          : round(time.time() - t0, 3),
+                     "self_cpu_s"      : round((self1.ru_utime - self0.ru_utime) + (self1.ru_stime - self0.ru_stime), 3),
+                     "child_user_s"    : round(child1.ru_utime - child0.ru_utime, 3),
+                     "child_sys_s"     : round(child1.ru_stime - child0.ru_stime, 3),
+                     "child_maxrss_kb" : child1.ru_maxrss if (child1.ru_maxrss > child0.ru_maxrss) else None})
+
+#=====================================================
+# write_timing
+#=====================================================
+def write_timing(work_dir, args, timing_l):
+    '''
+    Append the timing of this invocation to TIMING_FILE in the work directory.
+    A testbench is often run with several invocations (config, then build and run),
+    so the previous ones are kept as long as the work directory is.
+    '''
+    timing_file = os.path.join(work_dir, TIMING_FILE)
+    try:
+        with open(timing_file) as fp:
+            timing_d = json.load(fp)
+    except (OSError, ValueError):
+        timing_d = {"top" : args.top_name, "tool" : args.tool, "invocations" : []}
+    timing_d["invocations"].append({"date"   : time.strftime("%Y-%m-%dT%H:%M:%S"),
+                                    "seed"   : args.seed,
+                                    "phases" : timing_l,
+                                    "wall_s" : round(sum([t["wall_s"] for t in timing_l]), 3)})
+    with open(timing_file, 'w') as fp:
+        json.dump(timing_d, fp, indent=2)
+
+#=====================================================
+# precheck_file
+#=====================================================
+def precheck_file(entry, include_dir_l):
+    '''
+    Check a single file of the resolved list:
+    * the file exists,
+    * every `include resolves against the file directory, then the include directories,
+    * module/package/interface/program blocks are closed.
+    Return the errors, and the declared blocks as (kind, name, line).
+    '''
+    error_l = []
+    decl_l  = []
+    file_path = entry["name"]
+    try:
+        with open(file_path, 'rb') as fp:
+            text = fp.read().decode('utf-8', errors='replace')
+    except OSError as e:
+        return {"name" : file_path, "errors" : ["{:s}: cannot be read: {:s}".format(file_path, e.strerror)], "decl" : []}
+
+    if not(entry["file_type"] in PRECHECK_FILE_TYPES):
+        return {"name" : file_path, "errors" : [], "decl" : []}
+
+    # Remove comments, keep strings for the include file names. Keep line numbers.
+    text = PRECHECK_LEXEM_RE.sub(lambda m : m.group(0) if m.group(0).startswith('"') else "\n" * m.group(0).count("\n"), text)
+
+    search_dir_l = [os.path.dirname(file_path)] + entry.get("include_path", []) + include_dir_l
+    for m in PRECHECK_INCLUDE_RE.finditer(text):
+        inc = m.group(1)
+        line = text.count("\n", 0, m.start()) + 1
+        if (os.path.isabs(inc)):
+            found = os.path.isfile(inc)
+        else:
+            found = any([os.path.isfile(os.path.join(d, inc)) for d in search_dir_l])
+        if not(found):
+            error_l.append("{:s}:{:d}: `include \"{:s}\" not found in the include directories.".format(file_path, line, inc))
+
+    for blk in PRECHECK_BLOCKS:
+        open_nb  = len(re.findall(r'^\s*(?:macro)?{:s}\b'.format(blk) if (blk == "module") else r'^\s*{:s}\b'.format(blk), text, re.M))
+        close_nb = len(re.findall(r'\bend{:s}\b'.format(blk), text))
+        if (open_nb != close_nb):
+            error_l.append("{:s}: {:d} {:s} for {:d} end{:s}.".format(file_path, open_nb, blk, close_nb, blk))
+
+    if not(entry.get("is_include_file", False)):
+        for m in PRECHECK_DECL_RE.finditer(text):
+            kind = "module" if (m.group(1) == "macromodule") else m.group(1)
+            decl_l.append((kind, m.group(2), text.count("\n", 0, m.start()) + 1))
+
+    return {"name" : file_path, "errors" : error_l, "decl" : decl_l}
+
+#=====================================================
+# precheck_files
+#=====================================================
+def precheck_files(files_l, dag_d, job_nb):
+    '''
+    Check the resolved file list in parallel, without any simulator.
+    Also check that the include directories exist, and that a module, package, interface or
+    program is declared only once.
+    Return the list of errors.
+    '''
+    error_l = []
+    include_dir_l = []
+    for node in dag_d.values():
+        for inc in node["include_dir"]:
+            if not(inc in include_dir_l):
+                include_dir_l.append(inc)
+    for f in files_l:
+        if (f.get("is_include_file", False)) and not(os.path.dirname(f["name"]) in include_dir_l):
+            include_dir_l.append(os.path.dirname(f["name"]))
+    for inc in include_dir_l:
+        if not(os.path.isdir(inc)):
+            error_l.append("{:s}: include directory not found.".format(inc))
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=job_nb) as executor:
+        result_l = list(executor.map(precheck_file, files_l, [include_dir_l] * len(files_l), chunksize=16))
+
+    decl_d = {}
+    for r in result_l:
+        error_l += r["errors"]
+        for (kind, name, line) in r["decl"]:
+            decl_d.setdefault((kind, name), []).append("{:s}:{:d}".format(r["name"], line))
+    for ((kind, name), loc_l) in decl_d.items():
+        if (len(loc_l) > 1):
+            error_l.append("{:s} {:s} declared several times: {:s}".format(kind, name, ", ".join(loc_l)))
+
+    return error_l
+
+#=====================================================
+# dump_dag
+#=====================================================
+def dump_dag(dag_out, args, parse_flag_d, dag_d):
+    '''
+    Dump the resolved dependency graph in JSON and GraphViz formats.
+    Paths are given relative to PROJECT_DIR when possible.
+    '''
+    def rel(path):
+        if (os.path.commonpath([path, PROJECT_DIR]) == PROJECT_DIR):
+            return os.path.relpath(path, PROJECT_DIR)
+        return path
+
+    node_d = {}
+    for (node_path, node) in dag_d.items():
+        node_d[rel(node_path)] = {"dir"         : rel(node["dir"]),
+                                  "is_top"      : node["is_top"],
+                                  "dep"         : [rel(d) for d in node["dep"]],
+                                  "files"       : [rel(f) for f in node["files"]],
+                                  "include_dir" : [rel(i) for i in node["include_dir"]]}
+
+    os.makedirs(os.path.dirname(os.path.abspath(dag_out)), exist_ok=True)
+    with open(dag_out + ".json", 'w') as fp:
+        json.dump({"top"   : args.top_name,
+                   "tool"  : args.tool,
+                   "flags" : parse_flag_d,
+                   "sva"   : args.sva_l,
+                   "nodes" : node_d}, fp, indent=2)
+
+    with open(dag_out + ".dot", 'w') as fp:
+        fp.write("digraph \"{:s}\" {{\n".format(args.top_name))
+        fp.write("  rankdir=LR;\n")
+        for (node_path, node) in node_d.items():
+            fp.write("  \"{:s}\" [shape=box, style=filled, fillcolor={:s}];\n".format(node["dir"], "gold" if node["is_top"] else "lightblue"))
+            for d in node["dep"]:
+                fp.write("  \"{:s}\" -> \"{:s}\";\n".format(node["dir"], node_d[d]["dir"]))
+            for f in node["files"]:
+                fp.write("  \"{:s}\" [shape=note];\n".format(f))
+                fp.write("  \"{:s}\" -> \"{:s}\" [style=dashed];\n".format(node["dir"], f))
+        fp.write("}\n")
+
+#=====================================================
+# get_impacting_files
+#=====================================================
+def get_impacting_files(changed_l, top_file_list, dag_d, files_d):
+    '''
+    Return the changed files the top depends on. A top depends on a file if it is:
+    * one of the resolved files, or a file selected by a parsed file_list.json, even if a file
+      with the same name is used instead (ex: flag variants, when no flag is given),
+    * one of the parsed file_list.json,
+    * in one of the selected include directories (include files are not always listed).
+    changed_l items are paths relative to PROJECT_DIR, or '@<file>' to read them from a file.
+    '''
+    path_l = []
+    for c in changed_l:
+        if (c.startswith("@")):
+            with open(c[1:]) as fp:
+                path_l += [l.strip() for l in fp.readlines() if len(l.strip()) > 0]
+        else:
+            path_l.append(c)
+
+    dep_s = set([v["name"] for v in files_d.values()])
+    dep_s.update(dag_d.keys())
+    dep_s.add(os.path.abspath(top_file_list))
+    include_dir_s = set()
+    for node in dag_d.values():
+        dep_s.update(node["files"])
+        include_dir_s.update(node["include_dir"])
+
+    impacted_l = []
+    for c in path_l:
+        path = normalize_path(c, PROJECT_DIR)
+        if (path in dep_s) or (os.path.dirname(path) in include_dir_s):
+            impacted_l.append(c)
+    return impacted_l
 
 #=====================================================
 # Dump files list in a preformatted tcl dictionary.
 #=====================================================
-def dump_config_as_tcl_dict(args):
+def dump_config_as_tcl_dict(args, files_l):
     # Open tcl environment file
     tcl_path = Path(args.tcl_dict_out) if Path(args.tcl_dict_out).is_absolute() else Path.cwd() / args.tcl_dict_out
     tcl_dict = "Edalize_Dict"
@@ -445,24 +1037,20 @@ def dump_config_as_tcl_dict(args):
       # TODO extend dict with others properties
 
 #=====================================================
-# Main
-#=====================================================
-if __name__ == '__main__':
-
-#=====================================================
-# Parse input arguments
+# get_arg_parser
 #=====================================================
+def get_arg_parser():
     parser = argparse.ArgumentParser(description = "Run EDAlize.")
-    parser.add_argument('-m', dest='top_name', type=str, help="Top module's name.", required=True)
+    parser.add_argument('-m', dest='top_name', type=str, help="Top module's name.")
     parser.add_argument('-f', dest='file_list', type=str, help="File list.", default="__default__")
-    parser.add_argument('-t', dest='tool', type=str, help="EDA tool.", required=True)
+    parser.add_argument('-t', dest='tool', type=str, help="EDA tool.")
     parser.add_argument('-d', dest='work_root_dir', type=str, help="Work root directory. Results are in <work_root_dir>/<tool>/<top_name>. Default: ${PROJECT_DIR}/hw/output. ", default=os.path.expandvars("__default__"))
     parser.add_argument('-a', dest='tool_option_l', type=str, help='Tool additional options. Fields are separated with ":" : "option_name:option_value<:option_value>".', action='append')
     parser.add_argument('-e', dest='tool_feature_en_l', type=str, help='Enable tool features.', choices=['wave', 'wave_dve', 'ooc', 'cov', 'stdout', 'rec', 'lint'] , action='append')
     parser.add_argument('-r', dest='simulation_time', type=str, help='Simulation time given to run command.')
     parser.add_argument('-y', dest='skip_stage_l', type=str, help="EDAlize skipped stages. Default : []", choices=['config','build','run'] , action='append', default = [])
-    parser.add_argument('-k', dest='work_directory_strategy', type=str, help="Indicate what the behavior in case the work directory already exists. Note that if 'keep' is chosen, the config phase is not done. Default : delete", choices=['delete','copy','keep'], default='delete')
-    parser.add_argument('-s', dest='seed', type=int, help="Seed value. Default : current time", default=int(time.time()*1000000000000000) & 0xFFFFFFFFFFFF)
+    parser.add_argument('-k', dest='work_directory_strategy', type=str, help="Indicate what the behavior in case the work directory already exists. Note that if 'keep' is chosen, the config phase is not done. If 'incr' is chosen, the config and build phases are skipped when the fingerprint of the sources, defines and tool options matches the one of the previous build. Default : delete", choices=['delete','copy','keep','incr'], default=None)
+    parser.add_argument('-s', dest='seed', type=int, help="Seed value. Default : current time. With '-k keep', or '-k incr' on an existing work directory, the previous seed.", default=None)
     parser.add_argument('-g', dest='gui', help="Run in gui mode.", action="store_true", default=False)
     parser.add_argument('-gv', dest='gui_verdi', help="Run in verdi gui mode.", action="store_true", default=False)
     parser.add_argument('-w', dest='wavetcl', help="Tcl file to be executed instead of the default one when processing wave. (define signals to log)")
@@ -475,8 +1063,29 @@ if __name__ == '__main__':
     parser.add_argument('-v', dest='verbose', help="Run in verbose mode.", action="store_true", default=False)
 
     parser.add_argument('--tcl-dict-out', dest='tcl_dict_out', type=str, help="File path of the outputted tcl dictionary", default='edalize_file_list.tcl')
+    parser.add_argument('--precheck', dest='precheck', help="Check the resolved file list before running the tool : file existence, `include resolution, block closure, duplicated declarations. Exit on error.", action="store_true", default=False)
+    parser.add_argument('--precheck-jobs', dest='precheck_jobs', type=int, help="Number of parallel processes of the pre-check. Default : number of cpus", default=None)
+    parser.add_argument('--lib-cache', dest='lib_cache', type=str, help="Shared library cache directory (vcs and xsim only). The dependencies located under the --lib-cache-root directories are compiled once in this cache, per tool version, compile options, defines and file contents, and linked by the later runs. Each file keeps its library and file type.", default=None)
+    parser.add_argument('--lib-cache-root', dest='lib_cache_root_l', type=str, help="Directory, relative to PROJECT_DIR, whose modules are compiled in the shared library cache. Default : {:s}".format(str(LIB_CACHE_DEFAULT_ROOTS)), action='append', default=None)
+    parser.add_argument('--dag-out', dest='dag_out', type=str, help="Dump the resolved dependency graph (modules, dependencies, files, include directories) in <dag_out>.json and <dag_out>.dot, and exit. The work directory is not used.", default=None)
+    parser.add_argument('--impacted-by', dest='impacted_by_l', type=str, help="Changed file. Report whether the top depends on it, considering flags, env and sva, and exit. The work directory is not used. '@<file>' reads the changed files from <file>, one per line. Can be given several times.", action='append', default=None)
+    parser.add_argument('--batch', dest='batch', type=str, help="JSON file containing a list of jobs. Each job is a dictionary with the entries: top, tool, and optionally flags ([[name, value]]), params and defines ([[name, type, value]]), args (list of additional run_edalize arguments). The other arguments given on the command line apply to every job. Default work directory strategy is then 'incr'.", default=None)
+    parser.add_argument('--batch-out', dest='batch_out', type=str, help="File where the batch results are written. Default : <work_root_dir>/batch_result.json", default=None)
 
-    args = parser.parse_args()
+    return parser
+
+#=====================================================
+# run_job
+#=====================================================
+def run_job(args):
+    '''
+    Run EDAlize for a single top, described by the parsed arguments.
+    Return a dictionary with:
+        stages   : EDAlize stages that have been run
+        impacted : for --impacted-by, the given files the top depends on
+    Errors exit through sys.exit, as in the rest of this script.
+    '''
+    global VERBOSE, SEVERITY, PROJECT_DIR
 
     VERBOSE = args.verbose
     SEVERITY = args.severity
@@ -489,6 +1098,12 @@ if __name__ == '__main__':
     else:
         PROJECT_DIR = os.getenv("PROJECT_DIR")
 
+    if (args.top_name == None) or (args.tool == None):
+        sys.exit(ERROR_PRINT + " Top module's name (-m) and EDA tool (-t) are required." + RESET_COLOR)
+
+    if (args.work_directory_strategy == None):
+        args.work_directory_strategy = 'delete'
+
 #=====================================================
 # EDAlize stages
 #=====================================================
@@ -625,7 +1240,12 @@ if __name__ == '__main__':
         work_root_dir = os.path.abspath(work_root_dir)
     work_dir = os.path.join(work_root_dir, args.tool, args.top_name)
 
-    if (os.path.exists(work_dir)):
+    # Dependency queries only parse the file_lists : the work directory is left untouched.
+    query_mode = (args.dag_out != None) or (args.impacted_by_l != None)
+
+    if (query_mode):
+        print ("INFO> Dependency query : work directory not used.")
+    elif (os.path.exists(work_dir)):
         if (args.work_directory_strategy == 'delete'):
             print ("INFO> Previous work directory found : {:s}. Deleting it.".format(work_dir))
             shutil.rmtree(work_dir)
@@ -645,6 +1265,17 @@ if __name__ == '__main__':
             print ("INFO> Previous work directory found : {:s}. Moving it into {:s}.".format(work_dir,old_work_dir))
             shutil.move(work_dir, old_work_dir)
             os.makedirs(name=work_dir, exist_ok=True)
+        elif (args.work_directory_strategy == 'incr'):
+            print ("INFO> Previous work directory found : {:s}. Keep it.".format(work_dir))
+            print ("INFO> Config and build phases will be skipped if the fingerprint matches.")
+            # retrieve previous seed, if none is given.
+            if (args.seed == None):
+                try:
+                    with open(os.path.join(work_dir,"seed.txt")) as f:
+                        args.seed = int(f.readline().rstrip())
+                    print ("INFO> Same seed will be used.")
+                except (OSError, ValueError):
+                    None
         else: # keep
             print ("INFO> Previous work directory found : {:s}. Keep it.".format(work_dir))
             print ("INFO> Config phase will not be run.")
@@ -667,26 +1298,30 @@ if __name__ == '__main__':
     print("===========================================================")
 
     # Create link to memory file dir
-    memfile_dir = os.path.join(PROJECT_DIR,"hw","memory_file")
-    link_memfile_dir = os.path.join(work_dir,"memory_file")
-    try:
-      os.remove(link_memfile_dir)
-    except OSError:
-      None
-    os.symlink(memfile_dir, link_memfile_dir)
-    print("===========================================================")
-    print("Link to memory_file directory : {:s} -> {:s}".format(link_memfile_dir, memfile_dir))
-    print("===========================================================")
+    if not(query_mode):
+        memfile_dir = os.path.join(PROJECT_DIR,"hw","memory_file")
+        link_memfile_dir = os.path.join(work_dir,"memory_file")
+        try:
+          os.remove(link_memfile_dir)
+        except OSError:
+          None
+        os.symlink(memfile_dir, link_memfile_dir)
+        print("===========================================================")
+        print("Link to memory_file directory : {:s} -> {:s}".format(link_memfile_dir, memfile_dir))
+        print("===========================================================")
 
 #=====================================================
 # Using Seed
 #=====================================================
+    if (args.seed == None):
+        args.seed = int(time.time()*1000000000000000) & 0xFFFFFFFFFFFF
     print("===========================================================")
     print("Using Seed: {:d}".format(args.seed))
     print("===========================================================")
     # Create seed file
-    with open(os.path.join(work_dir,"seed.txt"), 'w') as f:
-      f.write('{:0d}'.format(args.seed))
+    if not(query_mode):
+        with open(os.path.join(work_dir,"seed.txt"), 'w') as f:
+          f.write('{:0d}'.format(args.seed))
 
 #=====================================================
 # Parse tool options : set default
@@ -702,6 +1337,8 @@ if __name__ == '__main__':
         tool_options_d[tool]["ooc"]=False
     elif (tool == "xsim"):
         tool_options_d[tool]["xelab_options"]=["-debug typical"]
+        # xvlog compiles the shared library cache, xelab the other files
+        tool_options_d[tool]["xvlog_options"]=[]
         tool_options_d[tool]["xsim_options"]=["-sv_seed {:d}".format(args.seed)]
         tool_options_d[tool]["xsim_options"].append("-ignore_coverage")
         tool_options_d[tool]["cov"] = False
@@ -836,8 +1473,42 @@ if __name__ == '__main__':
         path_to_file_list = search_file_list(args.top_name)
     else:
         path_to_file_list = args.file_list
+    timing_l = []
+    start = phase_start()
     files_d = {}
-    parse_files(path_to_file_list, files_d, tool_options_d[tool]["rec"], ENV_OF_TOOLS[tool], parse_flag_d, True, sva_l)
+    dag_d = {}
+    parse_files(path_to_file_list, files_d, tool_options_d[tool]["rec"], ENV_OF_TOOLS[tool], parse_flag_d, True, sva_l, dag_d)
+    phase_end(timing_l, "resolve", start)
+
+#=====================================================
+# Dependency queries
+#=====================================================
+    if (args.dag_out != None):
+        dump_dag(args.dag_out, args, parse_flag_d, dag_d)
+        print("EARLY_EXIT> Dependency graph dumped in {:s}.json and {:s}.dot".format(args.dag_out, args.dag_out))
+
+    if (args.impacted_by_l != None):
+        impacted_l = get_impacting_files(args.impacted_by_l, path_to_file_list, dag_d, files_d)
+        if (len(impacted_l) > 0):
+            print("IMPACTED> {:s} depends on : {:s}".format(args.top_name, " ".join(impacted_l)))
+        else:
+            print("NOT_IMPACTED> {:s}".format(args.top_name))
+
+    if (query_mode):
+        return {"stages" : [], "impacted" : impacted_l if (args.impacted_by_l != None) else None}
+
+    if (args.precheck):
+        start = phase_start()
+        error_l = precheck_files([v for v in files_d.values()], dag_d, args.precheck_jobs)
+        phase_end(timing_l, "precheck", start)
+        if (len(error_l) > 0):
+            print("===========================================================")
+            print("Pre-check errors")
+            for e in error_l:
+                print("ERROR> " + e)
+            print("===========================================================")
+            sys.exit(ERROR_PRINT + " Pre-check failed with {:d} errors.".format(len(error_l)) + RESET_COLOR)
+        print("INFO> Pre-check OK : {:d} files.".format(len(files_d)))
 
     files_l = []
     for k,v in files_d.items():
@@ -863,9 +1534,9 @@ if __name__ == '__main__':
                "post_run"       : []}
 
     if (tool == "tcl_dict"):
-        dump_config_as_tcl_dict(args)
+        dump_config_as_tcl_dict(args, files_l)
         print("EARLY_EXIT> Configuration dump as tcl dict")
-        sys.exit(0)
+        return {"stages" : []}
 
     if (tool == "vivado"):
         # Modify <my_module>.tcl
@@ -986,6 +1657,35 @@ if __name__ == '__main__':
         parameters_d[p] = {'datatype' : param_type, 'default' : param_val,'paramtype' : 'vlogdefine'}
 
 
+#=====================================================
+# Shared library cache
+#=====================================================
+    lib_dir = None
+    lib_l = []
+    if (args.lib_cache != None):
+        if not(tool in LIB_CACHE_TOOLS):
+            print_severity("WARNING", "Shared library cache is not supported for {:s}. Not used.".format(tool))
+        else:
+            lib_cache_root_l = args.lib_cache_root_l
+            if (lib_cache_root_l == None):
+                lib_cache_root_l = LIB_CACHE_DEFAULT_ROOTS
+            lib_cache_root_l = [normalize_path(r, PROJECT_DIR) for r in lib_cache_root_l]
+            shared_l = get_shared_files(dag_d, files_d, lib_cache_root_l)
+            if (len(shared_l) > 0):
+                lib_key = compute_lib_key(tool, files_d, shared_l, parameters_d, tool_options_d)
+                lib_dir = os.path.join(os.path.abspath(args.lib_cache), tool, lib_key)
+                lib_l = get_shared_lib_l(files_d, shared_l)
+                start = phase_start()
+                build_shared_lib(tool, lib_dir, files_d, shared_l, parameters_d, tool_options_d)
+                phase_end(timing_l, "shared_lib", start)
+                # Shared files are not compiled anymore. Include files are kept for the include paths.
+                files_l = [v for (k,v) in files_d.items() if not(k in shared_l) or v.get("is_include_file", False)]
+                if (tool == "vcs"):
+                    tool_options_d[tool]["vcs_options"].append("-liblist {:s}".format("+".join(lib_l)))
+                else: # xsim
+                    tool_options_d[tool]["xelab_options"] += ["-L {:s}".format(lib) for lib in lib_l]
+                print("INFO> {:d} files are taken from the shared library {:s}".format(len(shared_l), lib_dir))
+
 #=====================================================
 # Build EDAM
 #=====================================================
@@ -1000,37 +1700,219 @@ if __name__ == '__main__':
         'hooks'        : hooks_d}
 
 
+#=====================================================
+# Incremental build
+#=====================================================
+    if (args.work_directory_strategy == 'incr'):
+        fingerprint_d = compute_fingerprint(tool, args.top_name, files_l, parameters_d, tool_options_d, hooks_d, args.seed, lib_dir)
+        prev_fingerprint_d = read_fingerprint(work_dir)
+        if (prev_fingerprint_d != None) and (prev_fingerprint_d.get("build") == fingerprint_d["build"]):
+            print("INFO> Build fingerprint matches : build phase skipped.")
+            try:
+                run_stage_l.remove('build')
+            except ValueError:
+                None
+            if (prev_fingerprint_d.get("run") == fingerprint_d["run"]):
+                print("INFO> Run fingerprint matches : config phase skipped.")
+                try:
+                    run_stage_l.remove('config')
+                except ValueError:
+                    None
+        else:
+            if (prev_fingerprint_d != None):
+                print("INFO> Build fingerprint mismatch : full rebuild.")
+            # The previous build does not correspond to the sources anymore.
+            try:
+                os.remove(os.path.join(work_dir, FINGERPRINT_FILE))
+            except OSError:
+                None
+
     # EDAlize backend object
     backend = get_edatool(tool)(edam=edam,
                                 work_root=work_dir)
 
-    if ('config' in run_stage_l):
-        # Create project scripts
-        print("===========================================================")
-        print("-----------------------------------------------------------")
-        print("| EDAlize Configure                                       |")
-        print("-----------------------------------------------------------")
-        print("===========================================================")
-        backend.configure()
+    try:
+        if ('config' in run_stage_l):
+            # Create project scripts
+            print("===========================================================")
+            print("-----------------------------------------------------------")
+            print("| EDAlize Configure                                       |")
+            print("-----------------------------------------------------------")
+            print("===========================================================")
+            start = phase_start()
+            backend.configure_pre()
+            phase_end(timing_l, "pre_configure_hooks", start)
+            start = phase_start()
+            backend.configure_main()
+            phase_end(timing_l, "configure", start)
+            start = phase_start()
+            backend.configure_post()
+            phase_end(timing_l, "post_configure_hooks", start)
+
+        if (lib_dir != None):
+            link_shared_lib(tool, work_dir, lib_dir, lib_l)
+
+        if ('build' in run_stage_l):
+            print("===========================================================")
+            print("-----------------------------------------------------------")
+            print("| EDAlize Build                                           |")
+            print("-----------------------------------------------------------")
+            print("===========================================================")
+            # Build the model
+            start = phase_start()
+            backend.build_pre()
+            phase_end(timing_l, "pre_build_hooks", start)
+            # Compile and elaborate are done by the same tool command
+            start = phase_start()
+            backend.build_main('-B')
+            phase_end(timing_l, "build", start)
+            start = phase_start()
+            backend.build_post()
+            phase_end(timing_l, "post_build_hooks", start)
+
+        if (args.work_directory_strategy == 'incr'):
+            # Record what the work directory has been built and configured with.
+            if ('build' in run_stage_l):
+                write_fingerprint(work_dir, fingerprint_d)
+            elif ('config' in run_stage_l) and (prev_fingerprint_d != None) and (prev_fingerprint_d.get("build") == fingerprint_d["build"]):
+                write_fingerprint(work_dir, fingerprint_d)
+
+        if ('run' in run_stage_l):
+            print("===========================================================")
+            print("-----------------------------------------------------------")
+            print("| EDAlize Run                                             |")
+            print("-----------------------------------------------------------")
+            print("===========================================================")
+            #arguments
+            tool_args = {}
+            # Run
+            start = phase_start()
+            backend.run_pre(tool_args)
+            phase_end(timing_l, "pre_run_hooks", start)
+            start = phase_start()
+            backend.run_main()
+            phase_end(timing_l, "simulate", start)
+            start = phase_start()
+            backend.run_post()
+            phase_end(timing_l, "post_run_hooks", start)
+    finally:
+        # Also written on failure, to see where the time went.
+        write_timing(work_dir, args, timing_l)
+
+    if ('run' in args.skip_stage_l):
+        print(BUILD_DONE_PRINT)
+
+    return {"stages" : [s for s in EDALIZE_STAGES if s in run_stage_l]}
 
-    if ('build' in run_stage_l):
-        print("===========================================================")
-        print("-----------------------------------------------------------")
-        print("| EDAlize Build                                           |")
-        print("-----------------------------------------------------------")
-        print("===========================================================")
-        # Build the model
-        backend.build_pre()
-        backend.build_main('-B')
-        backend.build_post()
+#=====================================================
+# batch_job_argv
+#=====================================================
+def batch_job_argv(job):
+    '''
+    Convert a batch job dictionary into run_edalize arguments.
+    '''
+    argv = []
+    if ("top" in job):
+        argv += ['-m', job["top"]]
+    if ("tool" in job):
+        argv += ['-t', job["tool"]]
+    for (f,v) in job.get("flags", []):
+        argv += ['-F', str(f), str(v)]
+    for (n,t,v) in job.get("params", []):
+        argv += ['-P', str(n), str(t), str(v)]
+    for (n,t,v) in job.get("defines", []):
+        argv += ['-D', str(n), str(t), str(v)]
+    argv += [str(a) for a in job.get("args", [])]
+    return argv
 
-    if ('run' in run_stage_l):
+#=====================================================
+# run_batch
+#=====================================================
+def run_batch(parser, args):
+    '''
+    Run a list of jobs in this process.
+    The file_list.json are parsed once and shared by all the jobs.
+    The jobs that target the same work directory are run one after the other, with the
+    incremental strategy by default, so that the build is only done when the sources,
+    defines or options differ from the previous job.
+    Each job result is recorded separately. A failing job does not stop the batch.
+    '''
+    try:
+        with open(args.batch) as fp:
+            job_l = json.load(fp)
+    except (OSError, ValueError) as e:
+        sys.exit(ERROR_PRINT + " Cannot read batch file {:s}: {:s}".format(args.batch, str(e)) + RESET_COLOR)
+
+    if (args.work_directory_strategy == None):
+        args.work_directory_strategy = 'incr'
+
+    # Jobs sharing a work directory are run consecutively, in order of first appearance.
+    job_args_l = []
+    group_l = []
+    for (idx,job) in enumerate(job_l):
+        job_args = parser.parse_args(batch_job_argv(job), namespace=copy.deepcopy(args))
+        job_args.batch = None
+        group = (job_args.work_root_dir, job_args.tool, job_args.top_name)
+        if not(group in group_l):
+            group_l.append(group)
+        job_args_l.append((idx, job, job_args, group_l.index(group)))
+    job_args_l.sort(key=lambda x : (x[3], x[0]))
+
+    result_l = [None] * len(job_l)
+    for (idx, job, job_args, group_idx) in job_args_l:
         print("===========================================================")
-        print("-----------------------------------------------------------")
-        print("| EDAlize Run                                             |")
-        print("-----------------------------------------------------------")
+        print("Batch job {:d}/{:d} : {:s} {:s}".format(idx+1, len(job_l), str(job_args.top_name), str(job_args.tool)))
         print("===========================================================")
-        #arguments
-        tool_args = {}
-        # Run
-        backend.run(tool_args)
+        start = time.time()
+        result = {"job" : job, "status" : "SUCCESS", "message" : "", "stages" : []}
+        try:
+            result.update(run_job(job_args))
+        except SystemExit as e:
+            if (e.code not in [None, 0]):
+                result["status"] = "FAILED"
+                result["message"] = re.sub(r'\x1b\[[0-9;]*m', '', str(e.code))
+        except Exception as e:
+            result["status"] = "FAILED"
+            result["message"] = "{:s}: {:s}".format(type(e).__name__, str(e))
+        result["seed"] = job_args.seed
+        result["duration"] = time.time() - start
+        result_l[idx] = result
+        if (result["status"] != "SUCCESS"):
+            print("ERROR> Batch job {:d} failed : {:s}".format(idx+1, result["message"]))
+
+    batch_out = args.batch_out
+    if (batch_out == None):
+        work_root_dir = args.work_root_dir
+        if (work_root_dir == "__default__"):
+            work_root_dir = os.path.join(os.getenv("PROJECT_DIR"),"hw","output")
+        batch_out = os.path.join(work_root_dir, "batch_result.json")
+    os.makedirs(os.path.dirname(os.path.abspath(batch_out)), exist_ok=True)
+    with open(batch_out, 'w') as fp:
+        json.dump(result_l, fp, indent=2, default=str)
+
+    fail_nb = len([r for r in result_l if r["status"] != "SUCCESS"])
+    if (args.impacted_by_l != None):
+        print("===========================================================")
+        print("Impacted tops")
+        for r in result_l:
+            if (r.get("impacted")):
+                print(" {:s} {:s}".format(str(r["job"].get("top")), str(r["job"].get("tool"))))
+    print("===========================================================")
+    print("Batch done : {:d} jobs, {:d} failed. Results in {:s}".format(len(result_l), fail_nb, batch_out))
+    print("===========================================================")
+    return fail_nb
+
+#=====================================================
+# Main
+#=====================================================
+if __name__ == '__main__':
+    parser = get_arg_parser()
+    args = parser.parse_args()
+
+    if (args.batch != None):
+        if (not os.getenv("PROJECT_DIR")):
+            sys.exit(ERROR_PRINT + " Environment variable $PROJECT_DIR not defined." + RESET_COLOR)
+        fail_nb = run_batch(parser, args)
+        sys.exit(1 if fail_nb > 0 else 0)
+    else:
+        run_job(args)
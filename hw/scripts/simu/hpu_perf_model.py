@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# ==============================================================================================
+# BSD 3-Clause Clear License
+# Copyright © 2025 ZAMA. All rights reserved.
+# ----------------------------------------------------------------------------------------------
+#  Analytical throughput and simulation cost model of the HPU PBS pipe.
+#
+#  For a parameter set, estimate the cycles needed to process a batch of BATCH_PBS_NB PBS:
+#  * blind rotation : LWE_K CMUX iterations. Within an iteration, each ciphertext goes through
+#                     the decomposition, the forward NTT, the external product and the backward
+#                     NTT, at R*PSI coefficients per cycle (R*PSI/BWD_PSI_DIV for the INTT).
+#                     The iteration is bounded by the datapath, the BSK bandwidth or the loop
+#                     latency when the batch is too small to fill the pipe.
+#  * keyswitch      : the LWE_K x BLWE_K matrix is processed by blocks of LBX x LBY x LBZ
+#                     coefficients (see pep_ks_mult). A block is applied to each ciphertext of
+#                     the batch in turn. Bounded by the datapath or the KSK bandwidth.
+#  The keyswitch and the blind rotation of different batches run concurrently. The slowest
+#  of the two gives the throughput.
+#
+#  This is a first order model: the loop latency is an estimation, and the memory accesses
+#  are considered at full bandwidth. Use it to compare parameter sets, not to sign off.
+#
+#  The simulation cost is the number of cycles of a batch, weighted by the number of
+#  coefficients processed in parallel. It is only meaningful relatively to other sets.
+#
+#  Usage, as a script:
+#    hpu_perf_model.py -param <bash file>... [-set NAME=VAL]... [-sweep NAME=VAL,VAL...]...
+# ==============================================================================================
+
+import argparse # parse input argument
+import csv
+import itertools
+import sys
+
+#=====================================================
+# global var
+#=====================================================
+BR_PARAM_L = ['R', 'PSI', 'S', 'GLWE_K', 'PBS_L', 'BWD_PSI_DIV', 'BATCH_PBS_NB', 'LWE_K', 'MOD_NTT_W', 'BSK_PC', 'AXI_W']
+KS_PARAM_L = ['R', 'S', 'GLWE_K', 'BATCH_PBS_NB', 'LWE_K', 'KS_L', 'LBX', 'LBY', 'LBZ', 'MOD_KSK_W', 'KSK_PC', 'AXI_W']
+PARAM_L    = BR_PARAM_L + [k for k in KS_PARAM_L if k not in BR_PARAM_L]
+DEFAULT_CLK_MHZ = 350
+# Estimated latency of a CMUX loop, outside the NTT : decomposition, mmacc, regfile and pipes
+LOOP_LAT = 100
+# Estimated latency of an NTT stage
+NTT_STG_LAT = 6
+
+#=====================================================
+# functions
+#=====================================================
+def ceil_div (a, b):
+    return (a + b-1) // b
+
+def acs_w (w):
+    """
+    Width of the memory access of a w-bit word.
+    """
+    return 64 if (w > 32) else 32
+
+def get_param (val_d, key_l=PARAM_L):
+    """
+    Extract the parameters of the model, as integers.
+    """
+    miss_l = [k for k in key_l if k not in val_d]
+    if len(miss_l) > 0:
+        raise KeyError(f"Missing parameters for the performance model: {' '.join(miss_l)}")
+    return {k: int(val_d[k]) for k in key_l}
+
+#=====================================================
+# Blind rotation
+#=====================================================
+def br_cost (val_d):
+    """
+    Cycles of the blind rotation of a batch.
+    """
+    p = get_param(val_d, BR_PARAM_L)
+    n           = p['R'] ** p['S']
+    stg_iter_nb = n // (p['R'] * p['PSI']) # cycles to stream a polynomial
+    intl_l      = p['PBS_L'] * (p['GLWE_K']+1)
+
+    # Per ciphertext, per CMUX iteration
+    ntt_fwd = intl_l * stg_iter_nb
+    ntt_bwd = (p['GLWE_K']+1) * stg_iter_nb * p['BWD_PSI_DIV']
+    ct_cycle = max(ntt_fwd, ntt_bwd)
+
+    # Per CMUX iteration : a GGSW is read for the whole batch
+    bsk_bit   = intl_l * (p['GLWE_K']+1) * n * acs_w(p['MOD_NTT_W'])
+    bsk_cycle = ceil_div(bsk_bit, p['BSK_PC'] * p['AXI_W'])
+    loop_lat  = ct_cycle + 2 * p['S'] * NTT_STG_LAT + LOOP_LAT
+
+    bound_d = {"ntt"     : p['BATCH_PBS_NB'] * ct_cycle,
+               "bsk"     : bsk_cycle,
+               "latency" : loop_lat}
+    bound = max(bound_d, key=bound_d.get)
+    return {"br_cycle"    : p['LWE_K'] * bound_d[bound],
+            "br_ct_cycle" : ct_cycle,
+            "br_bound"    : bound}
+
+#=====================================================
+# Keyswitch
+#=====================================================
+def ks_cost (val_d):
+    """
+    Cycles of the keyswitch of a batch.
+    Use the same definitions as pep_ks_check_param.py.
+    """
+    p = get_param(val_d, KS_PARAM_L)
+    ks_lg_nb         = ceil_div(p['KS_L'], p['LBZ'])
+    blwe_k           = (p['R'] ** p['S']) * p['GLWE_K']
+    ks_block_line_nb = ceil_div(blwe_k, p['LBY'])
+    ks_block_col_nb  = ceil_div(p['LWE_K'], p['LBX'])
+
+    # A block column is processed for each ciphertext. Its results are output meanwhile
+    # (the KS output pipe), LBX per ciphertext.
+    column_cycle = max(ks_block_line_nb * ks_lg_nb, p['LBX']) * p['BATCH_PBS_NB']
+    # The KSK is read once per batch. A RAM word contains the LBZ levels of a coefficient.
+    ksk_bit   = ks_block_col_nb * p['LBX'] * ks_block_line_nb * p['LBY'] * ks_lg_nb * acs_w(p['LBZ'] * p['MOD_KSK_W'])
+    ksk_cycle = ceil_div(ksk_bit, p['KSK_PC'] * p['AXI_W'])
+
+    bound_d = {"mult" : ks_block_col_nb * column_cycle,
+               "ksk"  : ksk_cycle}
+    bound = max(bound_d, key=bound_d.get)
+    return {"ks_cycle"      : bound_d[bound],
+            "ks_bound"      : bound,
+            "ks_mult_cycle" : bound_d["mult"],
+            "ksk_bit"       : ksk_bit}
+
+#=====================================================
+# perf
+#=====================================================
+def perf (val_d, clk_mhz=DEFAULT_CLK_MHZ):
+    """
+    Throughput and latency of the PBS pipe, for a parameter set.
+    """
+    p = get_param(val_d)
+    res_d = {**br_cost(p), **ks_cost(p)}
+    batch_cycle = max(res_d["br_cycle"], res_d["ks_cycle"])
+    res_d["batch_cycle"]   = batch_cycle
+    res_d["batch_latency"] = res_d["br_cycle"] + res_d["ks_cycle"]
+    res_d["pbs_per_s"]     = p['BATCH_PBS_NB'] * clk_mhz * 1e6 / batch_cycle
+    res_d["latency_us"]    = res_d["batch_latency"] / clk_mhz
+    res_d["sim_cost"]      = sim_cost(p, res_d)
+    return res_d
+
+def sim_cost (val_d, res_d=None):
+    """
+    Relative simulation cost of a batch: simulated cycles x coefficients processed in parallel,
+    in millions.
+    """
+    p = get_param(val_d)
+    if res_d is None:
+        res_d = {**br_cost(p), **ks_cost(p)}
+    width = p['R'] * p['PSI'] + p['LBX'] * p['LBY'] * p['LBZ']
+    return (res_d["br_cycle"] + res_d["ks_cycle"]) * width / 1e6
+
+#==================================================================================================
+# Main
+#==================================================================================================
+if __name__ == '__main__':
+    # Imported here : the model itself has no dependency on the coverage
+    from param_coverage import read_bash
+
+    parser = argparse.ArgumentParser(description = "Estimate the HPU PBS throughput and the simulation cost of parameter sets")
+    parser.add_argument('-param', type=str, action='append', help="Bash parameter file (as generated by gen_tb_hpu_param.py).", default=[])
+    parser.add_argument('-set',   type=str, action='append', help="NAME=VAL : set a parameter.", default=[])
+    parser.add_argument('-sweep', type=str, action='append', help="NAME=VAL,VAL,... : sweep a parameter. Several sweeps are crossed.", default=[])
+    parser.add_argument('-clk_mhz', type=float, help="Clock frequency in MHz.", default=DEFAULT_CLK_MHZ)
+    parser.add_argument('-csv',   type=str, help="Also write the results in this csv file.", default=None)
+
+    args = parser.parse_args()
+
+    val_d = {}
+    for f in args.param:
+        val_d.update(read_bash(f))
+    for s in args.set:
+        (k, v) = s.split('=', 1)
+        val_d[k] = v
+
+    sweep_l = []
+    for s in args.sweep:
+        (k, v) = s.split('=', 1)
+        sweep_l.append((k, v.split(',')))
+    sweep_name_l = [k for (k,v) in sweep_l]
+
+    row_l = []
+    for point in itertools.product(*[v for (k,v) in sweep_l]):
+        point_d = {**val_d, **dict(zip(sweep_name_l, point))}
+        try:
+            res_d = perf(point_d, args.clk_mhz)
+        except KeyError as e:
+            sys.exit(f"ERROR> {e.args[0]}")
+        row_l.append({**dict(zip(sweep_name_l, point)), **res_d})
+
+    col_l = sweep_name_l + ['br_cycle', 'br_bound', 'ks_cycle', 'ks_bound', 'batch_cycle', 'latency_us', 'pbs_per_s', 'sim_cost']
+    print(" ".join(f"{c:>12}" for c in col_l))
+    for row in row_l:
+        print(" ".join(f"{row[c]:>12.1f}" if isinstance(row[c], float) else f"{row[c]:>12}" for c in col_l))
+
+    if args.csv is not None:
+        with open(args.csv, 'w', newline='') as fp:
+            w = csv.DictWriter(fp, fieldnames=col_l, extrasaction='ignore')
+            w.writeheader()
+            w.writerows(row_l)
+        print(f"INFO> Results written in {args.csv}")
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# ==============================================================================================
+# BSD 3-Clause Clear License
+# Copyright © 2025 ZAMA. All rights reserved.
+# ----------------------------------------------------------------------------------------------
+#  Functional coverage of randomized simulation parameters.
+#
+#  The coverage model is made of:
+#  * coverpoints : one per declared parameter, one bin per value of its domain.
+#  * crosses     : all the pairs of declared parameters, one bin per pair of values.
+#  The hit counts are persisted in a json file, shared by all the runs of a project
+#  (updates are serialized with a file lock).
+#
+#  The generators use it to bias their draws: several candidates are drawn from seeds
+#  derived from the run seed, and the one hitting the least covered bins is kept.
+#  For a given seed and coverage file, the choice is deterministic.
+#
+#  Usage, as a script:
+#    param_coverage.py -cov <file> -record <bash file>... : record the parameters of a run
+#    param_coverage.py -cov <file> -report                : print the coverage report
+# ==============================================================================================
+
+import argparse # parse input argument
+import fcntl
+import json
+import os
+import random
+from itertools import combinations
+from pathlib import Path
+
+#=====================================================
+# read_bash
+#=====================================================
+def read_bash(path):
+    """
+    Read the NAME=VALUE lines of a bash parameter file.
+    """
+    val_d = {}
+    with open(path, 'r') as fp:
+        for line in fp:
+            line = line.strip()
+            if ('=' in line) and not line.startswith('#'):
+                (k, v) = line.split('=', 1)
+                val_d[k.strip()] = v.strip().strip('"')
+    return val_d
+
+#=====================================================
+# Coverage
+#=====================================================
+class Coverage:
+    def __init__(self, path):
+        self.path = Path(path)
+        self.cov_d = self.read()
+
+    def read(self):
+        cov_d = {"run_nb": 0, "domain": {}, "bin": {}, "cross": {}}
+        if self.path.exists():
+            try:
+                with open(self.path, 'r') as fp:
+                    cov_d.update(json.load(fp))
+            except (OSError, ValueError):
+                print(f"WARNING> Unreadable coverage file {self.path}. Restart from scratch.")
+        return cov_d
+
+    def locked(self, fn):
+        """
+        Read-modify-write of the coverage file, under a file lock.
+        """
+        os.makedirs(self.path.parent, exist_ok=True)
+        with open(f"{self.path}.lock", 'a') as lock_f:
+            fcntl.lockf(lock_f, fcntl.LOCK_EX)
+            self.cov_d = self.read()
+            fn()
+            tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp_path, 'w') as fp:
+                json.dump(self.cov_d, fp, indent=1, sort_keys=True)
+            os.replace(tmp_path, self.path)
+
+    #-------------------------------------------------
+    # Model
+    #-------------------------------------------------
+    def declare(self, domain_d):
+        """
+        Declare coverpoints: dict name -> list of values.
+        """
+        domain_d = {k: [str(x) for x in v] for (k,v) in domain_d.items()}
+        if all(self.cov_d["domain"].get(k) == v for (k,v) in domain_d.items()):
+            return
+        self.locked(lambda: self.cov_d["domain"].update(domain_d))
+
+    def bins(self, val_d):
+        """
+        Coverpoint and cross bins hit by an assignment. Only declared parameters count.
+        """
+        item_l = sorted((k, str(v)) for (k,v) in val_d.items() if k in self.cov_d["domain"])
+        bin_l   = [("bin", k, v) for (k,v) in item_l]
+        cross_l = [("cross", f"{a[0]}*{b[0]}", f"{a[1]}*{b[1]}") for (a,b) in combinations(item_l, 2)]
+        return bin_l + cross_l
+
+    def hits(self, kind, name, value):
+        return self.cov_d[kind].get(name, {}).get(value, 0)
+
+    #-------------------------------------------------
+    # Bias
+    #-------------------------------------------------
+    def score(self, val_d):
+        """
+        The fewer hits on the bins of an assignment, the higher the score.
+        """
+        return sum(1 / (1 + self.hits(*b)) for b in self.bins(val_d))
+
+    def select_seed(self, draw_fn, seed, cand_nb, known_d=None):
+        """
+        draw_fn(seed) returns an assignment. Draw cand_nb candidates, with seeds derived from seed,
+        and return the seed of the one with the best score. known_d gives the values of the
+        parameters already chosen, so that their crosses with the candidates count.
+        draw_fn returns None for a seed without solution : the candidate is skipped.
+        If all are, seed is returned.
+        """
+        known_d = known_d if known_d is not None else {}
+        rng = random.Random(seed)
+        best = (None, seed)
+        for i in range(cand_nb):
+            s = rng.randrange(2**32)
+            val_d = draw_fn(s)
+            if val_d is None:
+                continue
+            sc = self.score({**known_d, **val_d})
+            if (best[0] is None) or (sc > best[0]):
+                best = (sc, s)
+        return best[1]
+
+    #-------------------------------------------------
+    # Record
+    #-------------------------------------------------
+    def record(self, val_d):
+        def update():
+            self.cov_d["run_nb"] = self.cov_d["run_nb"] + 1
+            for (kind, name, value) in self.bins(val_d):
+                bin_d = self.cov_d[kind].setdefault(name, {})
+                bin_d[value] = bin_d.get(value, 0) + 1
+        self.locked(update)
+
+    #-------------------------------------------------
+    # Report
+    #-------------------------------------------------
+    def report(self, hole_nb=10):
+        line_l = [f"Coverage of {self.path} : {self.cov_d['run_nb']} runs"]
+        dom_d = self.cov_d["domain"]
+        line_l.append("Coverpoints:")
+        for name in sorted(dom_d):
+            hit_d = self.cov_d["bin"].get(name, {})
+            miss_l = [v for v in dom_d[name] if hit_d.get(v, 0) == 0]
+            hit_nb = len(dom_d[name]) - len(miss_l)
+            line = f"  {name:<24} {hit_nb:>4}/{len(dom_d[name]):<4} ({100*hit_nb/len(dom_d[name]):5.1f}%)"
+            if len(miss_l) > 0:
+                line = line + f" missing: {' '.join(miss_l)}"
+            line_l.append(line)
+
+        # Cross bins include combinations that the constraints forbid: 100% is not always reachable.
+        line_l.append("Crosses (unreachable combinations included):")
+        total_hit = 0
+        total_nb  = 0
+        cross_l   = []
+        for (a,b) in combinations(sorted(dom_d), 2):
+            name = f"{a}*{b}"
+            hit_d = self.cov_d["cross"].get(name, {})
+            nb  = len(dom_d[a]) * len(dom_d[b])
+            hit = len([v for v in hit_d.values() if v > 0])
+            total_hit = total_hit + hit
+            total_nb  = total_nb + nb
+            cross_l.append((hit / nb, name, hit, nb))
+        for (ratio, name, hit, nb) in sorted(cross_l)[:hole_nb]:
+            line_l.append(f"  {name:<48} {hit:>5}/{nb:<5} ({100*ratio:5.1f}%)")
+        if total_nb > 0:
+            line_l.append(f"  Total: {total_hit}/{total_nb} cross bins hit ({100*total_hit/total_nb:.1f}%)")
+        return "\n".join(line_l)
+
+#==================================================================================================
+# Main
+#==================================================================================================
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = "Record or report the coverage of randomized parameters")
+    parser.add_argument('-cov',              type=str, help="Coverage file.", required=True)
+    parser.add_argument('-record', nargs='+', type=str, help="Record the parameters of these bash files as one run.", default=[])
+    parser.add_argument('-report',           help="Print the coverage report.", action="store_true", default=False)
+    parser.add_argument('-hole_nb',          type=int, help="Number of least covered crosses in the report.", default=10)
+
+    args = parser.parse_args()
+
+    cov = Coverage(args.cov)
+    if len(args.record) > 0:
+        val_d = {}
+        for f in args.record:
+            val_d.update(read_bash(f))
+        cov.record(val_d)
+    if args.report:
+        print(cov.report(args.hole_nb))
@@ -0,0 +1,500 @@
+# ==============================================================================================
+# BSD 3-Clause Clear License
+# Copyright © 2025 ZAMA. All rights reserved.
+# ----------------------------------------------------------------------------------------------
+#  Exhaustive lattice sampler for discrete constrained-random parameters.
+#
+#  The valid set is enumerated once for a given set of domains and constraints, cached on disk,
+#  and then sampled exactly (uniformly, or weighted when the domain is a dict of weights).
+#  Unlike an iterative solver, it never fails on tight constraints and reports how many
+#  configurations are valid.
+#
+#  The valid set is not stored as a list: the search counts the valid completions of the
+#  unassigned variables. When they split in groups sharing no constraint, the groups are counted
+#  separately, and their counts multiply. The count of a group only depends on the values of the
+#  assigned variables it shares a constraint with (its frontier), so it is memoized on them.
+#  This table is what is cached. A draw then assigns the variables one by one, each value being
+#  taken proportionally to the number of completions it leaves, which is exact over the whole
+#  valid set.
+#
+#  The API mirrors constrainedrandom.RandObj:
+#    l = LatticeObj(cache_dir)
+#    l.add_rand_var("X", domain=range(0,4))
+#    l.add_rand_var("Y", domain={0: 1, 1: 4}) # weighted
+#    l.add_constraint(fn, ('X','Y'))
+#    l.randomize(seed)
+#    l.get_results()
+#  The valid set can also be walked: l.size() configurations, l.at(i) being the i-th one.
+# ==============================================================================================
+
+import fcntl
+import gzip
+import hashlib
+import inspect
+import json
+import os
+import random
+from pathlib import Path
+
+# Groups of variables with at most this number of value combinations are not cached
+CACHE_MIN_SIZE = 256
+
+#=====================================================
+# power_of / mult_by
+#=====================================================
+def power_of(p, min_v, max_v):
+    """
+    List of the powers of p, within the range [min, max].
+    """
+    l = []
+    v = 1
+    while (v <= max_v):
+        if (v >= min_v):
+            l.append(v)
+        v = v * p
+    return l
+
+def mult_by(f, min_v, max_v):
+    """
+    List of the multiples of f, within the range [min, max].
+    """
+    return [v for v in range(min_v, max_v+1) if (v % f) == 0]
+
+#=====================================================
+# LatticeError
+#=====================================================
+class LatticeError(Exception):
+    """
+    Raised when the constraints have no solution.
+    """
+    pass
+
+#=====================================================
+# LatticeObj
+#=====================================================
+class LatticeObj:
+    def __init__(self, cache_dir=None, context=None):
+        """
+        cache_dir : directory where the enumerated lattices are stored. None disables the cache.
+        context   : dictionary of the values that are read by the constraints, but are not
+                    random variables, and that the cache key doesn't see through their globals
+                    or closure (see depend). It is part of the cache key.
+        """
+        self.cache_dir = cache_dir
+        self.context   = context if context is not None else {}
+        self.var_d     = {} # name -> (value list, weight list)
+        self.cstr_l    = [] # (fn, name tuple)
+        self.result_d  = None
+        self.stat_d    = {}
+        self.memo_d    = None
+
+    def add_rand_var(self, name, domain):
+        """
+        domain is either an iterable of values (uniform), or a dict value -> weight.
+        """
+        if isinstance(domain, dict):
+            val_l = list(domain.keys())
+            wgt_l = list(domain.values())
+        else:
+            val_l = list(domain)
+            wgt_l = [1] * len(val_l)
+        if (len(val_l) == 0):
+            raise LatticeError(f"Empty domain for {name}")
+        self.var_d[name] = (val_l, wgt_l)
+        self.memo_d = None
+
+    def add_constraint(self, fn, var_l):
+        """
+        var_l has the same meaning as in RandObj: a tuple of names, or a single name.
+        """
+        if isinstance(var_l, str):
+            var_l = (var_l,)
+        for v in var_l:
+            if v not in self.var_d:
+                raise LatticeError(f"Constraint {fn.__name__} uses unknown variable {v}")
+        self.cstr_l.append((fn, tuple(var_l)))
+        self.memo_d = None
+
+    #-------------------------------------------------
+    # Order
+    #-------------------------------------------------
+    def order(self):
+        """
+        Variable order of the search.
+        The most constrained variables first: once assigned, the remaining variables split
+        sooner into independent groups. Then the smallest domains.
+        """
+        cstr_nb_d = {n: len([c for c in self.cstr_l if n in c[1]]) for n in self.var_d}
+        return sorted(self.var_d, key=lambda n: (-cstr_nb_d[n], len(self.var_d[n][0])))
+
+    def depend(self, fn, dep_d):
+        """
+        Add to dep_d what fn reads besides its arguments: the globals it names, with the source
+        of the functions (walked in turn) and the repr of the values, and its closure.
+        Those are the constants and helpers of the generator modules (ex: RAM_W, is_ntt_wmm).
+        """
+        code = getattr(fn, "__code__", None)
+        if (code is None):
+            return
+        fn_k = f"{fn.__module__}.{fn.__qualname__}:{code.co_firstlineno}"
+        if fn_k in dep_d:
+            return
+        try:
+            dep_d[fn_k] = inspect.getsource(fn)
+        except (OSError, TypeError):
+            dep_d[fn_k] = fn.__name__
+
+        name_s = set()
+        code_l = [code]
+        while (len(code_l) > 0):
+            c = code_l.pop()
+            name_s.update(c.co_names)
+            code_l.extend(x for x in c.co_consts if inspect.iscode(x))
+        for n in sorted(name_s):
+            if n not in fn.__globals__:
+                continue # attribute or builtin
+            v = fn.__globals__[n]
+            if inspect.isfunction(v):
+                self.depend(v, dep_d)
+            elif not(inspect.ismodule(v) or inspect.isclass(v) or callable(v)):
+                dep_d[f"{fn.__module__}.{n}"] = repr(v)
+        for (n, cell) in zip(code.co_freevars, fn.__closure__ or ()):
+            v = cell.cell_contents
+            if inspect.isfunction(v):
+                self.depend(v, dep_d)
+            else:
+                dep_d[f"{fn_k}.{n}"] = repr(v)
+
+    def key(self):
+        """
+        Cache key: domains, constraint sources, what they read (see depend) and context.
+        """
+        cstr_l = []
+        dep_d  = {}
+        for (fn,var_l) in self.cstr_l:
+            try:
+                src = inspect.getsource(fn)
+            except (OSError, TypeError):
+                src = fn.__name__
+            cstr_l.append([src, var_l])
+            self.depend(fn, dep_d)
+        desc = json.dumps({"var": [[k, [repr(x) for x in v[0]], v[1]] for (k,v) in self.var_d.items()],
+                           "cstr": cstr_l,
+                           "dep": dict(sorted(dep_d.items())),
+                           "context": {k: repr(v) for (k,v) in sorted(self.context.items())}})
+        return hashlib.sha256(desc.encode()).hexdigest()
+
+    #-------------------------------------------------
+    # Enumeration
+    #-------------------------------------------------
+    def setup(self, order_l):
+        """
+        Constraint graph, in search order.
+        """
+        self.order_l = order_l
+        self.pos_d   = {n: i for (i,n) in enumerate(order_l)}
+        self.adj_d   = {n: set() for n in order_l}
+        self.cstr_d  = {n: [] for n in order_l}
+        for (fn,var_l) in self.cstr_l:
+            for n in var_l:
+                self.adj_d[n].update(var_l)
+            # The unassigned variables of a constraint always belong to the same group, whose
+            # first variable is assigned next: the constraint is complete at its last variable.
+            self.cstr_d[max(var_l, key=self.pos_d.get)].append((fn,var_l))
+        for n in order_l:
+            self.adj_d[n].discard(n)
+        self.comp_d  = {}
+        self.front_d = {}
+
+    def components(self, var_s):
+        """
+        Split a set of unassigned variables in groups that share no constraint.
+        Their completions are independent: the count of the set is the product of the counts
+        of the groups.
+        """
+        if var_s not in self.comp_d:
+            comp_l = []
+            left_s = set(var_s)
+            while len(left_s) > 0:
+                todo_l = [min(left_s, key=self.pos_d.get)]
+                comp_s = set(todo_l)
+                while len(todo_l) > 0:
+                    n = todo_l.pop()
+                    for m in self.adj_d[n]:
+                        if (m in left_s) and (m not in comp_s):
+                            comp_s.add(m)
+                            todo_l.append(m)
+                left_s = left_s - comp_s
+                comp_l.append(frozenset(comp_s))
+            self.comp_d[var_s] = comp_l
+        return self.comp_d[var_s]
+
+    def state(self, comp_s, idx_d):
+        """
+        Memoization key of a group: its variables, and the values of the assigned variables it
+        shares a constraint with (the frontier).
+        """
+        if comp_s not in self.front_d:
+            front_s = set()
+            for n in comp_s:
+                front_s.update(self.adj_d[n])
+            pos_l = sorted(self.pos_d[n] for n in comp_s)
+            self.front_d[comp_s] = (".".join(str(i) for i in pos_l),
+                                    sorted(front_s - comp_s, key=self.pos_d.get))
+        (comp_k, front_l) = self.front_d[comp_s]
+        return comp_k + ":" + ",".join(str(idx_d[n]) for n in front_l)
+
+    def valid(self, name, assign_d):
+        """
+        Check the constraints completed by the assignment of name.
+        """
+        return all(fn(*[assign_d[n] for n in var_l]) for (fn,var_l) in self.cstr_d[name])
+
+    def choices(self, comp_s, assign_d, idx_d):
+        """
+        Candidate values of the first variable of a group, with the weight of the valid
+        completions they leave.
+        Return (name, [(value index, weight, number)], sub groups).
+        """
+        name = min(comp_s, key=self.pos_d.get)
+        sub_l = self.components(comp_s - {name})
+        (val_l, wgt_l) = self.var_d[name]
+        cand_l = []
+        for (i,v) in enumerate(val_l):
+            if (wgt_l[i] == 0):
+                continue
+            assign_d[name] = v
+            idx_d[name]    = i
+            if self.valid(name, assign_d):
+                weight = wgt_l[i]
+                nb     = 1
+                for sub_s in sub_l:
+                    (w, n) = self.count(sub_s, assign_d, idx_d)
+                    weight = weight * w
+                    nb     = nb * n
+                    if (w == 0):
+                        break
+                if (weight > 0):
+                    cand_l.append((i, weight, nb))
+        assign_d.pop(name, None)
+        idx_d.pop(name, None)
+        return (name, cand_l, sub_l)
+
+    def count(self, comp_s, assign_d, idx_d):
+        """
+        (weight, number) of the valid completions of a group of unassigned variables.
+        Memoized on the frontier values.
+        """
+        k = self.state(comp_s, idx_d)
+        if k not in self.memo_d:
+            (name, cand_l, sub_l) = self.choices(comp_s, assign_d, idx_d)
+            self.memo_d[k] = [sum(c[1] for c in cand_l), sum(c[2] for c in cand_l)]
+        return self.memo_d[k]
+
+    def cached_memo(self):
+        """
+        Counts worth caching. The groups with few value combinations are cheaper to count again
+        during a draw than to load.
+        """
+        size_l = [len(self.var_d[n][0]) for n in self.order_l]
+        size_d = {}
+        memo_d = {}
+        for (k,v) in self.memo_d.items():
+            comp_k = k.split(':')[0]
+            if comp_k not in size_d:
+                size = 1
+                for i in comp_k.split('.'):
+                    size = size * size_l[int(i)]
+                size_d[comp_k] = size
+            if (size_d[comp_k] > CACHE_MIN_SIZE):
+                memo_d[k] = v
+        return memo_d
+
+    def read_cache(self, cache_path, key):
+        """
+        Load the completion counts of a cache entry. Return False when it is missing.
+        """
+        if not cache_path.exists():
+            return False
+        try:
+            with gzip.open(cache_path, 'rt') as fp:
+                lat_d = json.load(fp)
+            self.setup(lat_d["order"])
+            self.memo_d = lat_d["count"]
+            self.stat_d = {"key": key, "cached": True}
+            return True
+        except (OSError, ValueError, KeyError, EOFError):
+            return False # Corrupted entry : count again
+
+    def enumerate(self, key):
+        """
+        Count the completions of all the groups.
+        """
+        self.setup(self.order())
+        self.memo_d = {}
+        for comp_s in self.components(frozenset(self.order_l)):
+            self.count(comp_s, {}, {})
+        self.stat_d = {"key": key, "cached": False}
+
+    def load(self):
+        """
+        Get the completion counts from the cache, or compute and store them.
+        Once loaded, they are kept until a variable or a constraint is added.
+        The enumeration of an entry is done under a file lock: the concurrent runs that miss
+        the same entry wait for the first one, and then read its result.
+        """
+        if self.memo_d is not None:
+            return
+        key = self.key()
+        if self.cache_dir is None:
+            self.enumerate(key)
+            return
+
+        cache_path = Path(self.cache_dir) / f"{key}.json.gz"
+        if self.read_cache(cache_path, key):
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(cache_path.with_suffix(".lock"), 'a') as lock_f:
+            fcntl.lockf(lock_f, fcntl.LOCK_EX)
+            if self.read_cache(cache_path, key):
+                return
+            self.enumerate(key)
+            tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+            with gzip.open(tmp_path, 'wt') as fp:
+                json.dump({"order": self.order_l, "count": self.cached_memo()}, fp, separators=(',',':'))
+            os.replace(tmp_path, cache_path)
+
+    #-------------------------------------------------
+    # Randomize
+    #-------------------------------------------------
+    def sample(self, comp_s, rng, assign_d, idx_d):
+        """
+        Assign the first variable of a group, proportionally to its weight times the weight of
+        the valid completions. Then the sub groups, independently.
+        """
+        (name, cand_l, sub_l) = self.choices(comp_s, assign_d, idx_d)
+        i = rng.choices([c[0] for c in cand_l], weights=[c[1] for c in cand_l])[0]
+        assign_d[name] = self.var_d[name][0][i]
+        idx_d[name]    = i
+        for sub_s in sub_l:
+            self.sample(sub_s, rng, assign_d, idx_d)
+
+    def randomize(self, seed):
+        """
+        Draw one configuration. The result only depends on seed, domains and constraints.
+        The draw is exact over the whole valid set.
+        """
+        self.load()
+        comp_l = self.components(frozenset(self.order_l))
+        nb = 1
+        for comp_s in comp_l:
+            nb = nb * self.count(comp_s, {}, {})[1]
+        if (nb == 0):
+            raise LatticeError("No valid configuration")
+
+        rng = random.Random(seed)
+        assign_d = {}
+        idx_d    = {}
+        for comp_s in comp_l:
+            self.sample(comp_s, rng, assign_d, idx_d)
+
+        self.result_d = {name: assign_d[name] for name in self.var_d}
+        self.stat_d.update({"count": nb, "state_nb": len(self.memo_d)})
+        return self.result_d
+
+    #-------------------------------------------------
+    # Walk
+    #-------------------------------------------------
+    def size(self):
+        """
+        Number of valid configurations, whatever the weights.
+        """
+        self.load()
+        nb = 1
+        for comp_s in self.components(frozenset(self.order_l)):
+            nb = nb * self.count(comp_s, {}, {})[1]
+        return nb
+
+    def select(self, comp_s, index, assign_d, idx_d):
+        """
+        Assign a group with its index-th valid completion.
+        The completions are ordered by the value of the first variable, then by the completions
+        of the sub groups, the first sub group varying the slowest.
+        """
+        (name, cand_l, sub_l) = self.choices(comp_s, assign_d, idx_d)
+        for (i, w, nb) in cand_l:
+            if (index < nb):
+                break
+            index = index - nb
+        assign_d[name] = self.var_d[name][0][i]
+        idx_d[name]    = i
+        sub_nb_l = [self.count(sub_s, assign_d, idx_d)[1] for sub_s in sub_l]
+        for (j, sub_s) in enumerate(sub_l):
+            rest = 1
+            for nb in sub_nb_l[j+1:]:
+                rest = rest * nb
+            self.select(sub_s, index // rest, assign_d, idx_d)
+            index = index % rest
+
+    def at(self, index):
+        """
+        The index-th configuration of the valid set, 0 <= index < size().
+        The order only depends on domains and constraints.
+        """
+        nb = self.size()
+        if not(0 <= index < nb):
+            raise LatticeError(f"Index {index} out of the valid set [0, {nb})")
+        comp_l = self.components(frozenset(self.order_l))
+        comp_nb_l = [self.count(comp_s, {}, {})[1] for comp_s in comp_l]
+        assign_d = {}
+        idx_d    = {}
+        for (j, comp_s) in enumerate(comp_l):
+            rest = 1
+            for n in comp_nb_l[j+1:]:
+                rest = rest * n
+            self.select(comp_s, index // rest, assign_d, idx_d)
+            index = index % rest
+
+        self.result_d = {name: assign_d[name] for name in self.var_d}
+        self.stat_d.update({"count": nb, "state_nb": len(self.memo_d)})
+        return self.result_d
+
+    def walk(self, comp_l, assign_d, idx_d):
+        """
+        Iterate over the valid completions of a list of groups, in the order of select().
+        """
+        if (len(comp_l) == 0):
+            yield dict(assign_d)
+            return
+        (name, cand_l, sub_l) = self.choices(comp_l[0], assign_d, idx_d)
+        for (i, w, nb) in cand_l:
+            assign_d[name] = self.var_d[name][0][i]
+            idx_d[name]    = i
+            yield from self.walk(sub_l + comp_l[1:], assign_d, idx_d)
+        assign_d.pop(name, None)
+        idx_d.pop(name, None)
+
+    def solutions(self):
+        """
+        Iterate over the whole valid set, in the order of at().
+        """
+        self.load()
+        for assign_d in self.walk(self.components(frozenset(self.order_l)), {}, {}):
+            yield {name: assign_d[name] for name in self.var_d}
+
+    def get_results(self):
+        return dict(self.result_d)
+
+    def __getattr__(self, name):
+        # Same access as RandObj: l.<VAR>
+        if (name != "result_d") and (self.__dict__.get("result_d") is not None) and (name in self.result_d):
+            return self.result_d[name]
+        raise AttributeError(name)
+
+    def report(self):
+        """
+        One line summary of the valid set.
+        """
+        return (f"{self.stat_d['count']} valid configurations "
+                f"({self.stat_d['state_nb']} counted states; "
+                f"{'cached' if self.stat_d['cached'] else 'enumerated'} {self.stat_d['key'][:12]})")
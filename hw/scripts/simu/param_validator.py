@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+# ==============================================================================================
+# BSD 3-Clause Clear License
+# Copyright © 2025 ZAMA. All rights reserved.
+# ----------------------------------------------------------------------------------------------
+#  Validator of HPU parameter sets.
+#
+#  Evaluate a whole parameter dictionary against all the known validity rules, and report all
+#  the violations, with the source of the rule. The rules are gathered from where they are
+#  defined, and not copied:
+#  * the constraints and domains declared by the tb_hpu parameter generators
+#    (gen_tb_hpu_param_base.py, gen_tb_hpu_param_order2.py, gen_tb_hpu_param_rdxcut.py),
+#  * the KS checks of pep_ks_check_param.py,
+#  * the argument checks of gen_stimuli.py and of the gen_*_definition_pkg.py scripts, which
+#    are not available as functions, and are therefore written here.
+#
+#  The rules whose parameters are not all given are not evaluated.
+#  Some rules only limit the simulation time, or the ranges covered by the testbench. They are
+#  of kind "sim", and can be skipped to validate a synthesis configuration.
+#
+#  The result of a rule is memoized on the values of its parameters: when screening many
+#  configurations, most evaluations are lookups.
+#
+#  Usage, as a script:
+#    param_validator.py -param <bash file>... [-set NAME=VAL]...  : check a parameter set
+#    param_validator.py -csv <file>                              : screen the sets of a csv file
+# ==============================================================================================
+
+import argparse # parse input argument
+import csv
+import os
+import sys
+from argparse import Namespace
+from collections import Counter
+from operator import itemgetter
+
+PROJECT_DIR = os.getenv("PROJECT_DIR")
+sys.path.append(os.path.join(PROJECT_DIR, "hw/module/hpu/simu/scripts"))
+sys.path.append(os.path.join(PROJECT_DIR, "hw/module/pep_key_switch/scripts"))
+
+# Rules that only bound the simulation time or the testbench coverage
+SIM_RULE_L = ['cstr_run', 'cstr_run4', 'cstr_run5', 'cstr_lwe_k', 'cstr_batch']
+# Max number of memoized results per rule
+MEMO_MAX = 1000000
+
+#=====================================================
+# Rule
+#=====================================================
+class Rule:
+    def __init__(self, name, fn, var_l, source, kind="hw", doc=None):
+        """
+        fn(*values) returns True when valid, False or a list of messages when not.
+        """
+        self.name   = name
+        self.fn     = fn
+        self.var_l  = tuple(var_l)
+        self.source = source
+        self.kind   = kind
+        self.doc    = doc if doc is not None else one_line(fn.__doc__)
+        self.memo_d = {}
+        # Always get a tuple, even with a single variable
+        self.get    = itemgetter(*self.var_l, self.var_l[0])
+
+    def check(self, val_d):
+        """
+        None if not applicable, else the list of messages of the violation (empty if valid).
+        """
+        try:
+            arg_t = self.get(val_d)[:-1]
+        except KeyError:
+            return None
+        if arg_t not in self.memo_d:
+            if (len(self.memo_d) >= MEMO_MAX):
+                self.memo_d = {}
+            try:
+                res = self.fn(*arg_t)
+            except Exception as e: # Values out of what the rule expects
+                res = [f"{type(e).__name__}: {e}"]
+            if (res is True) or (res == []):
+                self.memo_d[arg_t] = []
+            elif (res is False) or (res is None):
+                self.memo_d[arg_t] = [self.doc]
+            else:
+                self.memo_d[arg_t] = list(res)
+        return self.memo_d[arg_t]
+
+def one_line(doc):
+    if doc is None:
+        return ""
+    return " ".join(l.strip() for l in doc.strip().splitlines() if l.strip() != "")
+
+def source_of(fn):
+    code = fn.__code__
+    return f"{os.path.relpath(code.co_filename, PROJECT_DIR)}:{code.co_firstlineno}"
+
+#=====================================================
+# RuleCollector
+#=====================================================
+class RuleCollector:
+    """
+    Stands for a LatticeObj, to record the variables and constraints declared by the
+    tb_hpu parameter generators.
+    """
+    def __init__(self):
+        self.var_d  = {}
+        self.cstr_l = []
+
+    def add_rand_var(self, name, domain):
+        self.var_d[name] = list(domain.keys()) if isinstance(domain, dict) else list(domain)
+
+    def add_constraint(self, fn, var_l):
+        self.cstr_l.append((fn, (var_l,) if isinstance(var_l, str) else tuple(var_l)))
+
+#=====================================================
+# Rules written here
+#=====================================================
+def rule_stimuli_bwd_psi_div(ntt_arch, bwd_psi_div):
+    """
+    BWD_PSI_DIV must be set to 1 for architecture different from NTT_CORE_ARCH_wmm_unfold.
+    """
+    return ntt_arch.startswith("NTT_CORE_ARCH_wmm_unfold") or (bwd_psi_div == 1)
+
+def rule_stimuli_batch(batch_max_pbs, batch_min_pbs):
+    """
+    BATCH_MAX_PBS must be greater or equal to BATCH_MIN_PBS.
+    """
+    return batch_max_pbs >= batch_min_pbs
+
+def rule_pep_batch(total_pbs_nb, batch_pbs_nb):
+    """
+    TOTAL_PBS_NB should be greater or equal to BATCH_PBS_NB.
+    """
+    return total_pbs_nb >= batch_pbs_nb
+
+def rule_ntt_cut(rdx_cut_nb):
+    """
+    At least one radix column must be given.
+    """
+    return rdx_cut_nb > 0
+
+def domain_rule(name, dom_l):
+    def fn(v):
+        return v in dom_s
+    dom_s = set(dom_l)
+    lo, hi = (min(dom_l), max(dom_l)) if all(isinstance(x, int) for x in dom_l) else (None, None)
+    desc = f"[{lo}..{hi}]" if (lo is not None) and (len(dom_l) == hi-lo+1) else f"{{{','.join(str(x) for x in dom_l)}}}"
+    return (fn, f"{name} should be in {desc}")
+
+#=====================================================
+# ParamValidator
+#=====================================================
+class ParamValidator:
+    def __init__(self, sim=True):
+        """
+        sim : also check the rules of kind "sim".
+        """
+        self.sim    = sim
+        self.rule_l = []
+
+    def add_rule(self, rule):
+        if self.sim or (rule.kind != "sim"):
+            self.rule_l.append(rule)
+
+    def validate(self, val_d):
+        """
+        Return the list of the violations : (rule, message).
+        """
+        val_d = typed(val_d)
+        viol_l = []
+        for rule in self.rule_l:
+            msg_l = rule.check(val_d)
+            if msg_l:
+                viol_l.extend((rule, m) for m in msg_l)
+        return viol_l
+
+    def is_valid(self, val_d):
+        """
+        Stop at the first violation.
+        """
+        val_d = typed(val_d)
+        return not(any(rule.check(val_d) for rule in self.rule_l))
+
+    def skipped(self, val_d):
+        """
+        Rules not evaluated, for lack of parameters.
+        """
+        return [rule for rule in self.rule_l if any(n not in val_d for n in rule.var_l)]
+
+def typed(val_d):
+    """
+    Values read from bash or csv files are strings : convert the integers.
+    """
+    if not(any(isinstance(v, str) and v.lstrip('-').isdigit() for v in val_d.values())):
+        return val_d
+    res_d = {}
+    for (k,v) in val_d.items():
+        if isinstance(v, str):
+            try:
+                v = int(v)
+            except ValueError:
+                None
+        res_d[k] = v
+    return res_d
+
+#=====================================================
+# hpu_validator
+#=====================================================
+def hpu_validator(sim=True):
+    """
+    Validator with all the HPU rules.
+    """
+    from gen_tb_hpu_param_base import add_base
+    from gen_tb_hpu_param_order2 import add_order2
+    from gen_tb_hpu_param_rdxcut import add_rdxcut
+    from gen_tb_hpu_param_run import AXI_DATA_W_L
+    from pep_ks_check_param import check_ks
+
+    v = ParamValidator(sim)
+
+    # tb_hpu generators. Random ranges everywhere: no argument given.
+    args = Namespace(ntt_arch=None, r=2, psi=-1, stage_nb=-1, glwe_k=-1, mod_ksk_w=-1, mod_ntt_w=-1,
+                     axi_w=AXI_DATA_W_L[0], cut_l=[], fpga='v80')
+    rc = RuleCollector()
+    add_base(rc, rc, args)
+    add_order2(rc, args.fpga)
+    add_rdxcut(rc, args.cut_l)
+    rc.var_d["AXI_W"] = AXI_DATA_W_L
+    for (name, dom_l) in rc.var_d.items():
+        (fn, doc) = domain_rule(name, dom_l)
+        v.add_rule(Rule(f"domain_{name}", fn, (name,), "tb_hpu generator domains", kind="sim", doc=doc))
+    for (fn, var_l) in rc.cstr_l:
+        v.add_rule(Rule(fn.__name__, fn, var_l, source_of(fn),
+                        kind="sim" if fn.__name__ in SIM_RULE_L else "hw"))
+
+    # KS
+    v.add_rule(Rule("check_ks", check_ks,
+                    ('BATCH_PBS_NB', 'R', 'S', 'GLWE_K', 'KS_L', 'LBX', 'LBY', 'LBZ', 'MOD_KSK_W', 'AXI_W', 'MOD_Q_W'),
+                    source_of(check_ks)))
+
+    # Not available as functions
+    v.add_rule(Rule("bwd_psi_div", rule_stimuli_bwd_psi_div, ('NTT_ARCH', 'BWD_PSI_DIV'),
+                    "hw/module/hpu/simu/scripts/gen_stimuli.py"))
+    v.add_rule(Rule("batch_min_max", rule_stimuli_batch, ('BATCH_MAX_PBS', 'BATCH_MIN_PBS'),
+                    "hw/module/hpu/simu/scripts/gen_stimuli.py"))
+    v.add_rule(Rule("total_pbs_nb", rule_pep_batch, ('TOTAL_PBS_NB', 'BATCH_PBS_NB'),
+                    "hw/module/pe_pbs/module/pep_common/scripts/gen_pep_batch_definition_pkg.py"))
+    v.add_rule(Rule("rdx_cut_nb", rule_ntt_cut, ('RDX_CUT_NB',),
+                    "hw/module/number_theoretic_transform/module/ntt_core_common/scripts/gen_ntt_core_common_cut_definition_pkg.py"))
+    return v
+
+#==================================================================================================
+# Main
+#==================================================================================================
+if __name__ == '__main__':
+    from param_coverage import read_bash
+
+    parser = argparse.ArgumentParser(description = "Check HPU parameter sets against all the validity rules")
+    parser.add_argument('-param',   type=str, action='append', help="Bash parameter file. The files are merged.", default=[])
+    parser.add_argument('-set',     type=str, action='append', help="NAME=VAL : set a parameter.", default=[])
+    parser.add_argument('-csv',     type=str, help="Screen the parameter sets of this csv file, one per line.", default=None)
+    parser.add_argument('-skip_sim',          help="Skip the rules that only limit the simulation.", action="store_true", default=False)
+    parser.add_argument('-v', dest='verbose', help="Run in verbose mode.", action="store_true", default=False)
+
+    args = parser.parse_args()
+
+    v = hpu_validator(sim=not(args.skip_sim))
+
+    # Screening
+    if args.csv is not None:
+        row_nb  = 0
+        ok_nb   = 0
+        rule_cnt = Counter()
+        with open(args.csv, 'r', newline='') as fp:
+            for row in csv.DictReader(fp):
+                row_nb = row_nb + 1
+                viol_l = v.validate(row)
+                if len(viol_l) == 0:
+                    ok_nb = ok_nb + 1
+                rule_cnt.update(set(r.name for (r,m) in viol_l))
+        print(f"INFO> {ok_nb}/{row_nb} valid parameter sets")
+        for (name, nb) in rule_cnt.most_common():
+            rule = next(r for r in v.rule_l if r.name == name)
+            print(f"  {nb:>8} x {name:<24} {rule.source}")
+        sys.exit(0 if ok_nb == row_nb else 1)
+
+    val_d = {}
+    for f in args.param:
+        val_d.update(read_bash(f))
+    for s in args.set:
+        (k, x) = s.split('=', 1)
+        val_d[k] = x
+
+    viol_l = v.validate(val_d)
+    for (rule, msg) in viol_l:
+        print(f"ERROR> [{rule.kind}] {rule.name} ({rule.source}) : {msg}")
+        print(f"         {', '.join(f'{n}={val_d[n]}' for n in rule.var_l)}")
+    if args.verbose:
+        for rule in v.skipped(val_d):
+            print(f"INFO> Not evaluated {rule.name}: missing {' '.join(n for n in rule.var_l if n not in val_d)}")
+    rule_nb = len(v.rule_l) - len(v.skipped(val_d))
+    if len(viol_l) > 0:
+        sys.exit(f"ERROR> {len(viol_l)} violations ({rule_nb} rules evaluated)")
+    print(f"INFO> Valid ({rule_nb} rules evaluated)")
@@ -0,0 +1,525 @@
+#!/usr/bin/env python3
+# ==============================================================================================
+# BSD 3-Clause Clear License
+# Copyright © 2025 ZAMA. All rights reserved.
+# ----------------------------------------------------------------------------------------------
+# Fast version of ntt_network.py.
+# The same network is checked, with the same pass/fail and the same diagnostics, but the data
+# movement is represented with integer permutation arrays instead of NttCoord objects.
+#
+# The RAM addressing does not depend on the data. For each stage, it is described by :
+# - the RAM cell read by each BU input (see ram_read),
+# - the RAM cell written by each BU output (see ram_write).
+# A RAM cell is identified by (cl_bu_id, ram_id, address). The parity is given by
+# ram_access_parity.
+# The points are then represented by numpy arrays of coordinates, stages and types, for all the
+# interleaved levels at once. The types are bit masks (see type_bits).
+# The BU checks of bu_core are done with vectorized comparisons. When several errors are
+# present, the one reported is the first one that ntt_network.py would have met.
+#
+# Use -check_map to check the permutations against ram_read and ram_write of ntt_network.py.
+# ==============================================================================================
+
+import sys  # manage errors
+import argparse  # parse input argument
+from math import log, pow
+import itertools  # product
+import numpy as np
+from ntt_coord import *
+from ntt_lib import *
+from ntt_network import dispatch_rot_shift, ram_access_parity, ram_read, ram_write, RD, WR
+
+# ==============================================================================
+# Global variables
+# ==============================================================================
+VERBOSE = False
+
+# ==============================================================================
+# type_bits
+# ==============================================================================
+def type_bits(PBS_L, GLWE_K_plus_1):
+    """
+    Bit of each element of the type_s sets of ntt_network.py.
+    """
+    name_l = (
+        ["NTT", "INTT", "DONE"]
+        + ["D{:d}".format(l) for l in range(0, PBS_L)]
+        + ["P{:d}".format(g) for g in range(0, GLWE_K_plus_1)]
+        + ["PP{:d}".format(g) for g in range(0, GLWE_K_plus_1)]
+    )
+    return {n: 1 << b for b, n in enumerate(name_l)}
+
+
+def type_set(mask, bit_d):
+    """
+    Convert a type bit mask back into a type_s set.
+    """
+    return set([n for n, b in bit_d.items() if int(mask) & b])
+
+
+# ==============================================================================
+# reverse_order_np
+# ==============================================================================
+def reverse_order_np(v, R, S):
+    """
+    reverse_order of ntt_lib.py, on an array of indexes.
+    """
+    r_width = int(log(R, 2))
+    rev = np.zeros_like(v)
+    for i in range(0, S):
+        rev = rev * R + (v & (R - 1))
+        v = v >> r_width
+    return rev
+
+
+# ==============================================================================
+# read_map
+# ==============================================================================
+def read_map(R, S, PSI, stg):
+    """
+    RAM cell read by each BU input of stage stg, as done by ram_read.
+    The BU inputs are indexed by stg_iter*PSI*R + cl_bu_id*R + i.
+    The RAM cells are indexed by (cl_bu_id*R + ram_id)*STG_ITER_NB + address.
+    """
+    stg_bu_nb = R ** (S - 1)
+    stg_iter_nb = stg_bu_nb // PSI
+    wr_in_nb = (PSI * R + (stg_bu_nb - 1)) // stg_bu_nb
+
+    (stg_iter, cl_bu_id, i) = np.indices((stg_iter_nb, PSI, R)).reshape(3, -1)
+    if stg != S - 1:  # Not first stage
+        # Rotate back
+        ram_cl_bu_id = cl_bu_id
+        ram_id = (stg_iter * wr_in_nb + i) % R
+    else:  # First stage
+        # Dispatch
+        psi_w = int(log(PSI, 2))
+        (rot_shift, inc) = dispatch_rot_shift(R, S, PSI)
+        rot_factor = (((stg_iter << psi_w) >> rot_shift) + stg_iter * inc) % PSI
+        ram_cl_bu_id = (rot_factor + cl_bu_id) % PSI
+        ram_id = i
+
+    return (ram_cl_bu_id * R + ram_id) * stg_iter_nb + stg_iter
+
+
+# ==============================================================================
+# write_map
+# ==============================================================================
+def write_map(R, S, PSI, stg):
+    """
+    RAM cells written by the BU outputs of stage stg, as done by ram_write.
+    Output:
+    - cell_a     : written RAM cells, in the writing order of ram_write
+    - slot_a     : BU output written in each of these cells. Same indexes as read_map.
+    - conflict_l : stage iterations with a write conflict (last stage only).
+    """
+    stg_bu_nb = R ** (S - 1)
+    stg_iter_nb = stg_bu_nb // PSI
+    wr_in_nb = (PSI * R + (stg_bu_nb - 1)) // stg_bu_nb
+
+    (stg_iter, cl_bu_id, i) = np.indices((stg_iter_nb, PSI, R)).reshape(3, -1)
+    conflict_l = []
+    if stg > 0:  # Not last stage
+        # Write in RAM i the rotated dispatched output.
+        next_bu_in_idx_0 = (stg_iter * PSI) // (R ** (S - 2))
+        next_stg_iter_0 = ((stg_iter * PSI * R) % stg_bu_nb) // PSI
+        rot = (i + R - next_bu_in_idx_0) % R
+        address = next_stg_iter_0 + rot // wr_in_nb
+        ram_cl_bu_id = cl_bu_id
+        ram_id = i
+        # Dispatch
+        d_idx = cl_bu_id * R + rot
+        if stg_bu_nb < (PSI * R):
+            d_idx = (d_idx // R) * R + np.array(inc_stride(R, stg_iter_nb))[d_idx % R]
+        out_idx = np.array(inc_stride(R * PSI, PSI))[d_idx]
+    else:  # Last stage
+        (rot_shift, inc) = dispatch_rot_shift(R, S, PSI)
+        rev_idx = reverse_order_np(stg_iter * PSI + cl_bu_id, R, S - 1)
+        (next_stg_iter, next_cl_bu_id) = np.divmod(rev_idx, PSI)
+        rot_factor = ((rev_idx >> rot_shift) + next_stg_iter * inc) % PSI
+        ram_cl_bu_id = (next_cl_bu_id + rot_factor) % PSI
+        ram_id = i
+        address = next_stg_iter
+        out_idx = cl_bu_id * R + i
+        # All destination core IDs of a stage iteration must be different.
+        dest_a = np.sort(ram_cl_bu_id.reshape(stg_iter_nb, PSI, R)[:, :, 0], axis=1)
+        conflict_l = list(np.nonzero(np.any(dest_a[:, 1:] == dest_a[:, :-1], axis=1))[0])
+
+    cell_a = (ram_cl_bu_id * R + ram_id) * stg_iter_nb + address
+    slot_a = stg_iter * PSI * R + out_idx
+    return (cell_a, slot_a, conflict_l)
+
+
+# ==============================================================================
+# check_map
+# ==============================================================================
+def check_map(R, S, PSI, rd_map_l, wr_map_l):
+    """
+    Check the permutations against ram_read and ram_write, on RAMs of cell indexes.
+    """
+    stg_iter_nb = R ** (S - 1) // PSI
+    cell_nb = PSI * R * stg_iter_nb
+
+    for ntt_bwd, stg in itertools.product(range(0, 2), range(0, S)):
+        # Read : RAM filled with the cell indexes
+        RAM = [
+            [
+                [[[(cl_bu_id * R + i) * stg_iter_nb + a for a in range(0, stg_iter_nb)]]] * 2
+                for i in range(0, R)
+            ]
+            for cl_bu_id in range(0, PSI)
+        ]
+        rd_l = []
+        for stg_iter in range(0, stg_iter_nb):
+            rd_l = rd_l + ram_read(RAM, R, S, PSI, stg, stg_iter, 0, ntt_bwd)
+        if not np.array_equal(np.array(rd_l), rd_map_l[stg]):
+            sys.exit("ERROR> Read permutation mismatches ram_read. pass={:d} stg={:d}".format(ntt_bwd, stg))
+
+        # Write : BU output indexes written in an empty RAM
+        RAM = [
+            [[[[-1] * stg_iter_nb] for p in range(0, 2)] for i in range(0, R)]
+            for cl_bu_id in range(0, PSI)
+        ]
+        for stg_iter in range(0, stg_iter_nb):
+            out_l = list(range(stg_iter * PSI * R, (stg_iter + 1) * PSI * R))
+            ram_write(out_l, RAM, R, S, PSI, stg, stg_iter, 0, ntt_bwd)
+        wr_parity = ram_access_parity(S, stg, ntt_bwd, WR)
+        wr_l = [
+            RAM[cl_bu_id][i][wr_parity][0][a]
+            for cl_bu_id in range(0, PSI)
+            for i in range(0, R)
+            for a in range(0, stg_iter_nb)
+        ]
+        (cell_a, slot_a, conflict_l) = wr_map_l[stg]
+        exp_a = np.full(cell_nb, -1)
+        exp_a[cell_a] = slot_a
+        if not np.array_equal(np.array(wr_l), exp_a):
+            sys.exit("ERROR> Write permutation mismatches ram_write. pass={:d} stg={:d}".format(ntt_bwd, stg))
+
+
+# ==============================================================================
+# first_fail
+# ==============================================================================
+def first_fail(fail_a, RP):
+    """
+    fail_a[<level>][<BU input or output>].
+    Return (stg_iter, level, idx) of the first failure, in the processing order of ntt_network.py :
+    stage iteration, then level, then BU input (idx within the PSI*R of the stage iteration).
+    Return None if there is no failure.
+    """
+    if not fail_a.any():
+        return None
+    (lvl_nb, coef_nb) = fail_a.shape
+    k = int(np.argmax(fail_a.reshape(lvl_nb, -1, RP).transpose(1, 0, 2).ravel()))
+    (stg_iter, k) = divmod(k, lvl_nb * RP)
+    (lvl, idx) = divmod(k, RP)
+    return (stg_iter, lvl, idx)
+
+
+# ==============================================================================
+# ntt_network_perm
+# ==============================================================================
+def ntt_network_perm(R, S, PSI, GLWE_K_plus_1, PBS_L, map_check=False):
+    """
+    Check the NTT network, as the main of ntt_network.py does.
+    Return None if the network works, else the error message.
+    """
+    COEF_NB = R**S
+    BU_PT_NB = R ** (S - 1)  # Number of coord values per BU input position
+    STG_ITER_NB = BU_PT_NB // PSI
+    RP = R * PSI
+    CELL_NB = RP * STG_ITER_NB
+    bit_d = type_bits(PBS_L, GLWE_K_plus_1)
+    slot_a = np.arange(COEF_NB)
+    in_order_a = np.array(inc_stride(COEF_NB, COEF_NB // R))
+
+    def point(stage, coord, mask):
+        return str(NttCoord(int(stage), S, int(coord), R, type_set(mask, bit_d)))
+
+    # ==============================================================================
+    # Permutations
+    # ==============================================================================
+    rd_map_l = [read_map(R, S, PSI, stg) for stg in range(0, S)]
+    wr_map_l = [write_map(R, S, PSI, stg) for stg in range(0, S)]
+    if map_check:
+        check_map(R, S, PSI, rd_map_l, wr_map_l)
+
+    # ==============================================================================
+    # RAM
+    # ==============================================================================
+    # RAM_x[<parity>][<level>][<cell>]. Coordinates initialized with -1 for debug
+    RAM_c = np.full((2, PBS_L * GLWE_K_plus_1, CELL_NB), -1, dtype=np.int64)
+    RAM_s = np.zeros((2, PBS_L * GLWE_K_plus_1, CELL_NB), dtype=np.int64)
+    RAM_t = np.zeros((2, PBS_L * GLWE_K_plus_1, CELL_NB), dtype=np.int64)
+
+    # Input
+    in0_t = np.array(
+        [
+            bit_d["NTT"] | bit_d["D{:d}".format(dec_lvl)] | bit_d["P{:d}".format(glwe_idx)]
+            for glwe_idx in range(0, GLWE_K_plus_1)
+            for dec_lvl in range(0, PBS_L)
+        ]
+    )
+
+    for ntt_bwd in range(0, 2):  # First pass for NTT, second pass for INTT
+        if ntt_bwd == 0:
+            pbs_l = PBS_L
+        else:
+            pbs_l = 1
+        MAX_LVL = pbs_l * GLWE_K_plus_1
+
+        for stg in range(S - 1, -1, -1):  # For each stage. Stages are reverse numbered.
+            # Errors of the stage : ((stg_iter, lvl, step, idx), message)
+            # step is the order within a level : 0 BU, 1 post-process, 2 write in RAM
+            err_l = []
+
+            # ==============================================================================
+            # Read
+            # ==============================================================================
+            if (stg == S - 1) and (ntt_bwd == 0):
+                in_c = np.broadcast_to(in_order_a, (MAX_LVL, COEF_NB))
+                in_s = np.full((MAX_LVL, COEF_NB), S - 1)
+                in_t = np.broadcast_to(in0_t[:, None], (MAX_LVL, COEF_NB))
+            else:
+                rd_parity = ram_access_parity(S, stg, ntt_bwd, RD)
+                rd_map = rd_map_l[stg]
+                in_c = RAM_c[rd_parity, :MAX_LVL][:, rd_map]
+                in_s = RAM_s[rd_parity, :MAX_LVL][:, rd_map]
+                in_t = RAM_t[rd_parity, :MAX_LVL][:, rd_map]
+
+            # ==============================================================================
+            # BU : see bu_core
+            # ==============================================================================
+            bu_a = slot_a // R
+            pos_a = slot_a % R
+            ref_t = in_t[:, slot_a - pos_a]
+            no_data = in_c < 0
+            no_bu = ((in_c % BU_PT_NB) != bu_a) | (in_s != stg)
+            bad_pos = (in_c // BU_PT_NB) != pos_a
+            bad_type = in_t != ref_t
+            f = first_fail(no_data | no_bu | bad_pos | bad_type, RP)
+            if f is not None:
+                (stg_iter, lvl, idx) = f
+                j = stg_iter * RP + idx
+                (c, s, t) = (in_c[lvl, j], in_s[lvl, j], in_t[lvl, j])
+                bu_coord = NttCoord(stg, S - 1, int(bu_a[j]), R)
+                if no_data[lvl, j]:
+                    msg = "ERROR> Uninitialized RAM read. lvl={:d}, BU:{:s}".format(lvl, str(bu_coord))
+                elif no_bu[lvl, j]:
+                    msg = "ERROR> Point does not belong to the BU. point:{:s}, BU:{:s}".format(
+                        point(s, c, t), str(bu_coord)
+                    )
+                elif bad_pos[lvl, j]:
+                    msg = "ERROR> Wrong point position. exp={:d} seen={:d}, point:{:s}, BU:{:s}".format(
+                        int(pos_a[j]), int(c // BU_PT_NB), point(s, c, t), str(bu_coord)
+                    )
+                else:
+                    msg = "ERROR> Wrong type. exp={:s} seen={:s}, point:{:s}, BU:{:s}".format(
+                        str(type_set(ref_t[lvl, j], bit_d)), str(type_set(t, bit_d)), point(s, c, t), str(bu_coord)
+                    )
+                err_l.append(((stg_iter, lvl, 0, idx), msg))
+
+            # Generate output : keep input element type
+            out_c = np.broadcast_to(slot_a, (MAX_LVL, COEF_NB))
+            out_s = np.full((MAX_LVL, COEF_NB), stg - 1)
+            out_t = ref_t
+
+            # ==============================================================================
+            # Post-process : see post_proc
+            # ==============================================================================
+            (wr_cell_a, wr_slot_a, conflict_l) = wr_map_l[stg]
+            if stg == 0:  # Last stage
+                pp_c = np.broadcast_to(reverse_order_np(slot_a, R, S), (MAX_LVL, COEF_NB))
+                pp_s = np.full((MAX_LVL, COEF_NB), S - 1)
+                if ntt_bwd == 0:
+                    f = first_fail((out_t & bit_d["NTT"]) == 0, RP)
+                    if f is not None:
+                        (stg_iter, lvl, idx) = f
+                        err_l.append(((stg_iter, lvl, 1, idx), "ERROR> Wrong data type. Expected data from NTT."))
+                    # Accumulate all the levels. The coordinates are the same for all the levels,
+                    # by construction.
+                    acc_t = np.bitwise_or.reduce(out_t, axis=0)
+                    wr_lvl = GLWE_K_plus_1
+                    wr_c = pp_c[:GLWE_K_plus_1]
+                    wr_s = pp_s[:GLWE_K_plus_1]
+                    wr_t = np.stack(
+                        [
+                            (acc_t | bit_d["INTT"] | bit_d["PP{:d}".format(g)]) & ~bit_d["NTT"]
+                            for g in range(0, GLWE_K_plus_1)
+                        ]
+                    )
+                    # Written once all interleaved levels have been received.
+                    conflict_key_l = [(stg_iter, MAX_LVL, 2, 0) for stg_iter in conflict_l]
+                else:
+                    f = first_fail((out_t & bit_d["INTT"]) == 0, RP)
+                    if f is not None:
+                        (stg_iter, lvl, idx) = f
+                        err_l.append(((stg_iter, lvl, 1, idx), "ERROR> Wrong data type. Expected data from INTT."))
+                    wr_lvl = MAX_LVL
+                    (wr_c, wr_s, wr_t) = (pp_c, pp_s, (out_t | bit_d["DONE"]) & ~bit_d["INTT"])
+                    conflict_key_l = [(stg_iter, 0, 2, 0) for stg_iter in conflict_l]
+                err_l = err_l + [(k, "ERROR> Write conflict in same cl_bu_id RAM") for k in conflict_key_l]
+            else:
+                wr_lvl = MAX_LVL
+                (wr_c, wr_s, wr_t) = (out_c, out_s, out_t)
+
+            if len(err_l) > 0:
+                return min(err_l)[1]
+
+            # ==============================================================================
+            # Write
+            # ==============================================================================
+            wr_parity = ram_access_parity(S, stg, ntt_bwd, WR)
+            RAM_c[wr_parity][:wr_lvl, wr_cell_a] = wr_c[:, wr_slot_a]
+            RAM_s[wr_parity][:wr_lvl, wr_cell_a] = wr_s[:, wr_slot_a]
+            RAM_t[wr_parity][:wr_lvl, wr_cell_a] = wr_t[:, wr_slot_a]
+
+            if VERBOSE:
+                print(
+                    "DEBUG> Pass {:d}, Stage {:d} : {:d} levels, wr parity={:d}".format(
+                        ntt_bwd, stg, MAX_LVL, wr_parity
+                    )
+                )
+
+        # ==============================================================================
+        # Check output
+        # ==============================================================================
+        # out_x contains the output of the last stage, before post-process
+        bad_c = out_c != slot_a
+        if ntt_bwd == 1:
+            d_mask = sum([bit_d["D{:d}".format(l)] for l in range(0, PBS_L)])
+            p_mask = sum([bit_d["P{:d}".format(g)] for g in range(0, GLWE_K_plus_1)])
+            pp_a = np.array([bit_d["PP{:d}".format(lvl)] for lvl in range(0, MAX_LVL)])[:, None]
+            no_intt = (out_t & bit_d["INTT"]) == 0
+            no_pp = (out_t & pp_a) == 0
+            no_d = (out_t & d_mask) != d_mask
+            no_p = (out_t & p_mask) != p_mask
+        else:
+            no_intt = no_pp = no_d = no_p = np.zeros_like(bad_c)
+        fail_a = bad_c | no_intt | no_pp | no_d | no_p
+        if fail_a.any():
+            (lvl, i) = np.unravel_index(np.argmax(fail_a), fail_a.shape)
+            c = point(out_s[lvl, i], out_c[lvl, i], out_t[lvl, i])
+            if bad_c[lvl, i]:
+                return "ERROR> Output mismatches (lvl:{:d}). i={:d} exp={:d} seen={:d}".format(
+                    lvl, i, reverse_order(int(i), R, S), int(out_c[lvl, i])
+                )
+            elif no_intt[lvl, i]:
+                return "ERROR> Final output data before post-process does not contain type 'INTT'. {:s}".format(c)
+            elif no_pp[lvl, i]:
+                return "ERROR> Final output data before post-process does not have the correct PP<id>. lvl={:d} {:s}".format(
+                    lvl, c
+                )
+            elif no_d[lvl, i]:
+                return "ERROR> Final output data before post-process does not have all the D<id>. {:s}".format(c)
+            else:
+                return "ERROR> Final output data before post-process does not have all the P<id>. {:s}".format(c)
+
+    # ==============================================================================
+    # Final read from RAM + check
+    # ==============================================================================
+    rd_parity = ram_access_parity(S, S - 1, 0, RD)
+    rd_map = rd_map_l[S - 1]
+    next_c = RAM_c[rd_parity, :GLWE_K_plus_1][:, rd_map]
+    next_s = RAM_s[rd_parity, :GLWE_K_plus_1][:, rd_map]
+    next_t = RAM_t[rd_parity, :GLWE_K_plus_1][:, rd_map]
+    bad_c = next_c != in_order_a
+    no_done = (next_t & bit_d["DONE"]) == 0
+    fail_a = bad_c | no_done
+    if fail_a.any():
+        (glwe_idx, i) = np.unravel_index(np.argmax(fail_a), fail_a.shape)
+        if bad_c[glwe_idx, i]:
+            return "ERROR> Final RAM output order. exp={:d} seen={:d}".format(
+                int(in_order_a[i]), int(next_c[glwe_idx, i])
+            )
+        else:
+            return "ERROR> Final RAM output does not contain type 'DONE'. {:s}".format(
+                point(next_s[glwe_idx, i], next_c[glwe_idx, i], next_t[glwe_idx, i])
+            )
+
+    return None
+
+
+# ==============================================================================
+# Main
+# ==============================================================================
+if __name__ == "__main__":
+
+    R = 8  # Radix
+    PSI = 2  # Number of radix-R blocks used in parallel
+    S = 3  # R^S = N the number of coefficients to be processed by the NTT
+    PBS_L = 2  # Total number of decomposition levels
+    GLWE_K_plus_1 = 3  # Number of polynomials in GLWE + 1
+
+    # ==============================================================================
+    # Parse input arguments
+    # ==============================================================================
+    parser = argparse.ArgumentParser(
+        description="Check the ping-pong structure of the NTT, with permutation arrays."
+    )
+    parser.add_argument(
+        "-R",
+        dest="radix",
+        type=int,
+        help="Radix value. Should be a power of 2.",
+        default=R,
+    )
+    parser.add_argument(
+        "-l", dest="level_nb", type=int, help="Total number of levels", default=PBS_L
+    )
+    parser.add_argument(
+        "-P",
+        dest="parallel_nb",
+        type=int,
+        help="Number of radix blocks that work in parallel",
+        default=PSI,
+    )
+    parser.add_argument(
+        "-S",
+        dest="stg_nb",
+        type=int,
+        help="Total number of stages. Note that R^S = N the number of coefficients of the NTT",
+        default=S,
+    )
+    parser.add_argument(
+        "-g",
+        dest="poly_nb",
+        type=int,
+        help="Number of polynomials",
+        default=GLWE_K_plus_1,
+    )
+    parser.add_argument(
+        "-check_map",
+        help="Check the permutations against ram_read and ram_write of ntt_network.py.",
+        action="store_true",
+        default=False,
+    )
+    parser.add_argument(
+        "-v",
+        dest="verbose",
+        help="Run in verbose mode.",
+        action="store_true",
+        default=False,
+    )
+
+    args = parser.parse_args()
+
+    R = args.radix
+    PSI = args.parallel_nb
+    S = args.stg_nb
+    PBS_L = args.level_nb
+    GLWE_K_plus_1 = args.poly_nb
+    VERBOSE = args.verbose
+
+    # Check parameters
+    if pow(2, int(log(R, 2))) != R:
+        sys.exit("ERROR> R must be a power of 2")
+    if S < 2:
+        sys.exit("ERROR> S must be > 1 (S=1, no network needed)")
+    if (int(pow(R, S - 1)) % PSI) != 0:
+        sys.exit("ERROR> Only supports PSI that divides R^(S-1)")
+
+    msg = ntt_network_perm(R, S, PSI, GLWE_K_plus_1, PBS_L, args.check_map)
+    if msg is not None:
+        sys.exit(msg)
+
+    print("SUCCEED!")